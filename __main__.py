@@ -1,12 +1,18 @@
-
 import os
+import time
 from inspect import getsourcefile
 
-from helpers import Configuration, Database
+start_time = time.monotonic()
+
+from api import start_employee_directory_sync
+from api.premining import PreminingScheduler
+from helpers import Configuration, Database, Startup
 from saby_invoker import SabyInvoker
 from server import flask_server
 from neural_network import NeuralNetwork
 
+Startup.record('imports', time.monotonic() - start_time)
+
 # change directory to package directory
 package_dir = os.path.dirname(os.path.abspath(getsourcefile(lambda: 0)))
 os.chdir(package_dir)
@@ -14,16 +20,22 @@ os.chdir(package_dir)
 #   read configuration from config file
 Configuration.load_configuration()
 
-#   connect to database
-Database.connect_to_database()
-
 #   init RpcInvoker
 SabyInvoker.initialize()
 
-#   init NeuralNetwork
-NeuralNetwork.initialize()
+#   connect to database and init NeuralNetwork,
+#   in lazy mode in background while server already accepts requests
+Startup.add_stage('database', Database.connect_to_database)
+Startup.add_stage('neural_network', NeuralNetwork.initialize)
+Startup.run(lazy=Configuration.app_config.getboolean('Server', 'lazy_init', fallback=False))
+
+#   pre-mine organization employees by schedule
+PreminingScheduler.start()
+
+#   keep local employee directory for contact search
+start_employee_directory_sync()
 
 #   run server on flask
 flask_server.run()
 # from api import get_user_info
-# get_user_info(14893668, '00000003-007537f4-00bd-310e086f458d384b')
\ No newline at end of file
+# get_user_info(14893668, '00000003-007537f4-00bd-310e086f458d384b')
@@ -1,2 +1,2 @@
-from api.data_miner import mine_user_info
+from api.data_miner import is_user_data_outdated, mine_user_info, refresh_user_info
 from api.api import *
@@ -1,52 +1,316 @@
 import base64
 import json
+import threading
 import urllib.parse as urlparse
-from datetime import timedelta
-import numpy
 
-from scipy.cluster.vq import kmeans
-
-from api import mine_user_info
-from helpers import Configuration, Database
+from api import is_user_data_outdated, mine_user_info, refresh_user_info
+from api.directory import EmployeeDirectory, EmployeeIndex
+from api.jobs import JOB_REFRESH, MiningInProgress, MiningJobs
+from api.scores import SCORES_COLUMNS, update_users_scores, user_info_cache
+from helpers import Configuration, Database, Startup, TTLCache
 from saby_invoker import SabyFormatsBuilder, SabyInvoker
-from neural_network import NeuralNetwork
+
+# Staff.BrowserList persons by (sid, contragent, query_str): (records, complete page flag)
+contacts_cache = TTLCache('ContactsCache', default_ttl=60, default_size=4096)
+
+# type-ahead counters of get_contacts
+__contacts_stats = {'requests': 0, 'exact_hits': 0, 'prefix_hits': 0, 'rpc_calls': 0}
+__contacts_stats_lock = threading.Lock()
 
 
 #   + Public methods
 def get_user_info(user_id: int, sid: str = None) -> dict:
-    mined_users = [row["UserID"] for row in Database.query('SELECT * FROM "MinedUsers"')]
+    """
+    Возвращает показатели пользователя. Результат кэшируется в памяти
+    (настройки ttl и size секции [UserInfoCache] файла конфигурации).
+
+    :param user_id: идентификатор пользователя
+    :type user_id: int
+    :param sid: идентификатор сессии, defaults to None
+    :type sid: str, optional
+    :return: показатели пользователя
+    :rtype: dict
+    """
+    return get_users_info([user_id], sid)[user_id]
 
-    if user_id not in mined_users:
-        mine_user_info(user_id, sid)
 
-    # get user days count in dataset (except weekends)
-    total_days = Database.query_row(
-        'select "TotalDays" from  "MinedUsers" where "UserID" = %s',
-        (user_id,)
-    )['TotalDays']
+def get_users_info(user_ids: list, sid: str = None) -> dict:
+    """
+    Возвращает показатели нескольких пользователей.
+    Сохраненные показатели всех пользователей читаются одним запросом,
+    недостающие показатели расчитываются сразу для всех пользователей.
+    Сбор данных новых пользователей ставится в фоновую очередь (секция [Jobs] файла конфигурации),
+    в этом случае вызывается исключение MiningInProgress с состояниями задач.
+    Устаревшие данные обновляются той же очередью, пока возвращаются текущие показатели.
+
+    :param user_ids: идентификаторы пользователей
+    :type user_ids: list
+    :param sid: идентификатор сессии, defaults to None
+    :type sid: str, optional
+    :return: показатели по идентификаторам пользователей
+    :rtype: dict
+    :raises MiningInProgress: данные части пользователей еще собираются,
+        показатели остальных пользователей передаются в исключении
+    """
+    result = get_cached_users_info(user_ids)
+    missing_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in result]
+
+    if missing_ids:
+        # Taken before the database read: scores invalidated by a concurrent mining are not cached
+        generation = user_info_cache.generation()
+
+        try:
+            users_info = __get_users_info(missing_ids, sid)
+        except MiningInProgress as exc:
+            users_info, mining = exc.users_info, exc
+        else:
+            mining = None
+
+        for user_id, user_info in users_info.items():
+            user_info_cache.set(user_id, user_info, generation)
+            result[user_id] = dict(user_info)
+
+        if mining is not None:
+            raise MiningInProgress(mining.jobs, result)
+
+    return result
+
+
+def get_cached_users_info(user_ids: list) -> dict:
+    """
+    Возвращает показатели пользователей из кэша, без обращения к БД
 
+    :param user_ids: идентификаторы пользователей
+    :type user_ids: list
+    :return: показатели найденных в кэше пользователей по идентификаторам
+    :rtype: dict
+    """
     result = {}
 
-    result['user_responsibility'] = __calculate_user_responsibility(user_id)
-    result['user_sociability'] = __calculate_user_sociability(user_id, total_days)
-    result['user_procrastination'] = __calculate_user_procrastination(user_id, total_days)
-    result['user_often_leaving'] = __calculate_user_leaving(user_id)
-    result['user_punctuality'] = __calculate_user_punctuality(user_id)
-    result['user_leaving_state'] = __calculate_user_leaving_state(user_id)
+    for user_id in user_ids:
+        cached = user_info_cache.get(user_id)
+
+        if cached is not None:
+            result[user_id] = dict(cached)
 
     return result
 
 
+def get_metrics() -> dict:
+    """
+    Возвращает метрики сервера: счетчики кэша показателей, пула соединений с БД,
+    хранилища ответов СБИС, очереди сбора данных, кэша контактов, справочника сотрудников
+    итоги предварительного сбора данных и длительность этапов инициализации
+
+    :return: метрики сервера
+    :rtype: dict
+    """
+    # premining module imports this module
+    from api.premining import PreminingScheduler
+
+    return {
+        'user_info_cache': user_info_cache.stats(),
+        'database_pool': Database.pool_stats(),
+        'saby_response_store': SabyInvoker.store_stats(),
+        'mining_jobs': MiningJobs.stats(),
+        'contacts_cache': get_contacts_stats(),
+        'employee_directory': EmployeeDirectory.stats(),
+        'premining': PreminingScheduler.stats(),
+        'startup': Startup.stats()
+    }
+
+
+def get_job_status(job_id: str) -> dict:
+    """
+    Возвращает состояние фоновой задачи сбора данных
+
+    :param job_id: идентификатор задачи
+    :type job_id: str
+    :return: состояние задачи или None, если задача не найдена
+    :rtype: dict
+    """
+    return MiningJobs.get_status(job_id)
+
+
 def get_contacts(query_str, contragent="-2", record_limit=10, sid=None):
     """
         Возвращает список контактов по строке запроса.
+        Поиск выполняется по локальному справочнику сотрудников, пока он не устарел (секция [Directory]),
+        если справочник загружен с сессией пользователя и в нем найдены сотрудники.
+        Иначе результаты запроса в СБИС кэшируются (секция [ContactsCache] файла конфигурации). Если по
+        более короткому началу строки запроса получена полная страница (сотрудников больше нет), результат
+        отбирается из нее без запроса в СБИС.
         :param query_str: строка запроса
         :param contragent: идентификатор контрагента
         :param record_limit=10: ограничение на количество возвращаемых записей
         :param sid: идентификатор сессии
         :return: список сотрудников
     """
-    rpc_result = SabyInvoker.invoke(
+    employees = EmployeeDirectory.search(query_str, contragent, __get_session_id(sid), record_limit)
+
+    if employees is not None:
+        return employees
+
+    contacts = __get_cached_contacts(query_str, contragent, sid)
+
+    if contacts is None:
+        page_size = max(Configuration.app_config.getint('ContactsCache', 'page_size', fallback=50), record_limit)
+        rpc_result = __browse_staff(query_str, contragent, 0, page_size, sid)
+        records = rpc_result['rec']
+
+        contacts = __select_only_person(records, len(records))
+        complete = rpc_result.get('more') is False or (rpc_result.get('more') is None and len(records) < page_size)
+        contacts_cache.set((sid, contragent, query_str), (contacts, complete))
+        __count_contacts('rpc_calls')
+
+    return __formatting(contacts[:record_limit])
+
+
+def get_contacts_stats() -> dict:
+    """
+    Возвращает счетчики кэша контактов: запросы, попадания по строке запроса и по ее началу,
+    вызовы СБИС и долю запросов без вызова СБИС
+
+    :return: счетчики кэша контактов
+    :rtype: dict
+    """
+    with __contacts_stats_lock:
+        stats = dict(__contacts_stats)
+
+    stats['saved_rpc'] = stats['exact_hits'] + stats['prefix_hits']
+    stats['hit_rate'] = stats['saved_rpc'] / stats['requests'] if stats['requests'] else 0.0
+    return dict(stats, cache=contacts_cache.stats())
+
+
+def sync_employee_directory(contragent: str = "-2", sid: str = None):
+    """
+    Загружает всех сотрудников контрагента в локальный справочник.
+    Записи сотрудников форматируются (в т.ч. адреса фото) один раз при загрузке.
+
+    :param contragent: идентификатор контрагента, defaults to "-2"
+    :type contragent: str, optional
+    :param sid: идентификатор сессии, defaults to None (session_id секции [SABY])
+    :type sid: str, optional
+    """
+    employees = []
+    name_words = []
+
+    for record in list_employees(sid, contragent):
+        employees.append(__format_employee(record))
+        name_words.append(__get_name_words(record))
+
+    EmployeeDirectory.update(contragent, EmployeeIndex(employees, name_words, __get_session_id(sid)))
+
+
+def start_employee_directory_sync():
+    """
+    Запускает фоновую синхронизацию справочника сотрудников (секция [Directory] файла конфигурации)
+    """
+    EmployeeDirectory.start(sync_employee_directory)
+
+
+def list_employees(sid: str = None, contragent: str = "-2", page_size: int = 100):
+    """
+    Постранично перебирает всех сотрудников организации через Staff.BrowserList
+
+    :param sid: идентификатор сессии, defaults to None
+    :type sid: str, optional
+    :param contragent: идентификатор контрагента, defaults to "-2"
+    :type contragent: str, optional
+    :param page_size: кол-во записей на странице, defaults to 100
+    :type page_size: int, optional
+    :return: генератор записей сотрудников
+    """
+    seen_ids = set()
+    page = 0
+
+    while True:
+        rpc_result = __browse_staff("", contragent, page, page_size, sid)
+        records = rpc_result['rec']
+        new_records = [record for record in records if record.get('Лицо') not in seen_ids]
+
+        # service returned the same page again
+        if not new_records:
+            break
+
+        for record in __select_only_person(new_records, len(new_records)):
+            yield record
+
+        seen_ids.update(record.get('Лицо') for record in new_records)
+
+        if rpc_result.get('more') is False or len(records) < page_size:
+            break
+
+        page += 1
+
+
+#   + Private methods
+def __get_session_id(sid: str = None) -> str:
+    """
+    Возвращает сессию вызовов СБИС: переданную или session_id секции [SABY]
+    """
+    return sid or Configuration.app_config.get('SABY', 'session_id', fallback=None)
+
+
+def __count_contacts(counter: str):
+    with __contacts_stats_lock:
+        __contacts_stats[counter] += 1
+
+
+def __get_cached_contacts(query_str: str, contragent: str, sid: str = None) -> list:
+    """
+    Ищет сотрудников в кэше контактов: по строке запроса, затем по ее началу,
+    если по нему получена полная страница
+
+    :return: записи сотрудников или None, если в кэше нет подходящего результата
+    :rtype: list
+    """
+    __count_contacts('requests')
+    cached = contacts_cache.get((sid, contragent, query_str))
+
+    if cached is not None:
+        __count_contacts('exact_hits')
+        return cached[0]
+
+    for prefix_len in range(len(query_str) - 1, 0, -1):
+        cached = contacts_cache.get((sid, contragent, query_str[:prefix_len]))
+
+        if cached is not None and cached[1]:
+            contacts = [record for record in cached[0] if __match_contact(record, query_str)]
+            contacts_cache.set((sid, contragent, query_str), (contacts, True))
+            __count_contacts('prefix_hits')
+            return contacts
+
+    return None
+
+
+def __get_name_words(record) -> list:
+    """
+    Возвращает слова ФИО сотрудника в нижнем регистре
+    """
+    return ' '.join(record.get(field) or '' for field in ('Фамилия', 'Имя', 'Отчество')).casefold().split()
+
+
+def __match_contact(record, query_str: str) -> bool:
+    """
+    Проверяет, что каждое слово строки запроса является началом одного из слов ФИО сотрудника
+    """
+    name_words = __get_name_words(record)
+
+    return all(
+        any(name_word.startswith(query_word) for name_word in name_words)
+        for query_word in query_str.casefold().split()
+    )
+
+
+def __browse_staff(query_str: str, contragent: str, page: int, page_size: int, sid: str = None) -> dict:
+    """
+    Вызывает Staff.BrowserList для одной страницы списка сотрудников
+
+    :return: записи страницы (rec), итоги (outcome) и признак наличия следующей страницы (more)
+    :rtype: dict
+    """
+    return SabyInvoker.invoke(
         "Staff.BrowserList",
         sid,
         Фильтр=SabyFormatsBuilder.build_record({
@@ -67,228 +331,86 @@ def get_contacts(query_str, contragent="-2", record_limit=10, sid=None):
         Сортировка=None,
         Навигация=SabyFormatsBuilder.build_record({
             "ЕстьЕще": True,
-            "РазмерСтраницы": 10,
-            "Страница": 0
+            "РазмерСтраницы": page_size,
+            "Страница": page
         }),
         ДопПоля=[]
     )
-    contacts = __select_only_person(rpc_result['rec'], record_limit)
-
-    return __formatting(contacts)
-
-
-#   + Private methods
-def __calculate_user_leaving_state(user_id: int) -> int:
-    try:
-        user_neural_data = Database.query_row(
-            """
-            select "UserFirstCalls", "UserLastCalls", "UserFirstDuration", "UserLastDuration", "UserFirstOverwork", "UserLastOverwork"
-            from "UsersNeuralData"
-            where "UserID" = %s
-            """,
-            (user_id,)
-        )
-        XpredictInputData = numpy.array([list(user_neural_data)])
-        print(XpredictInputData)
-        with NeuralNetwork.graph.as_default():
-            return int(round(NeuralNetwork.model.predict(XpredictInputData)[0][0] * 10))
-    except BaseException as exc:
-        print(exc)
-        return -1
-
-def __calculate_user_punctuality(user_id: int) -> int:
-    # !Settings
-    # max deviation minutes per day (setting)
-    MAX_DEVIATION = 30
-
-    user_incoming = Database.query(
-        """
-        With "Dates" as (
-            select "DateTime"::date as "Date"
-            from "UserLocation"
-            Where "UserID" = %s and "Status" = 1
-            group by "Date"
-        )
-        select dates."Date", min(main."DateTime"::time) as "ComingTime"
-        from "UserLocation" as main
-        inner join "Dates" as dates
-            on dates."Date" = main."DateTime"::date
-        group by dates."Date"
-        order by dates."Date"
-        """,
-        (user_id,)
-    )
-    if user_incoming:
-        # get user incoming times as seconds
-        timelist = [row['ComingTime'] for row in user_incoming]
-        timelist = [timedelta(hours=x.hour, minutes=x.minute, seconds=x.second).total_seconds() for x in timelist]
-
-        # convert max deviation to seconds
-        time_max_deviation = timedelta(minutes=MAX_DEVIATION).total_seconds()
 
-        # calculate average tive with deviation
-        k_mean = kmeans(timelist, 1)[0][0]
-        max_time = k_mean + time_max_deviation
-        min_time = k_mean - time_max_deviation
 
-        # find punctual points
-        punctual = [time for time in timelist if time > min_time and time < max_time]
-        return int(round(len(punctual) / len(timelist) * 10))
+def __get_users_info(user_ids: list, sid: str = None) -> dict:
+    users_scores = __query_users_scores(user_ids)
+    changed_ids = []
+    unscored_ids = []
+    mining_jobs = []
+    background_mining = MiningJobs.workers_count() > 0
 
-    return -1
+    for user_id in user_ids:
+        user_scores = users_scores.get(user_id)
 
+        if not user_scores and background_mining:
+            mining_jobs.append(MiningJobs.enqueue(user_id, sid))
 
-def __calculate_user_leaving(user_id: int) -> bool:
-    '''
-    Расчитывает флаг часто ли пользователь уходит из офиса
+        elif not user_scores:
+            mine_user_info(user_id, sid)
+            changed_ids.append(user_id)
 
-    :param user_id: идентификатор пользователя
-    :type user_id: int
-    :return: флаг частого покидания офиса
-    :rtype: bool
-    '''
+        elif not is_user_data_outdated(user_scores['LastMinedDate']):
+            # users mined before scores were stored
+            if user_scores['UpdatedAt'] is None:
+                unscored_ids.append(user_id)
 
-    # !Settings
-    # max user leavings per day (setting)
-    MAX_LEAVING = 3
-
-    user_leavings = Database.query_row(
-        """
-        select avg("LeavingCount") as "AvgLeavings"
-        from (
-            select "DateTime"::date as "Date" , count("Status") as "LeavingCount"
-            from "UserLocation"
-            where "UserID" = %s and "Status" = 0
-            group by "Date"
-        ) as "LeavingPerDay"
-        """,
-        (user_id,)
-    )
-    if user_leavings['AvgLeavings']:
-        return True if int(user_leavings["AvgLeavings"]) > MAX_LEAVING else False
-    else:
-        return None
+        # users without last mined date are mined again for the whole period, users without scores have none to show
+        elif background_mining and (user_scores['LastMinedDate'] is None or user_scores['UpdatedAt'] is None):
+            mining_jobs.append(MiningJobs.enqueue(user_id, sid, JOB_REFRESH))
+            del users_scores[user_id]
 
+        # current scores are returned while they are refreshed in background
+        elif background_mining:
+            MiningJobs.enqueue(user_id, sid, JOB_REFRESH)
 
-def __calculate_user_procrastination(user_id: int, total_days: int) -> int:
-    '''
-    Расчитывает показатель прокрастенации пользователя
+        else:
+            refresh_user_info(user_id, sid)
+            changed_ids.append(user_id)
 
-    :param user_id: идентификатор пользователя
-    :type user_id: int
-    :param total_days: кол-во дней по которым собрана статистика на пользователя
-    :type total_days: int
-    :return: [показатель прокрастенации пользователя
-    :rtype: int
-    '''
+    if unscored_ids:
+        update_users_scores(unscored_ids)
+        Database.commit_changes()
 
-    # !Settings
-    # max user procrastination minutes per day (setting)
-    MAX_PROCRASTINATION = 45
+    if changed_ids or unscored_ids:
+        users_scores.update(__query_users_scores(changed_ids + unscored_ids))
 
-    user_procrastination = Database.query_row(
-        """
-        select sum("WastedTime") as "WastedTime" from "UserActivity"
-        where "UserID" = %s and "Useful" = -1
-        """,
-        (user_id,)
-    )
-    if user_procrastination['WastedTime']:
-        total_procrastenation = timedelta(minutes=MAX_PROCRASTINATION * total_days)
-        result = int(round(user_procrastination['WastedTime'].total_seconds() / total_procrastenation.total_seconds() * 10))
+    users_info = {
+        user_id: {field: user_scores[column] for field, column in SCORES_COLUMNS.items()}
+        for user_id, user_scores in users_scores.items()
+    }
 
-        return 10 if result > 10 else result
+    if mining_jobs:
+        raise MiningInProgress(mining_jobs, users_info)
 
-    else:
-        return 0
+    return users_info
 
 
-def __calculate_user_sociability(user_id: int, total_days: int) -> int:
+def __query_users_scores(user_ids: list) -> dict:
     """
-    Расчитывает показатель комуникабельности человека
+    Получает сохраненные показатели пользователей
 
-    :param user_id: идентификатор пользователя
-    :type user_id: int
-    :param total_days: кол-во дней по которым собрана статистика на пользователя
-    :type total_days: int
-    :return: аоказатель коммуникабельности
-    :rtype: int
+    :param user_ids: идентификаторы пользователей
+    :type user_ids: list
+    :return: показатели и дата последнего сбора данных по идентификаторам пользователей (только уже собранных)
+    :rtype: dict
     """
-
-    # !Settings
-    # max user communication minutes per day (setting)
-    MAX_COMMUNICATION = 45
-
-    user_communication = Database.query_row(
-        """
-        select sum("WastedTime") as "WastedTime"
-        from  "UserActivity"
-        where "UserID" = %s and "Category" in ('Обмен сообщениями (IM, Почта)', 'Звонки СБИС')
-        """,
-        (user_id,)
-    )
-
-    if user_communication["WastedTime"]:
-        max_user_communication = timedelta(minutes=MAX_COMMUNICATION * total_days)
-        result = int(round(user_communication['WastedTime'].total_seconds() / max_user_communication.total_seconds() * 10))
-        return 10 if result > 10 else result
-    else:
-        return -1
-
-
-def __calculate_user_responsibility(user_id: int) -> int:
-    '''
-    Расчитывает показатель ответственности человека
-
-    :param user_id: идентификатор пользователя
-    :type user_id: int
-    :return: показатель ответственности человека
-    :rtype: int
-    '''
-
-    # !Settings
-    # max overwork hours per day (setting)
-    MAX_OVERWORK = 2
-
-    # get user plan percent
-    user_plan_percent = Database.query_row(
-        'SELECT "PlanPercent" from "UserPlanPercent" WHERE "UserID" = %s LIMIT 1',
-        (user_id,)
-        )
-
-    if user_plan_percent:
-        user_plan_percent = user_plan_percent["PlanPercent"]
-
-    # get user overwork
-    user_overwork = Database.query_row(
+    rows = Database.query(
         """
-            SELECT sum("Overwork") AS "TotalOverwork", count("UserID") as "TotalDays"
-            FROM "UserOverwork"
-            WHERE "UserID" = %s
-            group by "UserID"
+        select mined."UserID" as "MinedUserID", mined."LastMinedDate", scores.*
+        from "MinedUsers" as mined
+        left join "UserScores" as scores on scores."UserID" = mined."UserID"
+        where mined."UserID" = any(%s)
         """,
-        (user_id,)
+        (list(user_ids),)
     )
 
-    # if can't find overwork and plan info return unknown value
-    if not user_overwork and not user_plan_percent:
-        return -1
-
-    # if find only user plan info return plan percent
-    elif user_plan_percent and not user_overwork:
-        return int(user_plan_percent / 10)
-
-    # if find user overwork info
-    elif user_overwork:
-        # calculate overwork percents
-        total_max_overwork = timedelta(hours=MAX_OVERWORK * user_overwork["TotalDays"])
-        overwork_percents = (user_overwork['TotalOverwork'].total_seconds()/total_max_overwork.total_seconds()) * 100
-        overwork_percents = 100 if overwork_percents > 100 else overwork_percents
-
-        if user_plan_percent:
-            return int((overwork_percents + user_plan_percent) / 20)
-
-        return int(overwork_percents / 10)
+    return {row['MinedUserID']: row for row in rows or []}
 
 
 def __select_only_person(records, record_limit):
@@ -314,22 +436,37 @@ def __formatting(records):
         :param records: список записей с сотрудниками
         :return: список записей сотрудников с необходимыми полями
     """
-    result = []
-    for record in records:
-        employee = {}
-        # Получаем простые поля
-        employee['postName'] = record.get('ПодразделениеНазвание')
-        employee['secondName'] = record.get('Фамилия')
-        employee['id'] = record.get('Лицо')
-        employee['name'] = record.get('Имя')
-        # Получаем информацию о фото
-        photo_id = record.get('PhotoID', None)
-        if photo_id:
-            photo_id_base64 = base64.b64encode((json.dumps({"Id": photo_id})).encode())
-            photo_url = 'previewer/280/service/?id=3&method=ProfileService.BigPhoto&protocol=5&params={}'.format(
-                urlparse.quote_plus(photo_id_base64)
-            )
-            photo_url = urlparse.urljoin(Configuration.app_config['SABY']['site'], photo_url)
-        employee['photoUrl'] = photo_url
-        result.append(employee)
-    return result
+    return [__format_employee(record) for record in records]
+
+
+def __format_employee(record) -> dict:
+    """
+        Приводит запись сотрудника к формату, необходимому для UI мобилки
+        :param record: запись сотрудника
+        :return: запись сотрудника с необходимыми полями
+    """
+    employee = {}
+    # Получаем простые поля
+    employee['postName'] = record.get('ПодразделениеНазвание')
+    employee['secondName'] = record.get('Фамилия')
+    employee['id'] = record.get('Лицо')
+    employee['name'] = record.get('Имя')
+    # Получаем информацию о фото
+    employee['photoUrl'] = __get_photo_url(record.get('PhotoID', None))
+    return employee
+
+
+def __get_photo_url(photo_id) -> str:
+    """
+        Формирует адрес фото сотрудника
+        :param photo_id: идентификатор фото
+        :return: адрес фото или None, если фото нет
+    """
+    if not photo_id:
+        return None
+
+    photo_id_base64 = base64.b64encode((json.dumps({"Id": photo_id})).encode())
+    photo_url = 'previewer/280/service/?id=3&method=ProfileService.BigPhoto&protocol=5&params={}'.format(
+        urlparse.quote_plus(photo_id_base64)
+    )
+    return urlparse.urljoin(Configuration.app_config['SABY']['site'], photo_url)
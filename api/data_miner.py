@@ -1,37 +1,62 @@
-import re
-from datetime import date, datetime, timedelta
-from functools import lru_cache
+import threading
+from datetime import date, timedelta
+from functools import lru_cache, wraps
 
 from dateutil.relativedelta import relativedelta
 from dateutil.rrule import DAILY, FR, MO, TH, TU, WE, rrule
-from scipy.cluster.vq import kmeans
 
-from helpers import Database
-from saby_invoker import SabyFormatsBuilder, SabyInvoker
+from api import features
+from api.scores import update_user_scores, user_info_cache
+from helpers import Configuration, Database
+from saby_invoker import RpcCall, SabyFormatsBuilder, SabyInvoker
 
+# методы СБИС, данные которых запрашиваются по дням
+DAY_LOCATION_METHOD = 'Местоположение.СводкаЗаДень'
+DAY_ACTIVITY_METHOD = 'Report.PersonProductivityStatistic'
+DAY_CALLS_METHOD = 'CallInfo.GetCountByFaceId'
 
-def __get_user_day_location(user_id: int, day: str, sid: str) ->dict:
-    return SabyInvoker.invoke(
-            'Местоположение.СводкаЗаДень',
-            sid,
-            ЧастноеЛицо=user_id,
-            Дата=day,
-            Опции={
-                "СогласованныеДокументы": True,
-                "ТолькоОсновнаяАктивность": True,
-                "UnproductiveTime": True
-            }
-    )
+# locks of users being mined: [lock, holders count], removed when the last holder leaves
+__user_locks = {}
+__user_locks_guard = threading.Lock()
 
 
-def __get_user_out_calls(user_id: int, day: str, sid: str) -> dict:
-    rpc_result = SabyInvoker.invoke(
-            "CallInfo.GetCountByFaceId",
-            sid,
-            person=str(user_id),
-            ДатаС="{day}T00:00:00.000Z".format(day=day),
-            ДатаПо="{day}T23:59:59.000Z".format(day=day)
-        )
+def __is_past_day(day: str) -> bool:
+    """
+    Данные прошедших дней в СБИС не меняются, их ответы можно брать из хранилища ответов
+    """
+    return day < date.today().isoformat()
+
+
+def __get_user_day_location_call(user_id: int, day: str) -> RpcCall:
+    return RpcCall(DAY_LOCATION_METHOD, {
+        "ЧастноеЛицо": user_id,
+        "Дата": day,
+        "Опции": {
+            "СогласованныеДокументы": True,
+            "ТолькоОсновнаяАктивность": True,
+            "UnproductiveTime": True
+        }
+    }, __is_past_day(day))
+
+
+def __get_user_day_activity_call(user_id: int, day: str) -> RpcCall:
+    return RpcCall(DAY_ACTIVITY_METHOD, {
+        "Фильтр": SabyFormatsBuilder.build_record({"Date": day, "Person": user_id}),
+        "Сортировка": None,
+        "Навигация": None,
+        "ДопПоля": []
+    }, __is_past_day(day))
+
+
+def __get_user_out_calls_call(user_id: int, day: str) -> RpcCall:
+    return RpcCall(DAY_CALLS_METHOD, {
+        "person": str(user_id),
+        "ДатаС": "{day}T00:00:00.000Z".format(day=day),
+        "ДатаПо": "{day}T23:59:59.000Z".format(day=day)
+    }, __is_past_day(day))
+
+
+def __convert_out_calls(rpc_result: dict) -> dict:
     result = {'count': 0.0, 'duration': timedelta()}
 
     if rpc_result:
@@ -41,31 +66,40 @@ def __get_user_out_calls(user_id: int, day: str, sid: str) -> dict:
     return result
 
 
-def __calculate_overwork(need_datetime_str, fact_datetime_str):
-    """
-    Возвращает время переработки. В случае недоработки возаращает нулевую дельту
-    :param need_datetime: необходимое время работы в формате: '%H:%M:%S'
-    :param fact_datetime: фактическое время работы в формате: '%H:%M:%S'
-    :return: timedelta переработки. В случае недоработки возвращает нулевую timedelta
-    """
-    need_datetime = None
-    fact_datetime = None
-    result = timedelta()
+# method -> (call builder, result converter)
+DAY_CALLS = {
+    DAY_LOCATION_METHOD: (__get_user_day_location_call, None),
+    DAY_ACTIVITY_METHOD: (__get_user_day_activity_call, None),
+    DAY_CALLS_METHOD: (__get_user_out_calls_call, __convert_out_calls)
+}
+
 
-    # Получаем необходимое время рабоы
-    if not need_datetime_str:
-        need_datetime_str = '00:00:00'
-    need_datetime = datetime.strptime(need_datetime_str, '%H:%M:%S')
+def __fetch_days(method: str, user_id: int, days: list, sid: str) -> list:
+    """
+    Выполняет запрос данных пользователя за каждый день из списка.
+    Вызовы отправляются пакетными запросами JSON-RPC, кол-во одновременно отправляемых
+    пакетов задается параметром workers секции [Mining] файла конфигурации.
 
-    # получаем фактическое время работы
-    if not fact_datetime_str:
-        fact_datetime_str = '00:00:00'
-    fact_datetime = datetime.strptime(fact_datetime_str, '%H:%M:%S')
+    :param method: имя метода СБИС (одна из констант DAY_*_METHOD)
+    :type method: str
+    :param user_id: идентификатор пользователя
+    :type user_id: int
+    :param days: список дат
+    :type days: list
+    :param sid: идентификатор сессии
+    :type sid: str
+    :return: результаты запросов в порядке следования дат
+    :rtype: list
+    """
+    build_call, convert = DAY_CALLS[method]
 
-    if fact_datetime > need_datetime:
-        result = fact_datetime - need_datetime
+    results = SabyInvoker.invoke_batch(
+        [build_call(user_id, day) for day in days],
+        sid,
+        concurrency=Configuration.app_config.getint('Mining', 'workers', fallback=1)
+    )
 
-    return result
+    return [convert(result) for result in results] if convert else results
 
 
 def __convert_magic_string(magic_string: str) -> timedelta:
@@ -77,17 +111,7 @@ def __convert_magic_string(magic_string: str) -> timedelta:
     :return: строка временного интервала
     :rtype: timedelta
     """
-    time_regexp = re.compile(r"P(?P<days>[\d]+)DT(?P<hours>[\d]+)H(?P<minutes>[\d]+)M(?P<seconds>[\d\.]+)S")
-
-    duration_regexp_dict = time_regexp.match(magic_string).groupdict()
-    duration_dict = {key: int(float(val)) if val else 0 for key, val in duration_regexp_dict.items()}
-
-    return timedelta(
-                days=duration_dict['days'],
-                hours=duration_dict['hours'],
-                minutes=duration_dict['minutes'],
-                seconds=duration_dict['seconds']
-    )
+    return timedelta(seconds=features.parse_duration(magic_string))
 
 
 @lru_cache()
@@ -115,43 +139,62 @@ def __get_user_location_and_overwork(user_id: int, sid: str, datelist: list = No
     :param datelist: список дат по которым необходимо собрать статистику, defaults to None
     :param datelist: list, optional
     """
-    if not datelist:
+    if datelist is None:
         datelist = __get_date_range(date.today())
 
-    for cur_date in datelist:
+    locations = __fetch_days(DAY_LOCATION_METHOD, user_id, datelist, sid)
 
-        rpc_result = __get_user_day_location(user_id, cur_date, sid)
-        entrances = [entity for entity in rpc_result['activity_detail']['rec'] if entity['Описание'] == 'entrance']
+    # Смотрим всю активность
+    summaries = [rpc_result.get('activity_summary') for rpc_result in locations]
 
-        for entrance in entrances:
-            Database.query(
-                """
-                INSERT INTO "UserLocation" ("UserID", "DateTime", "Status")
-                VALUES (%s, %s, %s);
-                """,
-                (user_id, entrance["ВремяНачало"], entrance["Действие"])
-            )
+    overwork = features.overwork(
+        # Необходимое время работы
+        features.parse_clock_times([summary.get('ВремяРаботыГрафик', '00:00:00') for summary in summaries]),
+        # Фактически сколько сотрудник отработал
+        features.parse_clock_times([summary.get('ВремяРаботы', '00:00:00') for summary in summaries])
+    )
 
-        # Смотрим всю активность
-        activity_summary = rpc_result.get('activity_summary')
+    for cur_date, rpc_result, day_overwork in zip(datelist, locations, overwork):
 
-        # Выбираем необходимое время работы
-        need_time_str = activity_summary.get('ВремяРаботыГрафик', '00:00:00')
-        # Выбираем фактически сколько сотрудник отработал
-        fact_time_str = activity_summary.get('ВремяРаботы', '00:00:00')
+        # entrances without time or action can not be upserted (key columns are NOT NULL)
+        entrances = [
+            entity for entity in rpc_result['activity_detail']['rec']
+            if entity['Описание'] == 'entrance' and entity['ВремяНачало'] is not None and entity['Действие'] is not None
+        ]
 
-        Database.query(
-            """
-            INSERT INTO "UserOverwork" ("UserID", "Date", "Overwork")
-            VALUES (%s, %s, %s);
-            """,
-            (
-                user_id,
-                cur_date,
-                __calculate_overwork(need_time_str, fact_time_str)
-            )
+        Database.buffer_rows(
+            'UserLocation',
+            ('UserID', 'DateTime', 'Status'),
+            [(user_id, entrance["ВремяНачало"], entrance["Действие"]) for entrance in entrances],
+            key_columns=('UserID', 'DateTime', 'Status')
+        )
+
+        Database.buffer_rows(
+            'UserOverwork',
+            ('UserID', 'Date', 'Overwork'),
+            [(user_id, cur_date, timedelta(seconds=float(day_overwork)))],
+            key_columns=('UserID', 'Date')
         )
 
+    Database.flush_rows()
+
+    # Обновляем сводку приходов и уходов по дням
+    Database.query(
+        """
+        INSERT INTO "UserDailyArrival"("UserID", "Date", "FirstEntrance", "LeaveCount")
+        SELECT
+            "UserID", "DateTime"::date,
+            min("DateTime"::time) FILTER (WHERE "Status" = 1),
+            count(*) FILTER (WHERE "Status" = 0)
+        FROM "UserLocation"
+        WHERE "UserID" = %s AND "DateTime"::date = any(%s::date[])
+        GROUP BY "UserID", "DateTime"::date
+        ON CONFLICT ("UserID", "Date") DO UPDATE
+        SET "FirstEntrance" = EXCLUDED."FirstEntrance", "LeaveCount" = EXCLUDED."LeaveCount";
+        """,
+        (user_id, list(datelist))
+    )
+
 
 def __get_user_activity(user_id: int, sid: str, datelist: list = None):
     """
@@ -163,40 +206,47 @@ def __get_user_activity(user_id: int, sid: str, datelist: list = None):
     :param datelist: list, optional
     """
 
-    insert_query = """
-        INSERT INTO "UserActivity"("UserID", "Date", "Category", "Useful", "WastedTime")
-        VALUES (%s, %s, %s, %s, %s);
-    """
-    if not datelist:
+    if datelist is None:
         datelist = __get_date_range(date.today())
 
-    for cur_date in datelist:
+    activities = __fetch_days(DAY_ACTIVITY_METHOD, user_id, datelist, sid)
+    calls = __fetch_days(DAY_CALLS_METHOD, user_id, datelist, sid)
 
-        rpc_result = SabyInvoker.invoke(
-            'Report.PersonProductivityStatistic',
-            sid,
-            Фильтр=SabyFormatsBuilder.build_record({"Date": cur_date, "Person": user_id}),
-            Сортировка=None,
-            Навигация=None,
-            ДопПоля=[]
-        )
+    for cur_date, rpc_result, out_calls in zip(datelist, activities, calls):
 
         person_activities = [activity for activity in rpc_result['rec'] if activity['Parent@']] if rpc_result else []
 
-        for activity in person_activities:
-            # write user activity
-            Database.query(
-                insert_query,
-                (user_id, cur_date, activity['Name'], activity['Useful'], __convert_magic_string(activity['Duration']))
+        # sum user activity by category, so every (day, category) is one upserted row
+        wasted_time = {}
+
+        durations = features.parse_durations([activity['Duration'] for activity in person_activities])
+
+        for activity, duration in zip(person_activities, durations):
+            # upsert key columns are NOT NULL: activity without category is kept uncategorized, without usefulness is neutral
+            category = (
+                activity['Name'] if activity['Name'] is not None else '',
+                activity['Useful'] if activity['Useful'] is not None else 0
             )
+            wasted_time[category] = wasted_time.get(category, timedelta()) + timedelta(seconds=float(duration))
 
-        # get user calls
-        out_calls = __get_user_out_calls(user_id, cur_date, sid)
+        # user calls
+        calls_category = ("Звонки СБИС", 0)
+        wasted_time[calls_category] = wasted_time.get(calls_category, timedelta()) + out_calls['duration']
 
-        Database.query(
-            insert_query,
-            (user_id, cur_date, "Звонки СБИС", 0, out_calls['duration'])
+        Database.buffer_rows(
+            'UserActivity',
+            ('UserID', 'Date', 'Category', 'Useful', 'WastedTime'),
+            [(user_id, cur_date, name, useful, duration) for (name, useful), duration in wasted_time.items()],
+            key_columns=('UserID', 'Date', 'Category', 'Useful')
         )
+        Database.buffer_rows(
+            'UserCalls',
+            ('UserID', 'Date', 'Count', 'Duration'),
+            [(user_id, cur_date, out_calls['count'], out_calls['duration'])],
+            key_columns=('UserID', 'Date')
+        )
+
+    Database.flush_rows()
 
 
 def __get_user_plan_percent(user_id: int, sid: str, month_count: int = 3):
@@ -228,92 +278,266 @@ def __get_user_plan_percent(user_id: int, sid: str, month_count: int = 3):
     percent_structure = rpc_result.get('outcome', None) if rpc_result else None
 
     if percent_structure:
-        Database.query(
-                """
-                INSERT INTO "UserPlanPercent"("UserID", "PlanPercent")
-                VALUES (%s, %s);
-                """,
-                (user_id, percent_structure['Процент'])
-            )
-
-
-def __get_user_overwork(user_id: int, days: list, sid: str) -> list:
-    overwork = []
-
-    for day in days:
-        location_data = __get_user_day_location(user_id, day, sid)
-
-        activity_summary = location_data.get('activity_summary')
-
-        # Выбираем необходимое время работы
-        need_time_str = activity_summary.get('ВремяРаботыГрафик', '00:00:00')
-        # Выбираем фактически сколько сотрудник отработал
-        fact_time_str = activity_summary.get('ВремяРаботы', '00:00:00')
+        Database.buffer_rows(
+            'UserPlanPercent',
+            ('UserID', 'PlanPercent'),
+            [(user_id, percent_structure['Процент'])],
+            key_columns=('UserID',)
+        )
 
-        overwork.append(__calculate_overwork(need_time_str, fact_time_str).total_seconds())
 
-    return kmeans(overwork, 1)[0][0]
+def __get_user_overwork(user_id: int, days: list) -> float:
+    overwork = Database.query(
+        """
+        select extract(epoch from "Overwork")::float as "Overwork"
+        from "UserOverwork"
+        where "UserID" = %s and "Date" = any(%s::date[])
+        """,
+        (user_id, days)
+    )
 
+    # no overwork rows for the days give 0 instead of failing neural data mining
+    return features.mean([row['Overwork'] for row in overwork])
 
-def __get_user_calls(user_id: int, days: list, sid: str) -> list:
-    call_count = []
-    call_time = []
 
-    for day in days:
-        call_data = __get_user_out_calls(user_id, day, sid)
+def __get_user_calls(user_id: int, days: list) -> tuple:
+    calls = Database.query(
+        """
+        select "Count", extract(epoch from "Duration")::float as "Duration"
+        from "UserCalls"
+        where "UserID" = %s and "Date" = any(%s::date[])
+        """,
+        (user_id, days)
+    )
 
-        call_count.append(call_data['count'])
-        call_time.append(call_data['duration'].total_seconds())
+    # no calls rows for the days give 0 instead of failing neural data mining
+    mean_count = features.mean([row['Count'] for row in calls])
+    mean_time = features.mean([row['Duration'] for row in calls])
 
-    k_mean_count = kmeans(call_count, 1)[0][0]
-    k_mean_time = kmeans(call_time, 1)[0][0]
+    return mean_count, mean_time
 
-    return k_mean_count, k_mean_time
 
+def __get_user_neural_data(user_id: int):
+    """
+    Рассчитывает данные для нейросети по уже сохраненной в базе статистике пользователя.
+    Поэтому должен вызываться после сбора переработок и звонков.
 
-def __get_user_neural_data(user_id: int, sid: str):
+    :param user_id: идентификатор пользователя
+    :type user_id: int
+    """
     # get data from last month
     last_days_range = __get_date_range(date.today(), 1)
-    last_count, last_time = __get_user_calls(user_id, last_days_range, sid)
-    last_overwork = __get_user_overwork(user_id, last_days_range, sid)
+    last_count, last_time = __get_user_calls(user_id, last_days_range)
+    last_overwork = __get_user_overwork(user_id, last_days_range)
     # get data from first 2 months
     first_start_day = date.today() - relativedelta(months=1)
     first_days_range = __get_date_range(first_start_day, 2)
-    first_count, first_time = __get_user_calls(user_id, first_days_range, sid)
-    first_overwork = __get_user_overwork(user_id, first_days_range, sid)
+    first_count, first_time = __get_user_calls(user_id, first_days_range)
+    first_overwork = __get_user_overwork(user_id, first_days_range)
+
+    Database.buffer_rows(
+        'UsersNeuralData',
+        (
+            'UserID', 'UserFirstCalls', 'UserLastCalls', 'UserFirstDuration', 'UserLastDuration', 'UserFirstOverwork', 'UserLastOverwork'
+        ),
+        [(user_id, first_count, last_count, first_time, last_time, first_overwork, last_overwork)],
+        key_columns=('UserID',)
+    )
 
-    Database.query(
-        """
-        INSERT INTO "UsersNeuralData"(
-            "UserID", "UserFirstCalls", "UserLastCalls", "UserFirstDuration", "UserLastDuration", "UserFirstOverwork", "UserLastOverwork"
-        )
-        VALUES (%s, %s, %s, %s, %s, %s, %s);
-        """,
-        (user_id, first_count, last_count, first_time, last_time, first_overwork, last_overwork)
+
+def __mine_user_days(user_id: int, sid: str, dates: list, progress=None):
+    """
+    Собирает статистику пользователя за указанные дни и пересчитывает данные,
+    зависящие от всего периода (выполнение плана, данные для нейросети).
+
+    :param user_id: идентификатор пользователя
+    :type user_id: int
+    :param sid: идентификатор сессии
+    :type sid: str
+    :param dates: список дат, по которым необходимо собрать статистику
+    :type dates: list
+    :param progress: функция progress(stage, done, total), вызываемая после каждого этапа, defaults to None
+    :type progress: callable, optional
+    """
+    stages = (
+        # Get user location and overwork
+        ('location', lambda: __get_user_location_and_overwork(user_id, sid, dates)),
+        # Get user activity
+        ('activity', lambda: __get_user_activity(user_id, sid, dates)),
+        # Get user plan percent
+        ('plan_percent', lambda: __get_user_plan_percent(user_id, sid)),
+        # Prepare neural dataset
+        ('neural_data', lambda: __get_user_neural_data(user_id))
     )
 
+    for ind, (stage, run_stage) in enumerate(stages):
+        run_stage()
 
-def mine_user_info(user_id: int, sid: str):
-    dates = __get_date_range(date.today())
-    # Get user location and overwork
-    __get_user_location_and_overwork(user_id, sid, dates)
+        if progress is not None:
+            progress(stage, ind + 1, len(stages) + 1)
 
-    # Get user activity
-    __get_user_activity(user_id, sid, dates)
 
-    # Get user plan percent
-    __get_user_plan_percent(user_id, sid)
+def __delete_user_data(user_id: int, window_start: str, mined_from: str = None):
+    """
+    Удаляет статистику пользователя, вышедшую за окно сбора данных,
+    а также дни начиная с mined_from, которые будут собраны повторно.
+    Данные, рассчитываемые по всему периоду, удаляются полностью.
+
+    :param user_id: идентификатор пользователя
+    :type user_id: int
+    :param window_start: первая дата окна сбора данных
+    :type window_start: str
+    :param mined_from: дата, начиная с которой данные будут собраны повторно, defaults to None
+    :type mined_from: str, optional
+    """
+    # keep all rows in the window if there is nothing to re-mine
+    mined_from = mined_from or 'infinity'
+
+    for table in ('UserActivity', 'UserOverwork', 'UserCalls', 'UserDailyArrival'):
+        Database.query(
+            'DELETE FROM "{table}" WHERE "UserID" = %s AND ("Date" < %s OR "Date" >= %s);'.format(table=table),
+            (user_id, window_start, mined_from)
+        )
 
-    # Prepare neural dataset
-    __get_user_neural_data(user_id, sid)
-    # Add user id in mined persons
     Database.query(
         """
-            INSERT INTO "MinedUsers"("UserID", "TotalDays")
-            VALUES (%s, %s);
+        DELETE FROM "UserLocation"
+        WHERE "UserID" = %s AND ("DateTime"::date < %s OR "DateTime"::date >= %s);
         """,
-        (user_id, len(dates))
+        (user_id, window_start, mined_from)
     )
 
+    for table in ('UserPlanPercent', 'UsersNeuralData'):
+        Database.query('DELETE FROM "{table}" WHERE "UserID" = %s;'.format(table=table), (user_id,))
+
+
+def __locked_by_user(func):
+    """
+    Сбор данных одного пользователя запросами, фоновыми задачами и предварительным сбором выполняется по очереди
+    """
+    @wraps(func)
+    def wrapper(user_id: int, *args, **kwargs):
+        with __user_locks_guard:
+            user_lock = __user_locks.setdefault(user_id, [threading.RLock(), 0])
+            user_lock[1] += 1
+
+        try:
+            with user_lock[0]:
+                return func(user_id, *args, **kwargs)
+        finally:
+            with __user_locks_guard:
+                user_lock[1] -= 1
+                if not user_lock[1]:
+                    del __user_locks[user_id]
+
+    return wrapper
+
+
+@__locked_by_user
+def mine_user_info(user_id: int, sid: str, progress=None):
+    """
+    Собирает статистику пользователя за весь период и рассчитывает его показатели.
+
+    :param user_id: идентификатор пользователя
+    :type user_id: int
+    :param sid: идентификатор сессии
+    :type sid: str
+    :param progress: функция progress(stage, done, total), вызываемая после каждого этапа, defaults to None
+    :type progress: callable, optional
+    """
+    dates = __get_date_range(date.today())
+
+    try:
+        __mine_user_days(user_id, sid, dates, progress)
+
+        # Add user id in mined persons
+        Database.buffer_rows(
+            'MinedUsers',
+            ('UserID', 'TotalDays', 'LastMinedDate'),
+            [(user_id, len(dates), date.today())],
+            key_columns=('UserID',)
+        )
+        Database.flush_rows()
+
+        update_user_scores(user_id)
+    except BaseException:
+        # rows flushed by previous stages must not be committed by next caller
+        Database.rollback_changes()
+        raise
+
+    # Apply database changes
+    Database.commit_changes()
+    user_info_cache.invalidate(user_id)
+
+
+@__locked_by_user
+def refresh_user_info(user_id: int, sid: str, progress=None):
+    """
+    Обновляет статистику уже собранного пользователя.
+    Запрашивает в СБИС только дни начиная с даты последнего сбора
+    (последний день мог быть собран не полностью) и сдвигает окно сбора данных.
+    Пользователи, собранные без даты последнего сбора, собираются заново полностью.
+
+    :param user_id: идентификатор пользователя
+    :type user_id: int
+    :param sid: идентификатор сессии
+    :type sid: str
+    :param progress: функция progress(stage, done, total), вызываемая после каждого этапа, defaults to None
+    :type progress: callable, optional
+    """
+    mined_user = Database.query_row('SELECT "LastMinedDate" FROM "MinedUsers" WHERE "UserID" = %s', (user_id,))
+
+    if not mined_user:
+        mine_user_info(user_id, sid, progress)
+        return
+
+    dates = __get_date_range(date.today())
+
+    if mined_user['LastMinedDate']:
+        last_mined_date = str(mined_user['LastMinedDate'])
+        new_dates = [day for day in dates if day >= last_mined_date]
+    else:
+        new_dates = dates
+
+    try:
+        __delete_user_data(user_id, dates[0], new_dates[0] if new_dates else None)
+
+        __mine_user_days(user_id, sid, new_dates, progress)
+        Database.flush_rows()
+
+        Database.query(
+            """
+                UPDATE "MinedUsers" SET "TotalDays" = %s, "LastMinedDate" = %s
+                WHERE "UserID" = %s;
+            """,
+            (len(dates), date.today(), user_id)
+        )
+
+        update_user_scores(user_id)
+    except BaseException:
+        # deleted and flushed rows must not be committed by next caller
+        Database.rollback_changes()
+        raise
+
     # Apply database changes
     Database.commit_changes()
+    user_info_cache.invalidate(user_id)
+
+
+def is_user_data_outdated(last_mined_date: date) -> bool:
+    """
+    Проверяет, устарели ли собранные данные пользователя.
+    Допустимый возраст данных в днях задается параметром refresh_age секции [Mining]
+    файла конфигурации (0 - не обновлять данные).
+
+    :param last_mined_date: дата последнего сбора данных
+    :type last_mined_date: date
+    :return: флаг необходимости обновления данных
+    :rtype: bool
+    """
+    refresh_age = Configuration.app_config.getint('Mining', 'refresh_age', fallback=1)
+
+    if refresh_age <= 0:
+        return False
+
+    return not last_mined_date or (date.today() - last_mined_date).days >= refresh_age
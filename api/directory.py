@@ -0,0 +1,197 @@
+"""
+Локальный справочник сотрудников для поиска контактов.
+Весь список сотрудников периодически загружается из СБИС (Staff.BrowserList) в индекс в памяти,
+поиск по началам слов ФИО выполняется без вызова СБИС. Настройки в секции [Directory] файла конфигурации.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from helpers import Configuration
+
+
+class EmployeeIndex():
+    """
+    Индекс сотрудников по началам слов ФИО: отсортированный список пар (слово ФИО, номер сотрудника),
+    слову запроса соответствует диапазон списка, найденный двоичным поиском.
+    """
+
+    def __init__(self, employees: list, name_words: list, session_id: str = None):
+        """
+        :param employees: сотрудники в порядке Staff.BrowserList
+        :type employees: list
+        :param name_words: слова ФИО каждого сотрудника в нижнем регистре (casefold)
+        :type name_words: list
+        :param session_id: сессия, с которой загружены сотрудники, defaults to None
+        :type session_id: str, optional
+        """
+        self.employees = employees
+        self.session_id = session_id
+        self.synced_at = time.time()
+
+        words = sorted(
+            (word, ind) for ind, employee_words in enumerate(name_words) for word in set(employee_words)
+        )
+        self.__words = [word for word, _ in words]
+        self.__owners = [ind for _, ind in words]
+
+    def __len__(self):
+        return len(self.employees)
+
+    def __find_prefix(self, prefix: str) -> set:
+        start = bisect_left(self.__words, prefix)
+        end = bisect_left(self.__words, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        return set(self.__owners[start:end])
+
+    def search(self, query_str: str, limit: int) -> list:
+        """
+        Ищет сотрудников, у которых с каждого слова запроса начинается какое-либо слово ФИО
+
+        :param query_str: строка запроса
+        :type query_str: str
+        :param limit: ограничение на количество возвращаемых записей
+        :type limit: int
+        :return: сотрудники в порядке Staff.BrowserList
+        :rtype: list
+        """
+        found = None
+
+        for query_word in query_str.casefold().split():
+            matches = self.__find_prefix(query_word)
+            found = matches if found is None else found & matches
+
+            if not found:
+                return []
+
+        indexes = sorted(found) if found is not None else range(len(self.employees))
+        return [self.employees[ind] for ind in indexes[:limit]]
+
+
+class EmployeeDirectory():
+    """
+    Индексы сотрудников по контрагентам с фоновой синхронизацией.
+    Период синхронизации задается параметром sync_interval (секунды, 0 - без синхронизации),
+    синхронизируемые контрагенты - параметром contragents, индекс старше max_age секунд устарел,
+    и поиск выполняется вызовом СБИС.
+    Состав сотрудников зависит от прав сессии, поэтому индекс используется только для сессии,
+    с которой он загружен.
+    """
+    __indexes = {}
+    __lock = threading.Lock()
+    __thread = None
+    __stats = {'searches': 0, 'index_hits': 0, 'fallbacks': 0, 'syncs': 0, 'sync_errors': 0}
+    __last_sync_duration = None
+
+    @classmethod
+    def __get_config(cls, option: str, fallback):
+        config = getattr(Configuration, 'app_config', None)
+
+        if config is None:
+            return fallback
+
+        return type(fallback)(config.get('Directory', option, fallback=str(fallback)))
+
+    @classmethod
+    def update(cls, contragent: str, index: EmployeeIndex):
+        """
+        Заменяет индекс контрагента
+
+        :param contragent: идентификатор контрагента
+        :type contragent: str
+        :param index: новый индекс
+        :type index: EmployeeIndex
+        """
+        with cls.__lock:
+            cls.__indexes[contragent] = index
+
+    @classmethod
+    def search(cls, query_str: str, contragent: str, session_id: str, limit: int) -> list:
+        """
+        Ищет сотрудников в локальном индексе
+
+        :param query_str: строка запроса
+        :type query_str: str
+        :param contragent: идентификатор контрагента
+        :type contragent: str
+        :param session_id: сессия пользователя
+        :type session_id: str
+        :param limit: ограничение на количество возвращаемых записей
+        :type limit: int
+        :return: сотрудники или None, если индекса сессии нет, он устарел или сотрудники не найдены
+            (сотрудник мог появиться после синхронизации)
+        :rtype: list
+        """
+        with cls.__lock:
+            index = cls.__indexes.get(contragent)
+            cls.__stats['searches'] += 1
+
+            if (index is None or index.session_id != session_id
+                    or time.time() - index.synced_at > cls.__get_config('max_age', 3600.0)):
+                cls.__stats['fallbacks'] += 1
+                return None
+
+        employees = index.search(query_str, limit)
+
+        with cls.__lock:
+            cls.__stats['index_hits' if employees else 'fallbacks'] += 1
+
+        return employees or None
+
+    @classmethod
+    def start(cls, sync):
+        """
+        Запускает поток фоновой синхронизации, если задан sync_interval
+
+        :param sync: функция sync(contragent), загружающая индекс контрагента
+        """
+        interval = cls.__get_config('sync_interval', 0.0)
+
+        if interval <= 0 or cls.__thread is not None:
+            return
+
+        contragents = [
+            contragent.strip() for contragent in cls.__get_config('contragents', '-2').split(',') if contragent.strip()
+        ]
+
+        cls.__thread = threading.Thread(
+            target=cls.__run, args=(sync, contragents, interval), name='directory-sync', daemon=True
+        )
+        cls.__thread.start()
+
+    @classmethod
+    def __run(cls, sync, contragents: list, interval: float):
+        while True:
+            for contragent in contragents:
+                start = time.monotonic()
+
+                try:
+                    sync(contragent)
+                except Exception as exc:
+                    counter = 'sync_errors'
+                    print('Employee directory sync of contragent {} failed: {}'.format(contragent, exc))
+                else:
+                    counter = 'syncs'
+
+                with cls.__lock:
+                    cls.__stats[counter] += 1
+                    cls.__last_sync_duration = time.monotonic() - start
+
+            time.sleep(interval)
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Счетчики поиска и синхронизации, размер и возраст индексов
+
+        :return: счетчики справочника
+        :rtype: dict
+        """
+        with cls.__lock:
+            return dict(
+                cls.__stats,
+                last_sync_duration=cls.__last_sync_duration,
+                indexes={
+                    contragent: {'size': len(index), 'age': time.time() - index.synced_at}
+                    for contragent, index in cls.__indexes.items()
+                }
+            )
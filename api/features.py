@@ -0,0 +1,119 @@
+"""
+Модуль векторного расчета признаков пользователя.
+Принимает столбцы значений (длительности, время суток) и считает по ним
+средние, отклонения и доли попаданий в интервал средствами NumPy.
+Пустой столбец дает 0 (scipy kmeans, считавший средние раньше, падал на пустом столбце).
+"""
+import re
+
+import numpy
+
+# ISO-8601 duration string returned by SBIS, e.g. P0DT1H2M3.5S
+DURATION_REGEXP = re.compile(r"P(?P<days>[\d]+)DT(?P<hours>[\d]+)H(?P<minutes>[\d]+)M(?P<seconds>[\d\.]+)S")
+
+# seconds in days, hours, minutes, seconds
+DURATION_UNITS = numpy.array([86400, 3600, 60, 1], dtype=float)
+CLOCK_UNITS = numpy.array([3600, 60, 1], dtype=float)
+
+
+def parse_duration(magic_string: str) -> int:
+    """
+    Преобразует строку длительности СБИС в секунды (дробные секунды отбрасываются)
+
+    :param magic_string: строка длительности СБИС
+    :type magic_string: str
+    :return: длительность в секундах
+    :rtype: int
+    """
+    days, hours, minutes, seconds = DURATION_REGEXP.match(magic_string).groups()
+    return int(days) * 86400 + int(hours) * 3600 + int(minutes) * 60 + int(float(seconds))
+
+
+def parse_durations(magic_strings: list) -> numpy.ndarray:
+    """
+    Преобразует столбец строк длительности СБИС в секунды (дробные секунды отбрасываются)
+
+    :param magic_strings: строки длительности СБИС, пустые значения считаются нулевыми
+    :type magic_strings: list
+    :return: длительности в секундах
+    :rtype: numpy.ndarray
+    """
+    parts = numpy.array(
+        [DURATION_REGEXP.match(value or "P0DT0H0M0S").groups() for value in magic_strings],
+        dtype=float
+    ).reshape(-1, 4)
+
+    return numpy.floor(parts) @ DURATION_UNITS
+
+
+def parse_clock_times(time_strings: list) -> numpy.ndarray:
+    """
+    Преобразует столбец строк времени '%H:%M:%S' в секунды от начала суток
+
+    :param time_strings: строки времени, пустые значения считаются нулевыми
+    :type time_strings: list
+    :return: время в секундах
+    :rtype: numpy.ndarray
+    """
+    parts = numpy.array(
+        [(value or '00:00:00').split(':') for value in time_strings],
+        dtype=float
+    ).reshape(-1, 3)
+
+    return parts @ CLOCK_UNITS
+
+
+def overwork(need_seconds, fact_seconds) -> numpy.ndarray:
+    """
+    Расчитывает переработку по дням. В случае недоработки переработка нулевая
+
+    :param need_seconds: необходимое время работы в секундах
+    :param fact_seconds: фактическое время работы в секундах
+    :return: переработка в секундах
+    :rtype: numpy.ndarray
+    """
+    return numpy.maximum(numpy.asarray(fact_seconds, dtype=float) - numpy.asarray(need_seconds, dtype=float), 0)
+
+
+def mean(values) -> float:
+    """
+    Среднее значение столбца, 0 для пустого столбца
+
+    :param values: столбец значений
+    :return: среднее значение
+    :rtype: float
+    """
+    values = numpy.asarray(values, dtype=float)
+    return float(values.mean()) if values.size else 0.0
+
+
+def deviation(values) -> float:
+    """
+    Стандартное отклонение столбца, 0 для пустого столбца
+
+    :param values: столбец значений
+    :return: стандартное отклонение
+    :rtype: float
+    """
+    values = numpy.asarray(values, dtype=float)
+    return float(values.std()) if values.size else 0.0
+
+
+def in_window_ratio(values, center: float, max_deviation: float) -> float:
+    """
+    Доля значений, строго попадающих в интервал (center - max_deviation, center + max_deviation)
+
+    :param values: столбец значений
+    :param center: центр интервала
+    :type center: float
+    :param max_deviation: половина ширины интервала
+    :type max_deviation: float
+    :return: доля значений в интервале, 0 для пустого столбца
+    :rtype: float
+    """
+    values = numpy.asarray(values, dtype=float)
+
+    if not values.size:
+        return 0.0
+
+    return float(numpy.count_nonzero(numpy.abs(values - center) < max_deviation) / values.size)
@@ -0,0 +1,206 @@
+"""
+Фоновая очередь сбора данных пользователей.
+Сбор статистики нового пользователя занимает несколько минут, поэтому он выполняется
+пулом фоновых потоков, а запрос получает идентификатор задачи и узнает ее состояние
+через /get_job_status.
+"""
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from api.data_miner import mine_user_info, refresh_user_info
+from helpers import Configuration, Database, Startup
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+JOB_MINE = 'mine'
+JOB_REFRESH = 'refresh'
+
+
+class MiningInProgress(Exception):
+    """
+    Данные пользователей еще собираются фоновыми задачами
+    """
+
+    def __init__(self, jobs: list, users_info: dict = None):
+        """
+        :param jobs: состояния задач сбора данных
+        :type jobs: list
+        :param users_info: показатели остальных пользователей по идентификаторам, defaults to None
+        :type users_info: dict, optional
+        """
+        super().__init__('Сбор данных пользователей выполняется: {}'.format(
+            ', '.join(str(job['user_id']) for job in jobs)
+        ))
+        self.jobs = jobs
+        self.users_info = users_info or {}
+
+
+class MiningJobs():
+    """
+    Очередь задач сбора данных с пулом рабочих потоков.
+    Кол-во потоков задается параметром workers секции [Jobs] файла конфигурации
+    (0 - сбор данных выполняется в потоке запроса), кол-во хранимых завершенных задач - параметром history.
+    Потоки работают только с пулом соединений с БД: в режиме одного соединения сбор данных
+    держал бы соединение, и все запросы к серверу ждали бы его окончания.
+    Задачи собирают данные новых пользователей или обновляют устаревшие данные уже собранных.
+    На одного пользователя в очереди может быть только одна незавершенная задача.
+    """
+    __jobs = OrderedDict()
+    __active_jobs = {}
+    __queue = queue.Queue()
+    __lock = threading.Lock()
+    __workers = []
+
+    @classmethod
+    def workers_count(cls) -> int:
+        config = getattr(Configuration, 'app_config', None)
+
+        if config is None or not Database.is_pooled():
+            return 0
+
+        return config.getint('Jobs', 'workers', fallback=0)
+
+    @classmethod
+    def __history_size(cls) -> int:
+        config = getattr(Configuration, 'app_config', None)
+        return config.getint('Jobs', 'history', fallback=1000) if config is not None else 1000
+
+    @classmethod
+    def __start_workers(cls):
+        # called under lock
+        for ind in range(len(cls.__workers), cls.workers_count()):
+            worker = threading.Thread(target=cls.__work, name='mining-worker-{}'.format(ind), daemon=True)
+            worker.start()
+            cls.__workers.append(worker)
+
+    @classmethod
+    def enqueue(cls, user_id: int, sid: str = None, kind: str = JOB_MINE) -> dict:
+        """
+        Ставит в очередь сбор данных пользователя.
+        Если по пользователю уже есть незавершенная задача, возвращается она.
+
+        :param user_id: идентификатор пользователя
+        :type user_id: int
+        :param sid: идентификатор сессии
+        :type sid: str, optional
+        :param kind: вид задачи: JOB_MINE - полный сбор, JOB_REFRESH - обновление собранных данных,
+            defaults to JOB_MINE
+        :type kind: str, optional
+        :return: состояние задачи
+        :rtype: dict
+        """
+        with cls.__lock:
+            job = cls.__active_jobs.get(user_id)
+
+            if job is None:
+                job = {
+                    'job_id': uuid.uuid4().hex,
+                    'user_id': user_id,
+                    'kind': kind,
+                    'state': JOB_QUEUED,
+                    'stage': None,
+                    'progress': 0.0,
+                    'error': None,
+                    'created_at': time.time(),
+                    'started_at': None,
+                    'finished_at': None,
+                    'sid': sid
+                }
+
+                cls.__jobs[job['job_id']] = job
+                cls.__active_jobs[user_id] = job
+                cls.__start_workers()
+                cls.__queue.put(job)
+
+            return cls.__public(job)
+
+    @classmethod
+    def get_status(cls, job_id: str) -> dict:
+        """
+        Возвращает состояние задачи
+
+        :param job_id: идентификатор задачи
+        :type job_id: str
+        :return: состояние задачи или None, если задача не найдена
+        :rtype: dict
+        """
+        with cls.__lock:
+            job = cls.__jobs.get(job_id)
+            return cls.__public(job) if job is not None else None
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Возвращает кол-во задач по состояниям и кол-во рабочих потоков
+
+        :return: счетчики очереди
+        :rtype: dict
+        """
+        with cls.__lock:
+            states = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_DONE: 0, JOB_FAILED: 0}
+
+            for job in cls.__jobs.values():
+                states[job['state']] += 1
+
+            return dict(states, workers=len(cls.__workers))
+
+    @staticmethod
+    def __public(job: dict) -> dict:
+        # session id is not shown to other clients
+        return {key: value for key, value in job.items() if key != 'sid'}
+
+    @classmethod
+    def __set_progress(cls, job: dict, stage: str, done: int, total: int):
+        with cls.__lock:
+            job['stage'] = stage
+            job['progress'] = round(done / total, 3) if total else 0.0
+
+    @classmethod
+    def __work(cls):
+        while True:
+            job = cls.__queue.get()
+
+            with cls.__lock:
+                job['state'] = JOB_RUNNING
+                job['started_at'] = time.time()
+
+            try:
+                Startup.require('database', 'neural_network')
+
+                mine = refresh_user_info if job['kind'] == JOB_REFRESH else mine_user_info
+
+                with Database.connection():
+                    mine(
+                        job['user_id'], job['sid'],
+                        progress=lambda stage, done, total: cls.__set_progress(job, stage, done, total)
+                    )
+            except BaseException as exc:
+                state, error = JOB_FAILED, str(exc)
+            else:
+                state, error = JOB_DONE, None
+
+            with cls.__lock:
+                job.update(state=state, error=error, finished_at=time.time(), sid=None)
+                if state == JOB_DONE:
+                    job['progress'] = 1.0
+
+                cls.__active_jobs.pop(job['user_id'], None)
+                cls.__forget_finished()
+
+            cls.__queue.task_done()
+
+    @classmethod
+    def __forget_finished(cls):
+        # called under lock, oldest finished jobs are removed
+        finished = [
+            job_id for job_id, job in cls.__jobs.items() if job['state'] in (JOB_DONE, JOB_FAILED)
+        ]
+
+        for job_id in finished[:max(len(finished) - cls.__history_size(), 0)]:
+            del cls.__jobs[job_id]
@@ -0,0 +1,150 @@
+"""
+Предварительный сбор данных всех сотрудников организации.
+Сотрудники перебираются постранично через Staff.BrowserList, новые пользователи собираются полностью,
+устаревшие обновляются. Запускается по расписанию (секция [Premining] файла конфигурации)
+или из командной строки:
+
+    python -m api.premining [contragent]
+"""
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from api.api import list_employees
+from api.data_miner import is_user_data_outdated, refresh_user_info
+from helpers import Configuration, Database, Startup
+
+
+def premine_organization(sid: str = None, contragent: str = "-2", workers: int = None) -> dict:
+    """
+    Собирает данные новых и обновляет данные устаревших сотрудников организации
+
+    :param sid: идентификатор сессии, defaults to None (session_id секции [SABY])
+    :type sid: str, optional
+    :param contragent: идентификатор контрагента, defaults to "-2"
+    :type contragent: str, optional
+    :param workers: кол-во пользователей, собираемых одновременно, defaults to None (workers секции [Premining])
+    :type workers: int, optional
+    :return: итоги сбора: кол-во сотрудников, собранных, обновленных, пропущенных, ошибок и длительность
+    :rtype: dict
+    :raises RuntimeError: БД подключена в режиме одного соединения
+    """
+    # in single connection mode premining would hold the connection and all requests would wait for it
+    if not Database.is_pooled():
+        raise RuntimeError('Предварительный сбор данных требует пула соединений с БД (pool_max секции [Database])')
+
+    start = time.monotonic()
+
+    if workers is None:
+        workers = Configuration.app_config.getint('Premining', 'workers', fallback=2)
+
+    user_ids = list(dict.fromkeys(
+        record['Лицо'] for record in list_employees(sid, contragent) if record.get('Лицо') is not None
+    ))
+
+    with Database.connection():
+        rows = Database.query(
+            'SELECT "UserID", "LastMinedDate" FROM "MinedUsers" WHERE "UserID" = any(%s)', (user_ids,)
+        )
+    last_mined_dates = {row['UserID']: row['LastMinedDate'] for row in rows or []}
+
+    summary = {'employees': len(user_ids), 'mined': 0, 'refreshed': 0, 'skipped': 0, 'failed': 0}
+    summary_lock = threading.Lock()
+
+    def premine_user(user_id):
+        if user_id not in last_mined_dates:
+            counter = 'mined'
+        elif is_user_data_outdated(last_mined_dates[user_id]):
+            counter = 'refreshed'
+        else:
+            counter = 'skipped'
+
+        try:
+            # user may be mined by request or background job meanwhile, mining of the same user waits for it,
+            # refresh mines new user completely and only requests days after last mining otherwise
+            if counter != 'skipped':
+                with Database.connection():
+                    refresh_user_info(user_id, sid)
+        except Exception as exc:
+            counter = 'failed'
+            print('Premining of user {} failed: {}'.format(user_id, exc))
+
+        with summary_lock:
+            summary[counter] += 1
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix='premining') as executor:
+        list(executor.map(premine_user, user_ids))
+
+    summary['duration'] = time.monotonic() - start
+    return summary
+
+
+class PreminingScheduler():
+    """
+    Ежедневный запуск предварительного сбора данных в заданное время
+    (параметр schedule секции [Premining] в формате ЧЧ:ММ, пустое значение - расписание отключено).
+    Расписание работает только с пулом соединений с БД, как и фоновая очередь сбора данных.
+    """
+    __thread = None
+    __last_summary = None
+
+    @classmethod
+    def start(cls):
+        """
+        Запускает поток расписания, если оно задано в файле конфигурации
+        """
+        schedule = Configuration.app_config.get('Premining', 'schedule', fallback='')
+
+        if not schedule or cls.__thread is not None:
+            return
+
+        # database may still be connecting in lazy mode, so pool is checked by config
+        if Configuration.app_config.getint('Database', 'pool_max', fallback=0) <= 0:
+            print('Premining schedule is disabled: [Database] pool_max is not set')
+            return
+
+        run_time = datetime.strptime(schedule, '%H:%M').time()
+        cls.__thread = threading.Thread(target=cls.__run, args=(run_time,), name='premining-schedule', daemon=True)
+        cls.__thread.start()
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Возвращает итоги последнего запуска по расписанию
+
+        :return: итоги сбора или None, если сбор еще не выполнялся
+        :rtype: dict
+        """
+        return cls.__last_summary
+
+    @classmethod
+    def __run(cls, run_time):
+        while True:
+            now = datetime.now()
+            next_run = datetime.combine(now.date(), run_time)
+
+            if next_run <= now:
+                next_run += timedelta(days=1)
+
+            time.sleep((next_run - now).total_seconds())
+
+            try:
+                Startup.require('database', 'neural_network')
+                cls.__last_summary = dict(premine_organization(), finished_at=str(datetime.now()))
+                print('Premining finished: {}'.format(cls.__last_summary))
+            except Exception as exc:
+                print('Premining failed: {}'.format(exc))
+
+
+if __name__ == '__main__':
+    from neural_network import NeuralNetwork
+    from saby_invoker import SabyInvoker
+
+    Configuration.load_configuration()
+    SabyInvoker.initialize()
+    Database.connect_to_database()
+    NeuralNetwork.initialize()
+
+    print(premine_organization(contragent=sys.argv[1] if len(sys.argv) > 1 else "-2"))
@@ -0,0 +1,357 @@
+"""
+Модуль расчета показателей пользователя по собранной статистике.
+Показатели сохраняются в таблицу "UserScores" при каждом сборе данных пользователя.
+"""
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy
+
+from api import features
+from helpers import Database, TTLCache
+from neural_network import NeuralNetwork
+
+NEURAL_DATA_FIELDS = (
+    "UserFirstCalls", "UserLastCalls", "UserFirstDuration", "UserLastDuration", "UserFirstOverwork", "UserLastOverwork"
+)
+
+# result field -> "UserScores" column
+SCORES_COLUMNS = {
+    'user_responsibility': 'Responsibility',
+    'user_sociability': 'Sociability',
+    'user_procrastination': 'Procrastination',
+    'user_often_leaving': 'OftenLeaving',
+    'user_punctuality': 'Punctuality',
+    'user_leaving_state': 'LeavingState'
+}
+
+# results of api.get_user_info by user id, invalidated when user data is mined
+user_info_cache = TTLCache('UserInfoCache')
+
+
+#   + Public methods
+def calculate_users_scores(user_ids: list) -> dict:
+    """
+    Расчитывает показатели пользователей по собранной статистике.
+    Данные всех пользователей получаются одним запросом, нейросеть вызывается один раз на всех.
+
+    :param user_ids: идентификаторы пользователей
+    :type user_ids: list
+    :return: показатели по идентификаторам пользователей (только уже собранных)
+    :rtype: dict
+    """
+    users_data = __query_users_data(user_ids)
+
+    leaving_states = __calculate_users_leaving_state(
+        [[user_data[field] for field in NEURAL_DATA_FIELDS] for user_data in users_data]
+    )
+
+    result = {}
+
+    for user_data, leaving_state in zip(users_data, leaving_states):
+        # user days count in dataset (except weekends)
+        total_days = user_data['TotalDays']
+
+        scores = {}
+
+        scores['user_responsibility'] = __calculate_user_responsibility(
+            user_data['PlanPercent'], user_data['TotalOverwork'], user_data['OverworkDays']
+        )
+        scores['user_sociability'] = __calculate_user_sociability(user_data['CommunicationTime'], total_days)
+        scores['user_procrastination'] = __calculate_user_procrastination(user_data['WastedTime'], total_days)
+        scores['user_often_leaving'] = __calculate_user_leaving(user_data['AvgLeavings'])
+        scores['user_punctuality'] = __calculate_user_punctuality(user_data['ComingTimes'])
+        scores['user_leaving_state'] = leaving_state
+
+        result[user_data['UserID']] = scores
+
+    return result
+
+
+def calculate_user_scores(user_id: int) -> dict:
+    """
+    Расчитывает показатели пользователя по собранной статистике
+
+    :param user_id: идентификатор пользователя
+    :type user_id: int
+    :return: показатели пользователя или None, если пользователь еще не собран
+    :rtype: dict
+    """
+    return calculate_users_scores([user_id]).get(user_id)
+
+
+def update_users_scores(user_ids: list) -> dict:
+    """
+    Пересчитывает показатели пользователей и сохраняет их в "UserScores".
+    Изменения не фиксируются, commit выполняет вызывающий код.
+
+    :param user_ids: идентификаторы пользователей
+    :type user_ids: list
+    :return: показатели по идентификаторам пользователей (только уже собранных)
+    :rtype: dict
+    """
+    users_scores = calculate_users_scores(user_ids)
+    updated_at = datetime.now(timezone.utc)
+
+    Database.buffer_rows(
+        'UserScores',
+        ('UserID', 'UpdatedAt') + tuple(SCORES_COLUMNS.values()),
+        [
+            (user_id, updated_at) + tuple(scores[field] for field in SCORES_COLUMNS)
+            for user_id, scores in users_scores.items()
+        ],
+        key_columns=('UserID',)
+    )
+    Database.flush_rows()
+
+    return users_scores
+
+
+def update_user_scores(user_id: int) -> dict:
+    """
+    Пересчитывает показатели пользователя и сохраняет их в "UserScores".
+    Изменения не фиксируются, commit выполняет вызывающий код.
+
+    :param user_id: идентификатор пользователя
+    :type user_id: int
+    :return: показатели пользователя или None, если пользователь еще не собран
+    :rtype: dict
+    """
+    return update_users_scores([user_id]).get(user_id)
+
+
+#   + Private methods
+def __query_users_data(user_ids: list) -> list:
+    """
+    Получает все исходные данные для расчета показателей пользователей одним запросом
+
+    :param user_ids: идентификаторы пользователей
+    :type user_ids: list
+    :return: данные собранных пользователей
+    :rtype: list
+    """
+    return Database.query(
+        """
+        with "PlanPercent" as (
+            select distinct on ("UserID") "UserID", "PlanPercent"
+            from "UserPlanPercent"
+            where "UserID" = any(%(user_ids)s)
+        ), "Overwork" as (
+            select "UserID", sum("Overwork") as "TotalOverwork", count("UserID") as "OverworkDays"
+            from "UserOverwork"
+            where "UserID" = any(%(user_ids)s)
+            group by "UserID"
+        ), "Procrastination" as (
+            select "UserID", sum("WastedTime") as "WastedTime"
+            from "UserActivity"
+            where "UserID" = any(%(user_ids)s) and "Useful" = -1
+            group by "UserID"
+        ), "Communication" as (
+            select "UserID", sum("WastedTime") as "CommunicationTime"
+            from "UserActivity"
+            where "UserID" = any(%(user_ids)s) and "Category" in ('Обмен сообщениями (IM, Почта)', 'Звонки СБИС')
+            group by "UserID"
+        ), "Leavings" as (
+            select "UserID", avg("LeaveCount") as "AvgLeavings"
+            from "UserDailyArrival"
+            where "UserID" = any(%(user_ids)s) and "LeaveCount" > 0
+            group by "UserID"
+        ), "Incoming" as (
+            select "UserID", array_agg(floor(extract(epoch from "FirstEntrance"))::float order by "Date") as "ComingTimes"
+            from "UserDailyArrival"
+            where "UserID" = any(%(user_ids)s) and "FirstEntrance" is not null
+            group by "UserID"
+        )
+        select
+            mined."UserID", mined."TotalDays", mined."LastMinedDate",
+            plan."PlanPercent",
+            overwork."TotalOverwork", overwork."OverworkDays",
+            procrastination."WastedTime",
+            communication."CommunicationTime",
+            leavings."AvgLeavings",
+            incoming."ComingTimes",
+            neural."UserFirstCalls", neural."UserLastCalls",
+            neural."UserFirstDuration", neural."UserLastDuration",
+            neural."UserFirstOverwork", neural."UserLastOverwork"
+        from "MinedUsers" as mined
+        left join "PlanPercent" as plan on plan."UserID" = mined."UserID"
+        left join "Overwork" as overwork on overwork."UserID" = mined."UserID"
+        left join "Procrastination" as procrastination on procrastination."UserID" = mined."UserID"
+        left join "Communication" as communication on communication."UserID" = mined."UserID"
+        left join "Leavings" as leavings on leavings."UserID" = mined."UserID"
+        left join "Incoming" as incoming on incoming."UserID" = mined."UserID"
+        left join "UsersNeuralData" as neural on neural."UserID" = mined."UserID"
+        where mined."UserID" = any(%(user_ids)s)
+        """,
+        {'user_ids': list(user_ids)}
+    ) or []
+
+
+def __calculate_users_leaving_state(users_neural_data: list) -> list:
+    """
+    Расчитывает вероятность ухода пользователей одним вызовом нейросети
+
+    :param users_neural_data: данные для нейросети по каждому пользователю
+    :type users_neural_data: list
+    :return: показатели по каждому пользователю (-1 для пользователей без данных)
+    :rtype: list
+    """
+    result = [-1] * len(users_neural_data)
+    complete_rows = [
+        ind for ind, neural_data in enumerate(users_neural_data) if all(value is not None for value in neural_data)
+    ]
+
+    if not complete_rows:
+        return result
+
+    try:
+        XpredictInputData = numpy.array([users_neural_data[ind] for ind in complete_rows], dtype=float)
+        predictions = NeuralNetwork.predict(XpredictInputData)
+    except BaseException as exc:
+        print(exc)
+        return result
+
+    for ind, prediction in zip(complete_rows, predictions):
+        result[ind] = int(round(prediction[0] * 10))
+
+    return result
+
+
+def __calculate_user_punctuality(coming_times: list) -> int:
+    """
+    Расчитывает показатель пунктуальности пользователя
+
+    :param coming_times: время прихода пользователя по дням в секундах от начала суток
+    :type coming_times: list
+    :return: показатель пунктуальности
+    :rtype: int
+    """
+    # !Settings
+    # max deviation minutes per day (setting)
+    MAX_DEVIATION = 30
+
+    if coming_times:
+        # convert max deviation to seconds
+        time_max_deviation = timedelta(minutes=MAX_DEVIATION).total_seconds()
+
+        # calculate average time and find punctual points around it
+        mean_time = features.mean(coming_times)
+
+        # no value is farther from the mean than deviation * sqrt(n - 1) (Samuelson's inequality),
+        # so a small spread means every day is punctual
+        if features.deviation(coming_times) * math.sqrt(len(coming_times) - 1) < time_max_deviation:
+            punctual_ratio = 1.0
+        else:
+            punctual_ratio = features.in_window_ratio(coming_times, mean_time, time_max_deviation)
+
+        return int(round(punctual_ratio * 10))
+
+    return -1
+
+
+def __calculate_user_leaving(avg_leavings) -> bool:
+    '''
+    Расчитывает флаг часто ли пользователь уходит из офиса
+
+    :param avg_leavings: среднее кол-во уходов из офиса за день
+    :return: флаг частого покидания офиса
+    :rtype: bool
+    '''
+
+    # !Settings
+    # max user leavings per day (setting)
+    MAX_LEAVING = 3
+
+    if avg_leavings:
+        return True if int(avg_leavings) > MAX_LEAVING else False
+    else:
+        return None
+
+
+def __calculate_user_procrastination(wasted_time: timedelta, total_days: int) -> int:
+    '''
+    Расчитывает показатель прокрастенации пользователя
+
+    :param wasted_time: суммарное время бесполезной активности пользователя
+    :type wasted_time: timedelta
+    :param total_days: кол-во дней по которым собрана статистика на пользователя
+    :type total_days: int
+    :return: [показатель прокрастенации пользователя
+    :rtype: int
+    '''
+
+    # !Settings
+    # max user procrastination minutes per day (setting)
+    MAX_PROCRASTINATION = 45
+
+    if wasted_time:
+        total_procrastenation = timedelta(minutes=MAX_PROCRASTINATION * total_days)
+        result = int(round(wasted_time.total_seconds() / total_procrastenation.total_seconds() * 10))
+
+        return 10 if result > 10 else result
+
+    else:
+        return 0
+
+
+def __calculate_user_sociability(communication_time: timedelta, total_days: int) -> int:
+    """
+    Расчитывает показатель комуникабельности человека
+
+    :param communication_time: суммарное время общения пользователя
+    :type communication_time: timedelta
+    :param total_days: кол-во дней по которым собрана статистика на пользователя
+    :type total_days: int
+    :return: аоказатель коммуникабельности
+    :rtype: int
+    """
+
+    # !Settings
+    # max user communication minutes per day (setting)
+    MAX_COMMUNICATION = 45
+
+    if communication_time:
+        max_user_communication = timedelta(minutes=MAX_COMMUNICATION * total_days)
+        result = int(round(communication_time.total_seconds() / max_user_communication.total_seconds() * 10))
+        return 10 if result > 10 else result
+    else:
+        return -1
+
+
+def __calculate_user_responsibility(user_plan_percent: int, total_overwork: timedelta, overwork_days: int) -> int:
+    '''
+    Расчитывает показатель ответственности человека
+
+    :param user_plan_percent: процент выполнения плана
+    :type user_plan_percent: int
+    :param total_overwork: суммарная переработка пользователя
+    :type total_overwork: timedelta
+    :param overwork_days: кол-во дней, по которым собраны переработки
+    :type overwork_days: int
+    :return: показатель ответственности человека
+    :rtype: int
+    '''
+
+    # !Settings
+    # max overwork hours per day (setting)
+    MAX_OVERWORK = 2
+
+    # if can't find overwork and plan info return unknown value
+    if not overwork_days and not user_plan_percent:
+        return -1
+
+    # if find only user plan info return plan percent
+    elif user_plan_percent and not overwork_days:
+        return int(user_plan_percent / 10)
+
+    # if find user overwork info
+    elif overwork_days:
+        # calculate overwork percents
+        total_max_overwork = timedelta(hours=MAX_OVERWORK * overwork_days)
+        overwork_percents = (total_overwork.total_seconds()/total_max_overwork.total_seconds()) * 100
+        overwork_percents = 100 if overwork_percents > 100 else overwork_percents
+
+        if user_plan_percent:
+            return int((overwork_percents + user_plan_percent) / 20)
+
+        return int(overwork_percents / 10)
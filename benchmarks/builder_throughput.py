@@ -0,0 +1,63 @@
+"""
+Замер пропускной способности построения Record: компилируемый build_record
+против прежнего построителя, выводящего формат записи при каждом вызове.
+Запуск из корня проекта: python -m benchmarks.builder_throughput [records]
+"""
+import sys
+import time
+
+from benchmarks.legacy_formats_builder import build_record as legacy_build_record
+from saby_invoker import SabyFormatsBuilder
+
+# records of the same shapes as filters and navigation sent by miner and get_contacts
+SAMPLE_RECORDS = {
+    'activity_filter': lambda ind: {"Date": "2020-01-{:02d}".format(ind % 28 + 1), "Person": ind},
+    'staff_filter': lambda ind: {
+        "CalcWorkState": True,
+        "ShowOtherEmployees": True,
+        "newList": True,
+        "showAsGroups": False,
+        "usePages": "full",
+        "ВернутьИдСервисаПрофилей": True,
+        "Контрагент": "-2",
+        "ПоощренияВзыскания": True,
+        "ПутьКУзлу": True,
+        "Разворот": "С разворотом",
+        "СтатусАктивности": True,
+        "СтрокаПоиска": "Иванов {}".format(ind),
+        "CurrentRoot": None
+    },
+    'navigation': lambda ind: {"ЕстьЕще": True, "РазмерСтраницы": 10, "Страница": ind}
+}
+
+
+def measure_builder_throughput(records: int = 100000) -> dict:
+    """
+    Замеряет кол-во построенных записей в секунду для каждого вида записи
+
+    :param records: кол-во записей в каждом замере, defaults to 100000
+    :type records: int, optional
+    :return: записей в секунду прежним и компилируемым построителем по видам записей
+    :rtype: dict
+    """
+    result = {}
+
+    for name, make_record in SAMPLE_RECORDS.items():
+        values = [make_record(ind) for ind in range(records)]
+
+        for builder_name, build in (('legacy', legacy_build_record), ('compiled', SabyFormatsBuilder.build_record)):
+            assert build(values[0]) == legacy_build_record(values[0])
+
+            start = time.monotonic()
+            for value in values:
+                build(value)
+            result['{}_{}'.format(name, builder_name)] = records / (time.monotonic() - start)
+
+    return result
+
+
+if __name__ == '__main__':
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    for mode, records_per_second in measure_builder_throughput(records).items():
+        print('{:<24} {:>12.1f} records/s'.format(mode, records_per_second))
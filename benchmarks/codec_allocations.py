@@ -0,0 +1,102 @@
+"""
+Замер памяти и времени обработки тела запроса и ответа сервера:
+прежний путь (decode, json.loads, json.dumps, str) против JsonCodec (байты на входе и выходе).
+Запуск из корня проекта: python -m benchmarks.codec_allocations [users] [iterations]
+"""
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from api.scores import SCORES_COLUMNS
+from helpers import JsonCodec
+
+
+def make_payloads(users: int = 50) -> tuple:
+    """
+    Тело запроса /get_user_info_batch и тело ответа на него.
+    Ответ собирается, как в сервере: строки "UserScores" отображаются через SCORES_COLUMNS
+    и дополняются идентификатором пользователя.
+
+    :param users: кол-во пользователей, defaults to 50
+    :type users: int, optional
+    :return: тело запроса (bytes) и ответ (list)
+    :rtype: tuple
+    """
+    user_ids = list(range(14890000, 14890000 + users))
+    request_body = json.dumps({'sid': '00000003-007537f4-00bd-310e086f458d384b', 'user_ids': user_ids}).encode()
+
+    # rows of api.api.__query_users_scores: mined user columns and "UserScores" row
+    updated_at = datetime(2020, 1, 31, 3, 0, tzinfo=timezone.utc)
+    users_scores = {
+        user_id: {
+            'MinedUserID': user_id,
+            'LastMinedDate': updated_at.date(),
+            'UserID': user_id,
+            'UpdatedAt': updated_at,
+            'Responsibility': ind % 11,
+            'Sociability': (ind * 3) % 11,
+            'Procrastination': (ind * 7) % 11,
+            'OftenLeaving': None if ind % 5 == 0 else ind % 2 == 0,
+            'Punctuality': -1 if ind % 9 == 0 else (ind * 5) % 11,
+            'LeavingState': None if ind % 13 == 0 else (ind * 2) % 11
+        }
+        for ind, user_id in enumerate(user_ids)
+    }
+    users_info = {
+        user_id: {field: user_scores[column] for field, column in SCORES_COLUMNS.items()}
+        for user_id, user_scores in users_scores.items()
+    }
+    response = [dict(users_info[user_id], user_id=user_id) for user_id in user_ids]
+
+    return request_body, response
+
+
+def legacy_roundtrip(request_body: bytes, response: list):
+    data = json.loads(request_body.decode())
+    return str(json.dumps(response)).encode(), data
+
+
+def codec_roundtrip(request_body: bytes, response: list):
+    data = JsonCodec.loads(request_body)
+    return JsonCodec.dumps(response), data
+
+
+def measure_codec(users: int = 50, iterations: int = 2000) -> dict:
+    """
+    Замеряет пиковый объем памяти одного запроса и время обработки для обоих путей
+
+    :param users: кол-во пользователей в запросе, defaults to 50
+    :type users: int, optional
+    :param iterations: кол-во запросов при замере времени, defaults to 2000
+    :type iterations: int, optional
+    :return: пиковая память (байт) и время (мкс) одного запроса по каждому пути
+    :rtype: dict
+    """
+    request_body, response = make_payloads(users)
+    result = {'backend': JsonCodec.backend()}
+
+    for name, roundtrip in (('legacy', legacy_roundtrip), ('codec', codec_roundtrip)):
+        roundtrip(request_body, response)
+
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        roundtrip(request_body, response)
+        result[name + '_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            roundtrip(request_body, response)
+        result[name + '_us'] = (time.perf_counter() - start) / iterations * 1e6
+
+    return result
+
+
+if __name__ == '__main__':
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    for name, value in measure_codec(users, iterations).items():
+        print('{:<20} {}'.format(name, value if type(value) is str else round(value, 1)))
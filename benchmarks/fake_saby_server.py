@@ -0,0 +1,115 @@
+"""
+Локальный заменитель sbis-rpc-service300.dll для офлайн замеров.
+Отвечает на JSON-RPC запросы по протоколу HTTP/1.1 с keep-alive,
+результат метода возвращает зарегистрированный обработчик.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeSabyServer():
+    """
+    Fake SBIS RPC server running in background thread
+    """
+
+    def __init__(self, handlers: dict = None, latency: float = 0.0, host: str = '127.0.0.1', port: int = 0):
+        """
+        :param handlers: method name -> function(params) returning method result, defaults to None
+        :type handlers: dict, optional
+        :param latency: delay of every response in seconds, defaults to 0.0
+        :type latency: float, optional
+        :param host: listening host, defaults to '127.0.0.1'
+        :type host: str, optional
+        :param port: listening port, 0 - any free port, defaults to 0
+        :type port: int, optional
+        """
+        self.handlers = dict(handlers or {})
+        self.latency = latency
+        self.requests_count = 0
+        self.__lock = threading.Lock()
+        self.__server = ThreadingHTTPServer((host, port), self.__make_handler())
+        self.__server.daemon_threads = True
+        self.__thread = None
+
+    @property
+    def address(self) -> str:
+        """
+        Site address for RpcInvoker.initialize
+        """
+        host, port = self.__server.server_address[:2]
+        return 'http://{}:{}/'.format(host, port)
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name='fake-saby', daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def count_request(self):
+        with self.__lock:
+            self.requests_count += 1
+
+    def handle_call(self, call: dict) -> dict:
+        """
+        Build JSON-RPC response for one call.
+
+        :param call: JSON-RPC call
+        :type call: dict
+        :return: JSON-RPC response
+        :rtype: dict
+        """
+        handler = self.handlers.get(call.get('method'))
+
+        if handler is None:
+            return {'jsonrpc': '2.0', 'id': call.get('id'), 'error': 'Метод {} не найден'.format(call.get('method'))}
+
+        return {'jsonrpc': '2.0', 'id': call.get('id'), 'result': handler(call.get('params') or {})}
+
+    def handle_body(self, body):
+        """
+        Build response body for request body, JSON-RPC batch is answered with array.
+
+        :param body: decoded JSON request body
+        :return: decoded JSON response body
+        """
+        if isinstance(body, list):
+            return [self.handle_call(call) for call in body]
+
+        return self.handle_call(body)
+
+    def __make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                server.count_request()
+                request_body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+
+                if server.latency:
+                    time.sleep(server.latency)
+
+                response_body = json.dumps(server.handle_body(request_body)).encode()
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(response_body)))
+                self.end_headers()
+                self.wfile.write(response_body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,70 @@
+"""
+Замер пропускной способности RpcInvoker на локальном заменителе СБИС.
+Запуск из корня проекта: python -m benchmarks.rpc_throughput [calls] [latency]
+"""
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_saby_server import FakeSabyServer
+from saby_invoker import SabyInvoker
+
+SESSION_ID = 'benchmark'
+
+
+def measure_rpc_throughput(calls: int = 500, latency: float = 0.0, workers: int = 16) -> dict:
+    """
+    Замеряет кол-во вызовов в секунду: последовательно, из пула потоков и асинхронно
+
+    :param calls: кол-во вызовов в каждом замере, defaults to 500
+    :type calls: int, optional
+    :param latency: задержка ответа сервера в секундах, defaults to 0.0
+    :type latency: float, optional
+    :param workers: кол-во потоков и одновременных асинхронных вызовов, defaults to 16
+    :type workers: int, optional
+    :return: вызовов в секунду по каждому режиму
+    :rtype: dict
+    """
+    result = {}
+
+    with FakeSabyServer({'Bench.Echo': lambda params: params}, latency=latency) as server:
+        SabyInvoker.initialize(server.address, connections_limit=workers)
+
+        def invoke(ind):
+            return SabyInvoker.invoke('Bench.Echo', SESSION_ID, Index=ind)
+
+        start = time.monotonic()
+        for ind in range(calls):
+            invoke(ind)
+        result['sync_sequential'] = calls / (time.monotonic() - start)
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(invoke, range(calls)))
+        result['sync_threads'] = calls / (time.monotonic() - start)
+
+        async def invoke_all():
+            semaphore = asyncio.Semaphore(workers)
+
+            async def invoke_async(ind):
+                async with semaphore:
+                    return await SabyInvoker.invoke_async('Bench.Echo', SESSION_ID, Index=ind)
+
+            await asyncio.gather(*(invoke_async(ind) for ind in range(calls)))
+
+        start = time.monotonic()
+        asyncio.run(invoke_all())
+        result['async'] = calls / (time.monotonic() - start)
+
+        SabyInvoker.close()
+
+    return result
+
+
+if __name__ == '__main__':
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+
+    for mode, calls_per_second in measure_rpc_throughput(calls, latency).items():
+        print('{:<16} {:>10.1f} calls/s'.format(mode, calls_per_second))
@@ -0,0 +1,293 @@
+"""
+Офлайн набор замеров: локальный заменитель СБИС с синтетическими ответами и задержкой,
+отдельная БД замеров, результаты сохраняются в JSON для сравнения между версиями.
+Запуск из корня проекта:
+
+    python -m benchmarks.suite [--users N] [--latency S] [--output FILE] [--compare BASELINE]
+
+Замеры сбора данных и get_user_info выполняются на БД [Benchmark] database
+(сервер и учетные данные из секции [Database] файла application.ini), без БД они пропускаются.
+"""
+import argparse
+import os
+import platform
+import statistics
+import time
+import traceback
+from configparser import ConfigParser
+
+from benchmarks import synthetic
+from benchmarks.builder_throughput import measure_builder_throughput
+from benchmarks.fake_saby_server import FakeSabyServer
+from helpers import Configuration, Database, JsonCodec
+from saby_invoker import SabyInvoker
+from saby_invoker.saby_formats_parser import parse_value
+
+SESSION_ID = 'benchmark'
+FIRST_USER_ID = 900000000
+
+# tables with user data, cleared before mining benchmark users
+USER_TABLES = (
+    'MinedUsers', 'UserActivity', 'UserLocation', 'UserOverwork', 'UserCalls', 'UserDailyArrival',
+    'UserPlanPercent', 'UsersNeuralData', 'UserScores'
+)
+
+
+def __latency_stats(durations: list) -> dict:
+    durations = sorted(durations)
+    return {
+        'count': len(durations),
+        'mean_ms': statistics.mean(durations) * 1e3,
+        'p50_ms': durations[len(durations) // 2] * 1e3,
+        'p95_ms': durations[min(int(len(durations) * 0.95), len(durations) - 1)] * 1e3,
+        'max_ms': durations[-1] * 1e3
+    }
+
+
+def measure_parser(iterations: int = 500) -> dict:
+    """
+    Пропускная способность разбора ответа PersonProductivityStatistic и чтения полей, используемых сборщиком
+
+    :return: строк в секунду
+    :rtype: dict
+    """
+    body = JsonCodec.dumps(synthetic.day_activity({
+        'Фильтр': {'s': [{'n': 'Date'}, {'n': 'Person'}], 'd': ['2020-01-01', FIRST_USER_ID]}
+    }))
+    rows_count = 0
+    start = time.perf_counter()
+
+    for _ in range(iterations):
+        for activity in parse_value(JsonCodec.loads(body))['rec']:
+            if activity['Parent@']:
+                activity['Name'], activity['Useful'], activity['Duration']
+            rows_count += 1
+
+    return {'rows_per_second': rows_count / (time.perf_counter() - start)}
+
+
+def measure_inference(dataset_path: str = 'dataset.csv', iterations: int = 200) -> dict:
+    """
+    Скорость предсказаний нейросети: пакетом по всему набору данных и по одной строке
+
+    :return: строк в секунду пакетом и вызовов в секунду по одной строке
+    :rtype: dict
+    """
+    import numpy
+
+    from neural_network import NeuralNetwork
+
+    if NeuralNetwork.model is None:
+        NeuralNetwork.initialize()
+
+    input_data = numpy.loadtxt(dataset_path, delimiter=',')[:, :6]
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        NeuralNetwork.predict(input_data)
+    batch_rate = len(input_data) * iterations / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for ind in range(iterations):
+        NeuralNetwork.predict(input_data[ind % len(input_data):ind % len(input_data) + 1])
+    single_rate = iterations / (time.perf_counter() - start)
+
+    return {
+        'engine': Configuration.app_config.get('NeuralNetwork', 'engine', fallback='keras'),
+        'batch_rows_per_second': batch_rate,
+        'single_calls_per_second': single_rate
+    }
+
+
+def __prepare_database(user_ids: list):
+    Configuration.app_config['Database']['dbname'] = Configuration.app_config.get(
+        'Benchmark', 'database', fallback='employee_info_benchmark'
+    )
+    Database.connect_to_database()
+
+    with Database.connection():
+        for table in USER_TABLES:
+            Database.query('DELETE FROM "{}" WHERE "UserID" = any(%s);'.format(table), (user_ids,))
+        Database.commit_changes()
+
+
+def measure_mining(user_ids: list) -> dict:
+    """
+    Время полного сбора данных пользователей mine_user_info
+
+    :return: статистика времени сбора одного пользователя
+    :rtype: dict
+    """
+    from api import mine_user_info
+
+    durations = []
+
+    for user_id in user_ids:
+        start = time.perf_counter()
+        with Database.connection():
+            mine_user_info(user_id, SESSION_ID)
+        durations.append(time.perf_counter() - start)
+
+    return dict(__latency_stats(durations), total_s=sum(durations))
+
+
+def measure_user_info(user_ids: list, iterations: int = 200) -> dict:
+    """
+    Задержка get_user_info собранных пользователей: с чтением из БД и из кэша показателей
+
+    :return: статистика задержки по обоим вариантам
+    :rtype: dict
+    """
+    from api import get_user_info
+    from api.scores import user_info_cache
+
+    uncached, cached = [], []
+
+    for ind in range(iterations):
+        user_id = user_ids[ind % len(user_ids)]
+
+        user_info_cache.invalidate(user_id)
+        start = time.perf_counter()
+        with Database.connection():
+            get_user_info(user_id, SESSION_ID)
+        uncached.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        get_user_info(user_id, SESSION_ID)
+        cached.append(time.perf_counter() - start)
+
+    return {'database': __latency_stats(uncached), 'cached': __latency_stats(cached)}
+
+
+def __load_configuration():
+    try:
+        Configuration.load_configuration()
+    except FileNotFoundError:
+        Configuration.app_config = ConfigParser()
+
+    config = Configuration.app_config
+
+    for section in ('SABY', 'Jobs', 'SabyCache', 'UserInfoCache'):
+        if not config.has_section(section):
+            config.add_section(section)
+
+    config['SABY']['session_id'] = SESSION_ID
+    # mining is measured in the calling thread, every SBIS call goes to the fake server
+    config['Jobs']['workers'] = '0'
+    config['SabyCache']['path'] = ''
+
+
+def run_suite(users: int = 5, latency: float = 0.005, records: int = 50000) -> dict:
+    """
+    Выполняет все замеры. Ошибка замера сохраняется в его результат, остальные замеры выполняются.
+
+    :param users: кол-во собираемых пользователей, defaults to 5
+    :type users: int, optional
+    :param latency: задержка ответа заменителя СБИС в секундах, defaults to 0.005
+    :type latency: float, optional
+    :param records: кол-во записей в замере построителя, defaults to 50000
+    :type records: int, optional
+    :return: метаданные запуска и результаты замеров
+    :rtype: dict
+    """
+    __load_configuration()
+    user_ids = list(range(FIRST_USER_ID, FIRST_USER_ID + users))
+    results = {}
+
+    def run(name, measure, *args) -> bool:
+        print('{}...'.format(name))
+        try:
+            result = measure(*args)
+        except Exception as exc:
+            traceback.print_exc()
+            results[name] = {'error': '{}: {}'.format(type(exc).__name__, exc)}
+            return False
+
+        if result is not None:
+            results[name] = result
+        return True
+
+    run('parser', measure_parser)
+    run('builder', measure_builder_throughput, records)
+    run('inference', measure_inference)
+
+    with FakeSabyServer(synthetic.HANDLERS, latency=latency) as server:
+        SabyInvoker.initialize(server.address)
+
+        # database benchmarks are skipped without benchmark database
+        if run('database', __prepare_database, user_ids):
+            run('mine_user_info', measure_mining, user_ids)
+            run('get_user_info', measure_user_info, user_ids)
+
+        results['fake_saby_requests'] = server.requests_count
+        SabyInvoker.close()
+
+    return {
+        'meta': {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'json_backend': JsonCodec.backend(),
+            'users': users,
+            'latency': latency
+        },
+        'results': results
+    }
+
+
+def __flatten(value, prefix: str = '') -> dict:
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(__flatten(item, '{}.{}'.format(prefix, key) if prefix else key))
+        return flat
+
+    return {prefix: value} if type(value) in (int, float) else {}
+
+
+def compare_results(baseline: dict, current: dict) -> list:
+    """
+    Сравнивает числовые результаты двух запусков
+
+    :return: строки (метрика, базовое значение, текущее значение, отношение текущего к базовому)
+    :rtype: list
+    """
+    baseline, current = __flatten(baseline['results']), __flatten(current['results'])
+
+    return [
+        (metric, baseline[metric], value, value / baseline[metric] if baseline[metric] else None)
+        for metric, value in current.items() if metric in baseline
+    ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline benchmark suite')
+    parser.add_argument('--users', type=int, default=5, help='users mined by mine_user_info benchmark')
+    parser.add_argument('--latency', type=float, default=0.005, help='fake SBIS response latency in seconds')
+    parser.add_argument('--records', type=int, default=50000, help='records built by builder benchmark')
+    parser.add_argument('--output', default=None, help='results JSON file, defaults to benchmarks/results/<time>.json')
+    parser.add_argument('--compare', default=None, help='baseline results JSON file to compare with')
+    args = parser.parse_args()
+
+    suite_result = run_suite(args.users, args.latency, args.records)
+
+    output = args.output or os.path.join(
+        'benchmarks', 'results', '{}.json'.format(suite_result['meta']['started_at'].replace(':', '-'))
+    )
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'wb') as output_file:
+        output_file.write(JsonCodec.dumps(suite_result))
+    print('results saved to {}'.format(output))
+
+    for metric, value in sorted(__flatten(suite_result['results']).items()):
+        print('{:<40} {:>14.2f}'.format(metric, value))
+
+    if args.compare:
+        with open(args.compare, 'rb') as baseline_file:
+            comparison = compare_results(JsonCodec.loads(baseline_file.read()), suite_result)
+
+        print('\n{:<40} {:>14} {:>14} {:>8}'.format('metric', 'baseline', 'current', 'ratio'))
+        for metric, baseline_value, value, ratio in comparison:
+            print('{:<40} {:>14.2f} {:>14.2f} {:>8}'.format(
+                metric, baseline_value, value, '{:.2f}'.format(ratio) if ratio is not None else '-'
+            ))
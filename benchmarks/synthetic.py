@@ -0,0 +1,129 @@
+"""
+Синтетические ответы методов СБИС для офлайн замеров.
+Данные детерминированы: один и тот же пользователь и день всегда дают один и тот же ответ.
+"""
+import random
+from datetime import datetime, timedelta
+
+from saby_invoker import SabyFormatsBuilder
+
+ACTIVITY_CATEGORIES = (
+    ('Документы', 1), ('Задачи', 1), ('Переписка', 1), ('Совещания', 1),
+    ('Новости', 0), ('Соцсети', -1), ('Развлечения', -1), ('Прочее', 0)
+)
+
+
+def __rng(*seed) -> random.Random:
+    return random.Random(':'.join(str(part) for part in seed))
+
+
+def __duration(seconds: int) -> str:
+    return 'P0DT{}H{}M{}S'.format(seconds // 3600, seconds % 3600 // 60, seconds % 60)
+
+
+def __clock(seconds: int) -> str:
+    return '{:02d}:{:02d}:{:02d}'.format(seconds // 3600, seconds % 3600 // 60, seconds % 60)
+
+
+def recordset(rows: list, outcome: dict = None, more: bool = None) -> dict:
+    """
+    SABY RecordSet format, with outcome and navigation if outcome is given
+
+    :param rows: records of the same format
+    :type rows: list
+    :param outcome: outcome record, defaults to None
+    :type outcome: dict, optional
+    :param more: navigation flag, defaults to None
+    :type more: bool, optional
+    :return: SABY RecordSet format
+    :rtype: dict
+    """
+    result = SabyFormatsBuilder.build_recordset(rows) if rows else {'_type': 'recordset', 's': [], 'd': []}
+
+    if outcome is not None:
+        result['r'] = SabyFormatsBuilder.build_record(outcome)
+        result['n'] = more
+
+    return result
+
+
+def day_location(params: dict) -> dict:
+    """
+    Местоположение.СводкаЗаДень: приход, отлучки и уход сотрудника за день
+    """
+    user_id, day = params['ЧастноеЛицо'], params['Дата']
+    rng = __rng('location', user_id, day)
+    day_start = datetime.strptime(day, '%Y-%m-%d')
+
+    arrival = 8 * 3600 + rng.randint(0, 90 * 60)
+    leave = arrival + 8 * 3600 + rng.randint(-60 * 60, 2 * 3600)
+    events = [(arrival, 1)]
+
+    for _ in range(rng.randint(0, 3)):
+        went_out = rng.randint(arrival + 3600, leave - 3600)
+        events += [(went_out, 0), (went_out + rng.randint(5 * 60, 60 * 60), 1)]
+
+    events.append((leave, 0))
+
+    details = [
+        {
+            'Описание': 'entrance',
+            'ВремяНачало': str(day_start + timedelta(seconds=moment)) + '+03',
+            'Действие': action
+        }
+        for moment, action in sorted(events)
+    ] + [
+        {'Описание': 'activity', 'ВремяНачало': str(day_start + timedelta(seconds=arrival + 600)) + '+03', 'Действие': 2}
+    ]
+
+    summary = {'ВремяРаботыГрафик': '08:00:00', 'ВремяРаботы': __clock(leave - arrival)}
+
+    return {
+        '_type': 'record',
+        's': [{'n': 'activity_summary', 't': 'Запись'}, {'n': 'activity_detail', 't': 'Выборка'}],
+        'd': [SabyFormatsBuilder.build_record(summary), recordset(details, outcome={})]
+    }
+
+
+def day_activity(params: dict) -> dict:
+    """
+    Report.PersonProductivityStatistic: время по категориям активности за день
+    """
+    day_filter = params['Фильтр']
+    values = dict(zip((field['n'] for field in day_filter['s']), day_filter['d']))
+    rng = __rng('activity', values['Person'], values['Date'])
+
+    rows = [{'Name': 'Итого', 'Useful': 0, 'Duration': __duration(0), 'Parent@': False}]
+    rows += [
+        {'Name': name, 'Useful': useful, 'Duration': __duration(rng.randint(0, 3 * 3600)), 'Parent@': True}
+        for name, useful in ACTIVITY_CATEGORIES
+        for _ in range(rng.randint(1, 4))
+    ]
+
+    return recordset(rows, outcome={})
+
+
+def day_calls(params: dict) -> dict:
+    """
+    CallInfo.GetCountByFaceId: исходящие звонки за день
+    """
+    rng = __rng('calls', params['person'], params['ДатаС'])
+    count = rng.randint(0, 15)
+    return {'call_count_out': count, 'call_time_out': __duration(count * rng.randint(30, 300))}
+
+
+def plan_percent(params: dict) -> dict:
+    """
+    ПланРабот.ПунктыНаКарточкеСотрудника: процент выполнения плана в итогах выборки
+    """
+    plan_filter = params['Фильтр']
+    values = dict(zip((field['n'] for field in plan_filter['s']), plan_filter['d']))
+    return recordset([], outcome={'Процент': __rng('plan', values['ЧастноеЛицо']).randint(40, 120)})
+
+
+HANDLERS = {
+    'Местоположение.СводкаЗаДень': day_location,
+    'Report.PersonProductivityStatistic': day_activity,
+    'CallInfo.GetCountByFaceId': day_calls,
+    'ПланРабот.ПунктыНаКарточкеСотрудника': plan_percent
+}
@@ -1,2 +1,5 @@
 from helpers.configuration import Configuration
 from helpers.database import Database
+from helpers.cache import TTLCache
+from helpers.codec import JsonCodec
+from helpers.startup import Startup
@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import OrderedDict
+
+from helpers import Configuration
+
+
+class TTLCache():
+    """
+    Thread-safe in-memory LRU cache with entries time to live.
+    Cache settings are read from config section on first use:
+    ttl - entry time to live in seconds, size - max entries count.
+    A value computed from a storage read can be put with the generation taken before the read,
+    then the write is dropped if the entry was invalidated meanwhile.
+    """
+
+    def __init__(self, config_section: str, default_ttl: float = 300, default_size: int = 1024):
+        """
+        :param config_section: config section with cache settings
+        :type config_section: str
+        :param default_ttl: entry time to live in seconds, defaults to 300
+        :type default_ttl: float, optional
+        :param default_size: max entries count, defaults to 1024
+        :type default_size: int, optional
+        """
+        self.__config_section = config_section
+        self.__ttl = default_ttl
+        self.__size = default_size
+        self.__configured = False
+
+        self.__entries = OrderedDict()
+        self.__generation = 0
+        self.__invalidated = {}
+        self.__cleared = 0
+        self.__lock = threading.Lock()
+        self.__stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def __configure(self):
+        config = getattr(Configuration, 'app_config', None)
+
+        if config is not None:
+            self.__ttl = config.getfloat(self.__config_section, 'ttl', fallback=self.__ttl)
+            self.__size = config.getint(self.__config_section, 'size', fallback=self.__size)
+
+        self.__configured = True
+
+    def get(self, key, default=None):
+        """
+        Get cached value. Expired entry is removed.
+
+        :param key: entry key
+        :param default: value returned for missing entry, defaults to None
+        :return: cached value
+        """
+        with self.__lock:
+            if not self.__configured:
+                self.__configure()
+
+            entry = self.__entries.get(key)
+
+            if entry is not None and entry[0] <= time.monotonic():
+                del self.__entries[key]
+                self.__stats['expirations'] += 1
+                entry = None
+
+            if entry is None:
+                self.__stats['misses'] += 1
+                return default
+
+            self.__entries.move_to_end(key)
+            self.__stats['hits'] += 1
+            return entry[1]
+
+    def generation(self) -> int:
+        """
+        Get current cache generation. Take it before reading the value from storage and pass it to set.
+
+        :return: cache generation
+        :rtype: int
+        """
+        with self.__lock:
+            return self.__generation
+
+    def set(self, key, value, generation: int = None):
+        """
+        Put value to cache. Least recently used entries are evicted when cache is full.
+
+        :param key: entry key
+        :param value: cached value
+        :param generation: cache generation taken before the value was read,
+            the value is dropped if the entry was invalidated after it, defaults to None
+        :type generation: int, optional
+        """
+        with self.__lock:
+            if not self.__configured:
+                self.__configure()
+
+            if self.__ttl <= 0 or self.__size <= 0:
+                return
+
+            if generation is not None and max(self.__cleared, self.__invalidated.get(key, 0)) > generation:
+                return
+
+            self.__entries[key] = (time.monotonic() + self.__ttl, value)
+            self.__entries.move_to_end(key)
+
+            while len(self.__entries) > self.__size:
+                self.__entries.popitem(last=False)
+                self.__stats['evictions'] += 1
+
+    def invalidate(self, key):
+        """
+        Remove entry from cache.
+
+        :param key: entry key
+        """
+        with self.__lock:
+            self.__entries.pop(key, None)
+            self.__generation += 1
+
+            # Invalidation marks are bounded: dropping them all is recorded as a clear
+            if len(self.__invalidated) >= max(self.__size, 1) * 4:
+                self.__invalidated.clear()
+                self.__cleared = self.__generation - 1
+
+            self.__invalidated[key] = self.__generation
+
+    def clear(self):
+        """
+        Remove all entries from cache.
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.__invalidated.clear()
+            self.__generation += 1
+            self.__cleared = self.__generation
+
+    def stats(self) -> dict:
+        """
+        Get cache counters: hits, misses, evictions, expirations and current size.
+
+        :return: cache counters
+        :rtype: dict
+        """
+        with self.__lock:
+            return dict(self.__stats, size=len(self.__entries), max_size=self.__size, ttl=self.__ttl)
@@ -0,0 +1,156 @@
+import json
+from collections.abc import Mapping, Sequence
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+from helpers import Configuration
+
+BACKENDS = ('orjson', 'simplejson', 'json')
+
+
+class JsonCodec():
+    """
+    Кодирование и декодирование JSON подключаемой библиотекой.
+    Значения кодируются сразу в компактные байты UTF-8 и декодируются из байтов,
+    тела запросов и ответов не копируются в промежуточные строки.
+    Библиотека задается параметром json_backend секции [Server] файла конфигурации:
+    orjson, simplejson, json или auto (по умолчанию) - самая быстрая из установленных.
+    """
+    __backend = None
+    __dumps = None
+    __loads = None
+
+    @staticmethod
+    def __default(value):
+        """
+        Преобразует значение, которое не поддерживает библиотека JSON: представления Record и RecordSet СБИС,
+        Decimal, значения NumPy, даты и UUID
+        """
+        if isinstance(value, Mapping):
+            return dict(value)
+
+        if isinstance(value, Sequence) and not isinstance(value, (str, bytes, bytearray)):
+            return list(value)
+
+        if isinstance(value, Decimal):
+            return float(value)
+
+        if isinstance(value, (date, datetime, time)):
+            return value.isoformat()
+
+        if isinstance(value, UUID):
+            return str(value)
+
+        if hasattr(value, 'tolist'):
+            return value.tolist()
+
+        raise TypeError('Object of type {} is not JSON serializable'.format(type(value).__name__))
+
+    @classmethod
+    def use(cls, backend: str = 'auto'):
+        """
+        Выбирает библиотеку JSON
+
+        :param backend: название библиотеки или 'auto', defaults to 'auto'
+        :type backend: str, optional
+        """
+        loaders = {'orjson': cls.__load_orjson, 'simplejson': cls.__load_simplejson, 'json': cls.__load_json}
+        names = BACKENDS if backend == 'auto' else (backend,)
+
+        for name in names:
+            if name not in loaders:
+                raise ValueError('Неизвестная библиотека JSON: {}'.format(name))
+
+            try:
+                cls.__dumps, cls.__loads = loaders[name]()
+            except ImportError:
+                if backend != 'auto':
+                    raise
+                continue
+
+            cls.__backend = name
+            return
+
+    @staticmethod
+    def __load_orjson():
+        import orjson
+
+        def dumps(value):
+            return orjson.dumps(value, default=JsonCodec.__default, option=orjson.OPT_NON_STR_KEYS)
+
+        return dumps, orjson.loads
+
+    @staticmethod
+    def __load_simplejson():
+        import simplejson
+
+        def dumps(value):
+            return simplejson.dumps(
+                value, default=JsonCodec.__default, ensure_ascii=False, separators=(',', ':')
+            ).encode()
+
+        return dumps, simplejson.loads
+
+    @staticmethod
+    def __load_json():
+        def dumps(value):
+            return json.dumps(value, default=JsonCodec.__default, ensure_ascii=False, separators=(',', ':')).encode()
+
+        return dumps, json.loads
+
+    @classmethod
+    def __configure(cls):
+        config = getattr(Configuration, 'app_config', None)
+        cls.use(config.get('Server', 'json_backend', fallback='auto') if config is not None else 'auto')
+
+    @classmethod
+    def backend(cls) -> str:
+        """
+        Название используемой библиотеки JSON
+        """
+        if cls.__backend is None:
+            cls.__configure()
+
+        return cls.__backend
+
+    @classmethod
+    def dumps(cls, value) -> bytes:
+        """
+        Кодирует значение в JSON
+
+        :param value: кодируемое значение
+        :return: компактный JSON в UTF-8
+        :rtype: bytes
+        """
+        if cls.__backend is None:
+            cls.__configure()
+
+        return cls.__dumps(value)
+
+    @classmethod
+    def canonical(cls, value) -> bytes:
+        """
+        Кодирует значение в JSON с сортировкой ключей стандартной библиотекой json.
+        Результат не зависит от выбранной библиотеки, поэтому подходит для ключей хранилищ.
+
+        :param value: кодируемое значение
+        :return: компактный JSON в UTF-8
+        :rtype: bytes
+        """
+        return json.dumps(
+            value, default=cls.__default, ensure_ascii=False, separators=(',', ':'), sort_keys=True
+        ).encode()
+
+    @classmethod
+    def loads(cls, data):
+        """
+        Декодирует JSON
+
+        :param data: JSON в байтах или строке
+        :return: декодированное значение
+        """
+        if cls.__backend is None:
+            cls.__configure()
+
+        return cls.__loads(data)
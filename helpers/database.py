@@ -1,10 +1,30 @@
-import psycopg2
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-from psycopg2.extras import DictCursor
+import threading
+import time
+from contextlib import contextmanager
+
 from helpers import Configuration
+from helpers.migrations import MIGRATIONS
+
+# psycopg2 is imported on first connection to speed up server start, see Database.connect_to_database
+psycopg2 = None
 
 
 class Database():
+    # single connection mode
+    __connection = None
+    __cursor = None
+    # serializes usage of the single connection by Database.connection()
+    __lock = threading.RLock()
+
+    # pooled mode
+    __pool = None
+    __pool_slots = None
+    __pool_timeout = None
+    __pool_stats = {}
+    __pool_stats_lock = threading.Lock()
+
+    # connection, cursor and insert buffers bound to the current thread
+    __local = threading.local()
 
     @classmethod
     def __init_database(cls, connection_dict: dict):
@@ -21,103 +41,30 @@ class Database():
             password=connection_dict['password'],
             host=connection_dict['host'])
 
-        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
 
         cursor = conn.cursor()
         # crete database
         cursor.execute('CREATE DATABASE "%s" ;' % connection_dict['dbname'])
         conn.close()
-        # connect to created database
-        conn = psycopg2.connect(**connection_dict)
-        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-        cursor = conn.cursor()
-
-        queries = (
-            # UserActivity table creation
-            """
-                CREATE TABLE "UserActivity" (
-                    "UserID" integer NOT NULL,
-                    "Date" date,
-                    "Category" text,
-                    "Useful" smallint,
-                    "WastedTime" interval
-                )
-                WITH (
-                    OIDS=FALSE
-                );
-            """,
-            # UserLocation table creation
-            """
-                CREATE TABLE "UserLocation"(
-                    "UserID" integer NOT NULL,
-                    "DateTime" timestamp with time zone,
-                    "Status" smallint
-                )
-                WITH (
-                    OIDS=FALSE
-                );
-            """,
-            # UserOverwork table creation
-            """
-                CREATE TABLE "UserOverwork"(
-                    "UserID" integer NOT NULL,
-                    "Overwork" interval,
-                    "Date" date
-                )
-                WITH (
-                    OIDS=FALSE
-                );
-            """,
-            # UserPlanPercent table creation
-            """
-                CREATE TABLE "UserPlanPercent"(
-                    "UserID" integer NOT NULL,
-                    "PlanPercent" smallint
-                )
-                WITH (
-                    OIDS=FALSE
-                );
-            """,
-            # MinedUsers table creation
-            """
-                CREATE TABLE "MinedUsers"(
-                    "UserID" integer NOT NULL,
-                    "TotalDays" integer
-                )
-                WITH (
-                    OIDS=FALSE
-                );
-            """
-            # User neural_data table
-            """
-                CREATE TABLE "UsersNeuralData"(
-                    "UserID" integer NOT NULL,
-                    "UserFirstCalls" real,
-                    "UserLastCalls" real,
-                    "UserFirstDuration" real,
-                    "UserLastDuration" real,
-                    "UserFirstOverwork" real,
-                    "UserLastOverwork" real
-                )
-                WITH (
-                    OIDS=FALSE
-                );
-            """
-
-
-        )
-        # create tables
-        for query in queries:
-            cursor.execute(query)
+        # tables are created by migrations
+        cls.connect_to_database(connection_dict)
 
-        conn.close()
+    @staticmethod
+    def __import_driver():
+        global psycopg2
 
-        cls.connect_to_database(connection_dict)
+        if psycopg2 is None:
+            import psycopg2.extensions
+            import psycopg2.extras
+            import psycopg2.pool
 
     @classmethod
     def connect_to_database(cls, connection_dict: dict = None):
         """
         Connect to database. If databse not found create it.
+        If pool_max is set in [Database] section of config, connections are taken from a pool
+        of pool_min..pool_max connections (see Database.connection).
 
         :param connection_dict: connection params, defaults to None
         :param connection_dict: dict, optional
@@ -133,29 +80,316 @@ class Database():
 
             connection_dict = {key: value for key, value in config['Database'].items() if key in db_connection_fields}
 
+        cls.__import_driver()
+        pool_max = Configuration.app_config.getint('Database', 'pool_max', fallback=0)
+
         # try connect to database
         try:
-            cls.__connection = psycopg2.connect(**connection_dict)
-            cls.__cursor = cls.__connection.cursor(cursor_factory=DictCursor)
+            if pool_max > 0:
+                cls.__create_pool(connection_dict, pool_max)
+            else:
+                cls.__connection = psycopg2.connect(**connection_dict)
+                cls.__cursor = cls.__connection.cursor(cursor_factory=psycopg2.extras.DictCursor)
         except psycopg2.OperationalError:
             # if database not found create database
             cls.__init_database(connection_dict)
+            return
+
+        cls.__migrate()
+
+    @classmethod
+    def __create_pool(cls, connection_dict: dict, pool_max: int):
+        """
+        Create connections pool.
+
+        :param connection_dict: connection params
+        :type connection_dict: dict
+        :param pool_max: max connections count
+        :type pool_max: int
+        """
+        pool_min = min(Configuration.app_config.getint('Database', 'pool_min', fallback=1), pool_max)
+
+        cls.__pool = psycopg2.pool.ThreadedConnectionPool(pool_min, pool_max, **connection_dict)
+        cls.__pool_slots = threading.BoundedSemaphore(pool_max)
+        cls.__pool_timeout = Configuration.app_config.getfloat('Database', 'pool_timeout', fallback=30)
+        cls.__pool_stats = {
+            'min_size': pool_min,
+            'max_size': pool_max,
+            'in_use': 0,
+            'acquired': 0,
+            'waited': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0
+        }
+
+    @classmethod
+    def __migrate(cls):
+        """
+        Apply schema migrations which are not applied yet (see helpers.migrations).
+        """
+        with cls.connection():
+            cls.query(
+                """
+                CREATE TABLE IF NOT EXISTS "SchemaVersion"(
+                    "Version" integer PRIMARY KEY,
+                    "Description" text,
+                    "AppliedAt" timestamp with time zone DEFAULT now()
+                );
+                """
+            )
+            cls.commit_changes()
+
+            for migration in MIGRATIONS:
+                # lock versions table so concurrently started servers apply migration once
+                cls.query('LOCK TABLE "SchemaVersion" IN EXCLUSIVE MODE;')
+
+                if cls.query_row('SELECT 1 FROM "SchemaVersion" WHERE "Version" = %s', (migration.version,)):
+                    cls.commit_changes()
+                    continue
+
+                for query in migration.queries:
+                    cls.query(query)
+
+                cls.query(
+                    'INSERT INTO "SchemaVersion"("Version", "Description") VALUES (%s, %s);',
+                    (migration.version, migration.description)
+                )
+                cls.commit_changes()
+
+    @classmethod
+    def __acquire_connection(cls):
+        """
+        Take connection from pool. Waits while all pool connections are in use.
+
+        :return: database connection
+        """
+        start = time.monotonic()
+        waited = not cls.__pool_slots.acquire(blocking=False)
+
+        if waited and not cls.__pool_slots.acquire(timeout=cls.__pool_timeout):
+            raise TimeoutError('Не удалось получить соединение с БД за {} сек.'.format(cls.__pool_timeout))
+
+        wait_time = time.monotonic() - start
+
+        try:
+            connection = cls.__pool.getconn()
+        except BaseException:
+            cls.__pool_slots.release()
+            raise
+
+        with cls.__pool_stats_lock:
+            stats = cls.__pool_stats
+            stats['in_use'] += 1
+            stats['acquired'] += 1
+            if waited:
+                stats['waited'] += 1
+                stats['wait_time_total'] += wait_time
+                stats['wait_time_max'] = max(stats['wait_time_max'], wait_time)
+
+        return connection
+
+    @classmethod
+    def __release_connection(cls, connection):
+        """
+        Return connection to pool. Uncommitted changes are rolled back.
+
+        :param connection: database connection
+        """
+        try:
+            if not connection.closed:
+                connection.rollback()
+            cls.__pool.putconn(connection, close=bool(connection.closed))
+        finally:
+            with cls.__pool_stats_lock:
+                cls.__pool_stats['in_use'] -= 1
+            cls.__pool_slots.release()
+
+    @classmethod
+    @contextmanager
+    def connection(cls):
+        """
+        Bind database connection to the current thread.
+        query, query_row, flush_rows and commit_changes called inside the block use this connection.
+        In pooled mode connection is taken from pool and returned on exit.
+        In single connection mode blocks of different threads are serialized.
+        In both modes uncommitted changes are rolled back on exit.
+        Nested blocks reuse connection of the outer block.
+
+        :return: database connection
+        """
+        local = cls.__local
+
+        if getattr(local, 'connection', None) is not None:
+            yield local.connection
+            return
+
+        if cls.__pool is None:
+            with cls.__lock:
+                local.connection, local.cursor = cls.__connection, cls.__cursor
+                try:
+                    yield local.connection
+                finally:
+                    local.connection = local.cursor = local.buffers = None
+                    # failed query leaves shared connection in aborted transaction
+                    if not cls.__connection.closed:
+                        cls.__connection.rollback()
+            return
+
+        connection = cls.__acquire_connection()
+        local.connection, local.cursor = connection, connection.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        try:
+            yield connection
+        finally:
+            local.connection = local.cursor = local.buffers = None
+            cls.__release_connection(connection)
+
+    @classmethod
+    def is_pooled(cls) -> bool:
+        """
+        Whether connections are taken from a pool (False in single connection mode).
+        """
+        return cls.__pool is not None
+
+    @classmethod
+    def pool_stats(cls) -> dict:
+        """
+        Get connections pool metrics: pool size, connections in use,
+        acquisitions count, waited acquisitions count and wait times in seconds.
+
+        :return: pool metrics (empty in single connection mode)
+        :rtype: dict
+        """
+        with cls.__pool_stats_lock:
+            return dict(cls.__pool_stats)
+
+    @classmethod
+    def __execute(cls, action):
+        """
+        Run action with cursor of the current thread.
+        In pooled mode without bound connection action runs on its own connection and is committed at once.
+
+        :param action: function of cursor
+        :return: action result
+        """
+        cursor = getattr(cls.__local, 'cursor', None)
+
+        if cursor is not None:
+            return action(cursor)
+
+        if cls.__pool is None:
+            return action(cls.__cursor)
+
+        with cls.connection() as connection:
+            result = action(cls.__local.cursor)
+            connection.commit()
+            return result
 
     @classmethod
     def query(cls, query_str: str, fields=None):
-        cls.__cursor.execute(query_str, fields)
+        def execute(cursor):
+            cursor.execute(query_str, fields)
 
-        if cls.__cursor.description:
-            return cls.__cursor.fetchall()
+            if cursor.description:
+                return cursor.fetchall()
+
+        return cls.__execute(execute)
 
     @classmethod
     def query_row(cls, query_str: str, fields=None):
-        cls.__cursor.execute(query_str, fields)
+        data = cls.query(query_str, fields)
+        return data[0] if data else None
+
+    @classmethod
+    def __get_buffers(cls) -> dict:
+        buffers = getattr(cls.__local, 'buffers', None)
 
-        if cls.__cursor.description:
-            data = cls.__cursor.fetchall()
-            return data[0] if data else None
+        if buffers is None:
+            buffers = cls.__local.buffers = {}
+
+        return buffers
+
+    @classmethod
+    def buffer_rows(cls, table: str, columns: tuple, rows: list, key_columns: tuple = None):
+        """
+        Add rows to insert buffer of table. Rows are written by flush_rows.
+        Buffers belong to the current thread.
+        If key_columns is set, rows are upserted: row with the same key is overwritten
+        (key columns must have unique index and must be unique inside the buffer).
+
+        :param table: table name
+        :type table: str
+        :param columns: names of inserted columns
+        :type columns: tuple
+        :param rows: list of rows values in columns order
+        :type rows: list
+        :param key_columns: columns of unique key for upsert, defaults to None
+        :type key_columns: tuple, optional
+        """
+        buffer_key = (table, tuple(columns), tuple(key_columns) if key_columns else None)
+        cls.__get_buffers().setdefault(buffer_key, []).extend(rows)
+
+    @classmethod
+    def flush_rows(cls, page_size: int = 1000):
+        """
+        Write all buffered rows with multi-row INSERT ... VALUES statements.
+
+        :param page_size: max rows count in one statement, defaults to 1000
+        :type page_size: int, optional
+        """
+        buffers = cls.__get_buffers()
+        cls.__local.buffers = {}
+
+        def execute(cursor):
+            for (table, columns, key_columns), rows in buffers.items():
+                if not rows:
+                    continue
+
+                query_str = 'INSERT INTO "{table}" ({columns}) VALUES %s'.format(
+                    table=table,
+                    columns=', '.join('"{}"'.format(column) for column in columns)
+                )
+
+                if key_columns:
+                    updated_columns = [column for column in columns if column not in key_columns]
+                    query_str += ' ON CONFLICT ({keys}) DO {action}'.format(
+                        keys=', '.join('"{}"'.format(column) for column in key_columns),
+                        action='UPDATE SET ' + ', '.join(
+                            '"{0}" = EXCLUDED."{0}"'.format(column) for column in updated_columns
+                        ) if updated_columns else 'NOTHING'
+                    )
+
+                psycopg2.extras.execute_values(cursor, query_str, rows, page_size=page_size)
+
+        if any(buffers.values()):
+            cls.__execute(execute)
+
+    @classmethod
+    def discard_rows(cls):
+        """
+        Drop all buffered rows of the current thread without writing them.
+        """
+        cls.__local.buffers = {}
+
+    @classmethod
+    def rollback_changes(cls):
+        """
+        Drop buffered rows and roll back uncommitted changes of the current connection.
+        """
+        cls.discard_rows()
+        connection = getattr(cls.__local, 'connection', None)
+
+        if connection is None and cls.__pool is None:
+            connection = cls.__connection
+
+        if connection is not None and not connection.closed:
+            connection.rollback()
 
     @classmethod
     def commit_changes(cls):
-        cls.__connection.commit()
+        connection = getattr(cls.__local, 'connection', None)
+
+        if connection is not None:
+            connection.commit()
+
+        elif cls.__pool is None:
+            cls.__connection.commit()
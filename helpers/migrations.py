@@ -0,0 +1,194 @@
+"""
+Версионные миграции схемы БД.
+Каждая миграция применяется один раз в отдельной транзакции,
+номера примененных миграций хранятся в таблице "SchemaVersion".
+Новые миграции добавляются в конец MIGRATIONS со следующим номером версии.
+"""
+from collections import namedtuple
+
+migration = namedtuple('migration', 'version, description, queries')
+
+
+MIGRATIONS = (
+    migration(1, 'Analytics tables', (
+        # UserActivity table creation
+        """
+            CREATE TABLE IF NOT EXISTS "UserActivity" (
+                "UserID" integer NOT NULL,
+                "Date" date,
+                "Category" text,
+                "Useful" smallint,
+                "WastedTime" interval
+            );
+        """,
+        # UserLocation table creation
+        """
+            CREATE TABLE IF NOT EXISTS "UserLocation"(
+                "UserID" integer NOT NULL,
+                "DateTime" timestamp with time zone,
+                "Status" smallint
+            );
+        """,
+        # UserOverwork table creation
+        """
+            CREATE TABLE IF NOT EXISTS "UserOverwork"(
+                "UserID" integer NOT NULL,
+                "Overwork" interval,
+                "Date" date
+            );
+        """,
+        # UserPlanPercent table creation
+        """
+            CREATE TABLE IF NOT EXISTS "UserPlanPercent"(
+                "UserID" integer NOT NULL,
+                "PlanPercent" smallint
+            );
+        """,
+        # MinedUsers table creation
+        """
+            CREATE TABLE IF NOT EXISTS "MinedUsers"(
+                "UserID" integer NOT NULL,
+                "TotalDays" integer
+            );
+        """,
+        'ALTER TABLE "MinedUsers" ADD COLUMN IF NOT EXISTS "LastMinedDate" date;',
+        # User neural_data table
+        """
+            CREATE TABLE IF NOT EXISTS "UsersNeuralData"(
+                "UserID" integer NOT NULL,
+                "UserFirstCalls" real,
+                "UserLastCalls" real,
+                "UserFirstDuration" real,
+                "UserLastDuration" real,
+                "UserFirstOverwork" real,
+                "UserLastOverwork" real
+            );
+        """,
+        # UserCalls table creation
+        """
+            CREATE TABLE IF NOT EXISTS "UserCalls"(
+                "UserID" integer NOT NULL,
+                "Date" date,
+                "Count" real,
+                "Duration" interval
+            );
+        """
+    )),
+    migration(2, 'Unique keys and indexes of analytics tables', (
+        # merge activity rows of the same category (also duplicated by repeated mining),
+        # activity without category is kept uncategorized and without usefulness is neutral, as the miner stores it;
+        # only rows without day are dropped, they are outside of any mining window
+        """
+            CREATE TEMP TABLE "UserActivityMerged" ON COMMIT DROP AS
+            SELECT "UserID", "Date", coalesce("Category", '') AS "Category", coalesce("Useful", 0) AS "Useful",
+                sum("WastedTime") AS "WastedTime"
+            FROM "UserActivity"
+            WHERE "Date" IS NOT NULL
+            GROUP BY "UserID", "Date", coalesce("Category", ''), coalesce("Useful", 0);
+        """,
+        'DELETE FROM "UserActivity";',
+        'INSERT INTO "UserActivity" SELECT * FROM "UserActivityMerged";',
+        # drop duplicated rows
+        """
+            DELETE FROM "UserLocation" AS a USING "UserLocation" AS b
+            WHERE a.ctid > b.ctid AND a."UserID" = b."UserID"
+                AND a."DateTime" = b."DateTime" AND a."Status" = b."Status";
+        """,
+        """
+            DELETE FROM "UserOverwork" AS a USING "UserOverwork" AS b
+            WHERE a.ctid < b.ctid AND a."UserID" = b."UserID" AND a."Date" = b."Date";
+        """,
+        """
+            DELETE FROM "UserCalls" AS a USING "UserCalls" AS b
+            WHERE a.ctid < b.ctid AND a."UserID" = b."UserID" AND a."Date" = b."Date";
+        """,
+        """
+            DELETE FROM "UserPlanPercent" AS a USING "UserPlanPercent" AS b
+            WHERE a.ctid < b.ctid AND a."UserID" = b."UserID";
+        """,
+        """
+            DELETE FROM "UsersNeuralData" AS a USING "UsersNeuralData" AS b
+            WHERE a.ctid < b.ctid AND a."UserID" = b."UserID";
+        """,
+        """
+            DELETE FROM "MinedUsers" AS a USING "MinedUsers" AS b
+            WHERE a.ctid < b.ctid AND a."UserID" = b."UserID";
+        """,
+        # NULL keys never conflict, so upsert keys are made NOT NULL (activity rows are filtered by merge)
+        'DELETE FROM "UserLocation" WHERE "DateTime" IS NULL OR "Status" IS NULL;',
+        'DELETE FROM "UserOverwork" WHERE "Date" IS NULL;',
+        'DELETE FROM "UserCalls" WHERE "Date" IS NULL;',
+        """
+            ALTER TABLE "UserActivity"
+                ALTER COLUMN "Date" SET NOT NULL,
+                ALTER COLUMN "Category" SET NOT NULL,
+                ALTER COLUMN "Useful" SET NOT NULL;
+        """,
+        """
+            ALTER TABLE "UserLocation"
+                ALTER COLUMN "DateTime" SET NOT NULL,
+                ALTER COLUMN "Status" SET NOT NULL;
+        """,
+        'ALTER TABLE "UserOverwork" ALTER COLUMN "Date" SET NOT NULL;',
+        'ALTER TABLE "UserCalls" ALTER COLUMN "Date" SET NOT NULL;',
+        # keys
+        'ALTER TABLE "MinedUsers" ADD PRIMARY KEY ("UserID");',
+        'ALTER TABLE "UserPlanPercent" ADD PRIMARY KEY ("UserID");',
+        'ALTER TABLE "UsersNeuralData" ADD PRIMARY KEY ("UserID");',
+        """
+            CREATE UNIQUE INDEX "UserActivity_UserID_Date_Category_Useful_key"
+            ON "UserActivity" ("UserID", "Date", "Category", "Useful");
+        """,
+        """
+            CREATE UNIQUE INDEX "UserLocation_UserID_DateTime_Status_key"
+            ON "UserLocation" ("UserID", "DateTime", "Status");
+        """,
+        'CREATE UNIQUE INDEX "UserOverwork_UserID_Date_key" ON "UserOverwork" ("UserID", "Date");',
+        'CREATE UNIQUE INDEX "UserCalls_UserID_Date_key" ON "UserCalls" ("UserID", "Date");',
+        # indexes of scoring queries
+        """
+            CREATE INDEX "UserActivity_UserID_Category_idx"
+            ON "UserActivity" ("UserID", "Category");
+        """,
+        """
+            CREATE INDEX "UserLocation_UserID_Status_idx"
+            ON "UserLocation" ("UserID", "Status");
+        """
+    )),
+    migration(3, 'Precomputed user scores', (
+        """
+            CREATE TABLE "UserScores"(
+                "UserID" integer PRIMARY KEY,
+                "UpdatedAt" timestamp with time zone,
+                "Responsibility" smallint,
+                "Sociability" smallint,
+                "Procrastination" smallint,
+                "OftenLeaving" boolean,
+                "Punctuality" smallint,
+                "LeavingState" smallint
+            );
+        """,
+    )),
+    migration(4, 'Daily arrival rollup of user location', (
+        """
+            CREATE TABLE "UserDailyArrival"(
+                "UserID" integer NOT NULL,
+                "Date" date NOT NULL,
+                "FirstEntrance" time,
+                "LeaveCount" integer,
+                PRIMARY KEY ("UserID", "Date")
+            );
+        """,
+        """
+            INSERT INTO "UserDailyArrival"("UserID", "Date", "FirstEntrance", "LeaveCount")
+            SELECT
+                "UserID", "DateTime"::date,
+                min("DateTime"::time) FILTER (WHERE "Status" = 1),
+                count(*) FILTER (WHERE "Status" = 0)
+            FROM "UserLocation"
+            GROUP BY "UserID", "DateTime"::date;
+        """,
+        # punctuality of stored scores was calculated over all users location, recalculate on next read
+        'UPDATE "UserScores" SET "UpdatedAt" = NULL;',
+    )),
+)
@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict
+
+from helpers.configuration import Configuration
+
+
+class Startup():
+    """
+    Server initialization stages.
+    Stages run either at once or in background warm-up thread (lazy mode),
+    code depending on a stage waits for it with Startup.require.
+    Duration of every stage is kept for metrics.
+    """
+    __stages = OrderedDict()
+    __lock = threading.Lock()
+
+    @classmethod
+    def __get_stage(cls, name: str) -> dict:
+        with cls.__lock:
+            return cls.__stages.setdefault(
+                name,
+                {'func': None, 'done': threading.Event(), 'duration': None, 'error': None}
+            )
+
+    @classmethod
+    def add_stage(cls, name: str, func):
+        """
+        Register initialization stage. Stages run in registration order.
+
+        :param name: stage name
+        :type name: str
+        :param func: stage function without arguments
+        """
+        cls.__get_stage(name)['func'] = func
+
+    @classmethod
+    def record(cls, name: str, duration: float):
+        """
+        Register already finished stage (e.g. modules import).
+
+        :param name: stage name
+        :type name: str
+        :param duration: stage duration in seconds
+        :type duration: float
+        """
+        stage = cls.__get_stage(name)
+        stage['duration'] = duration
+        stage['done'].set()
+
+    @classmethod
+    def __run_stage(cls, name: str, stage: dict):
+        start = time.monotonic()
+        try:
+            stage['func']()
+        except BaseException as exc:
+            stage['error'] = exc
+            print('Init stage "{}" failed: {}'.format(name, exc))
+        finally:
+            stage['duration'] = time.monotonic() - start
+            stage['done'].set()
+
+        if stage['error'] is None:
+            print('Init stage "{}" finished in {:.3f} s'.format(name, stage['duration']))
+
+    @classmethod
+    def run(cls, lazy: bool = False):
+        """
+        Run registered stages.
+
+        :param lazy: run stages in background warm-up thread, defaults to False
+        :type lazy: bool, optional
+        """
+        with cls.__lock:
+            pending = [(name, stage) for name, stage in cls.__stages.items() if not stage['done'].is_set()]
+
+        def run_pending():
+            for name, stage in pending:
+                cls.__run_stage(name, stage)
+
+        if lazy:
+            threading.Thread(target=run_pending, name='warm-up', daemon=True).start()
+            return
+
+        run_pending()
+
+        for name, stage in pending:
+            if stage['error'] is not None:
+                raise stage['error']
+
+    @classmethod
+    def require(cls, *names, timeout: float = None):
+        """
+        Wait until stages are finished. Error of failed stage is raised again.
+
+        :param names: stage names
+        :param timeout: max seconds to wait for every stage, defaults to startup_timeout of [Server] section (60)
+        :type timeout: float, optional
+        """
+        if timeout is None:
+            config = getattr(Configuration, 'app_config', None)
+            timeout = config.getfloat('Server', 'startup_timeout', fallback=60) if config is not None else 60
+
+        for name in names:
+            stage = cls.__get_stage(name)
+
+            if not stage['done'].wait(timeout):
+                raise TimeoutError('Инициализация "{}" еще не завершена'.format(name))
+
+            if stage['error'] is not None:
+                raise stage['error']
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Get stages state: done flag, duration in seconds and error.
+
+        :return: stages state by stage name
+        :rtype: dict
+        """
+        with cls.__lock:
+            return {
+                name: {
+                    'done': stage['done'].is_set(),
+                    'duration': stage['duration'],
+                    'error': str(stage['error']) if stage['error'] is not None else None
+                }
+                for name, stage in cls.__stages.items()
+            }
@@ -0,0 +1,36 @@
+"""
+Сравнивает результаты Keras и NumPy движков нейросети на строках dataset.csv.
+Запуск из корня проекта: python -m neural_network.compare_engines [tolerance]
+"""
+import sys
+
+import numpy
+
+from neural_network.neural_network import NeuralNetwork
+from neural_network.numpy_model import NumpyModel
+
+
+def compare_engines(dataset_path: str = 'dataset.csv') -> float:
+    """
+    Возвращает максимальное расхождение предсказаний Keras и NumPy движков
+
+    :param dataset_path: путь к набору данных (6 признаков и метка в строке), defaults to 'dataset.csv'
+    :type dataset_path: str, optional
+    :return: максимальная абсолютная разница предсказаний
+    :rtype: float
+    """
+    input_data = numpy.loadtxt(dataset_path, delimiter=',')[:, :6]
+
+    activations = [activation for _, activation in NeuralNetwork.LAYERS]
+
+    keras_model = NeuralNetwork.build_keras_model()
+    numpy_model = NumpyModel.load(NeuralNetwork.WEIGHTS_FILE, activations)
+
+    return float(numpy.max(numpy.abs(keras_model.predict(input_data) - numpy_model.predict(input_data))))
+
+
+if __name__ == '__main__':
+    tolerance = float(sys.argv[1]) if len(sys.argv) > 1 else 1e-5
+    difference = compare_engines()
+    print('max difference: {}'.format(difference))
+    sys.exit(0 if difference <= tolerance else 1)
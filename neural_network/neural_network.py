@@ -1,20 +1,73 @@
-from keras.layers import Dense, Dropout
-from keras.models import Sequential
-import tensorflow as tf
+from helpers import Configuration
 
 
 class NeuralNetwork():
     model = None
-    graph = tf.get_default_graph()
+    graph = None
+
+    # Dense layers of production model: (units, activation)
+    LAYERS = ((15, 'relu'), (10, 'relu'), (6, 'relu'), (1, 'sigmoid'))
+    WEIGHTS_FILE = 'production.h5'
 
     @classmethod
     def initialize(cls):
-        cls.model = Sequential()
-        cls.model.add(Dense(15, input_dim=6, activation='relu'))    # input layer requires input_dim param
-        cls.model.add(Dense(10, activation='relu'))
-        cls.model.add(Dense(6, activation='relu'))
-        cls.model.add(Dropout(.2))
-        cls.model.add(Dense(1, activation='sigmoid'))   # sigmoid instead of relu for final probability between 0 and 1
-        cls.model.load_weights('production.h5')
-
-        cls.graph = tf.get_default_graph()
\ No newline at end of file
+        """
+        Load production model. Engine is selected by engine option of [NeuralNetwork] config section:
+        keras (default) - TensorFlow/Keras model, numpy - forward pass evaluated with NumPy.
+        """
+        engine = Configuration.app_config.get('NeuralNetwork', 'engine', fallback='keras')
+
+        if engine == 'numpy':
+            from neural_network.numpy_model import NumpyModel
+
+            cls.model = NumpyModel.load(cls.WEIGHTS_FILE, [activation for _, activation in cls.LAYERS])
+            cls.graph = None
+
+        elif engine == 'keras':
+            cls.__initialize_keras()
+
+        else:
+            raise ValueError('Неизвестный движок нейросети: {}'.format(engine))
+
+    @classmethod
+    def __initialize_keras(cls):
+        import tensorflow as tf
+
+        cls.model = cls.build_keras_model()
+        cls.graph = tf.get_default_graph()
+
+    @classmethod
+    def build_keras_model(cls, weights_file: str = None):
+        """
+        Build Keras model of production architecture and load its weights.
+
+        :param weights_file: path to HDF5 weights file, defaults to WEIGHTS_FILE
+        :type weights_file: str, optional
+        :return: Keras model
+        """
+        from keras.layers import Dense, Dropout
+        from keras.models import Sequential
+
+        model = Sequential()
+        model.add(Dense(15, input_dim=6, activation='relu'))    # input layer requires input_dim param
+        model.add(Dense(10, activation='relu'))
+        model.add(Dense(6, activation='relu'))
+        model.add(Dropout(.2))
+        model.add(Dense(1, activation='sigmoid'))   # sigmoid instead of relu for final probability between 0 and 1
+        model.load_weights(weights_file or cls.WEIGHTS_FILE)
+
+        return model
+
+    @classmethod
+    def predict(cls, input_data):
+        """
+        Evaluate model on input matrix.
+
+        :param input_data: input matrix, one row per user
+        :return: output matrix, one row per user
+        """
+        if cls.graph is None:
+            return cls.model.predict(input_data)
+
+        with cls.graph.as_default():
+            return cls.model.predict(input_data)
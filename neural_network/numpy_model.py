@@ -0,0 +1,99 @@
+"""
+Модуль вычисления полносвязной нейросети Keras средствами NumPy.
+Веса Dense слоев читаются напрямую из HDF5 файла, сохраненного Keras (save или save_weights).
+Слои Dropout при вычислении пропускаются, как в Keras в режиме предсказания.
+"""
+import json
+
+import h5py
+import numpy
+
+
+def __sigmoid(value):
+    return 1 / (1 + numpy.exp(-value))
+
+
+ACTIVATIONS = {
+    'linear': lambda value: value,
+    'relu': lambda value: numpy.maximum(value, 0),
+    'sigmoid': __sigmoid,
+    'tanh': numpy.tanh
+}
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class NumpyModel():
+    """
+    Sequential model of Dense layers evaluated with NumPy
+    """
+
+    def __init__(self, layers: list):
+        """
+        :param layers: list of Dense layers: (kernel, bias, activation name)
+        :type layers: list
+        """
+        for _, _, activation in layers:
+            if activation not in ACTIVATIONS:
+                raise ValueError('Неподдерживаемая функция активации: {}'.format(activation))
+
+        self.__layers = [(kernel, bias, ACTIVATIONS[activation]) for kernel, bias, activation in layers]
+
+    @classmethod
+    def load(cls, path: str, activations: list = None):
+        """
+        Load Dense layers weights from Keras HDF5 file.
+        Activations are read from model config saved in file, if file contains only weights
+        activations must be passed in Dense layers order.
+
+        :param path: path to HDF5 file
+        :type path: str
+        :param activations: activations of Dense layers, defaults to None
+        :type activations: list, optional
+        :return: loaded model
+        :rtype: NumpyModel
+        """
+        with h5py.File(path, 'r') as h5_file:
+            if 'model_config' in h5_file.attrs:
+                activations = cls.__read_activations(json.loads(_decode(h5_file.attrs['model_config'])))
+
+            weights_group = h5_file['model_weights'] if 'model_weights' in h5_file else h5_file
+
+            weights = []
+            for layer_name in weights_group.attrs['layer_names']:
+                layer_group = weights_group[_decode(layer_name)]
+                weight_names = [_decode(name) for name in layer_group.attrs['weight_names']]
+
+                # layers without weights (Dropout) are not evaluated
+                if weight_names:
+                    kernel, bias = (numpy.array(layer_group[name], dtype=numpy.float32) for name in weight_names)
+                    weights.append((kernel, bias))
+
+        if activations is None or len(activations) != len(weights):
+            raise ValueError('Не удалось определить функции активации слоев модели {}'.format(path))
+
+        return cls([(kernel, bias, activation) for (kernel, bias), activation in zip(weights, activations)])
+
+    @staticmethod
+    def __read_activations(model_config: dict) -> list:
+        config = model_config['config']
+        layers = config['layers'] if isinstance(config, dict) else config
+
+        return [layer['config']['activation'] for layer in layers if layer['class_name'] == 'Dense']
+
+    def predict(self, input_data) -> numpy.ndarray:
+        """
+        Evaluate model.
+
+        :param input_data: input matrix, one row per sample
+        :return: output matrix, one row per sample
+        :rtype: numpy.ndarray
+        """
+        result = numpy.asarray(input_data, dtype=numpy.float32)
+
+        for kernel, bias, activation in self.__layers:
+            result = activation(result @ kernel + bias)
+
+        return result
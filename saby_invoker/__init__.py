@@ -1,2 +1,3 @@
-from saby_invoker.rpc_invoker import RpcInvoker as SabyInvoker
+from saby_invoker.response_store import ResponseStore
+from saby_invoker.rpc_invoker import RpcCall, RpcInvoker as SabyInvoker
 import saby_invoker.saby_formats_builder as SabyFormatsBuilder
@@ -0,0 +1,197 @@
+"""
+Persistent store of SBIS methods results.
+Results of calls with immutable data (e.g. past days) are kept on disk in SQLite
+and are served without request to SBIS. The same store is used as a replay fixture:
+calls are recorded from real SBIS in 'record' mode and served offline in 'replay' mode.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+
+from helpers import Configuration, JsonCodec
+
+# cacheable calls are read from store and recorded
+MODE_CACHE = 'cache'
+# every successful call is recorded, store is not read
+MODE_RECORD = 'record'
+# every call is read from store, SBIS is not called
+MODE_REPLAY = 'replay'
+
+MODES = (MODE_CACHE, MODE_RECORD, MODE_REPLAY)
+
+
+class ResponseStore():
+    """
+    Thread-safe SQLite store of raw JSON-RPC results keyed by SBIS session, method and normalized params.
+    Results depend on rights of the session, so a result is served only to the session it was received with.
+    Least recently used results are evicted when store exceeds its size.
+    """
+
+    def __init__(self, path: str, mode: str = MODE_CACHE, size: int = 100000):
+        """
+        :param path: SQLite database file path
+        :type path: str
+        :param mode: store mode: cache, record or replay, defaults to 'cache'
+        :type mode: str, optional
+        :param size: max stored results count, 0 - unlimited, defaults to 100000
+        :type size: int, optional
+        """
+        if mode not in MODES:
+            raise ValueError("Неизвестный режим хранилища ответов СБИС: {}".format(mode))
+
+        self.path = path
+        self.mode = mode
+        self.size = size
+
+        self.__lock = threading.Lock()
+        self.__stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('PRAGMA synchronous=NORMAL')
+        self.__connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, method TEXT NOT NULL, result TEXT NOT NULL, used_at REAL NOT NULL)'
+        )
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)')
+        self.__count = self.__connection.execute('SELECT count(*) FROM responses').fetchone()[0]
+
+    @classmethod
+    def from_config(cls):
+        """
+        Create store from [SabyCache] config section.
+
+        :return: store or None if store path is not set
+        :rtype: ResponseStore
+        """
+        config = getattr(Configuration, 'app_config', None)
+
+        if config is None or not config.get('SabyCache', 'path', fallback=''):
+            return None
+
+        return cls(
+            config['SabyCache']['path'],
+            mode=config.get('SabyCache', 'mode', fallback=MODE_CACHE),
+            size=config.getint('SabyCache', 'size', fallback=100000)
+        )
+
+    def reads(self, cacheable: bool) -> bool:
+        """
+        Whether call result should be looked up in store
+        """
+        return self.mode == MODE_REPLAY or (cacheable and self.mode == MODE_CACHE)
+
+    def writes(self, cacheable: bool) -> bool:
+        """
+        Whether call result should be saved to store
+        """
+        return self.mode == MODE_RECORD or (cacheable and self.mode == MODE_CACHE)
+
+    @staticmethod
+    def make_key(method: str, params: dict, session_id: str) -> str:
+        """
+        Build store key of call: params are normalized by sorting dict keys,
+        key does not depend on JSON backend in use.
+
+        :param method: method name
+        :type method: str
+        :param params: method params
+        :type params: dict
+        :param session_id: SBIS session the call is made with
+        :type session_id: str
+        :return: store key
+        :rtype: str
+        """
+        return hashlib.sha1(JsonCodec.canonical([session_id, method, params])).hexdigest()
+
+    def get(self, method: str, params: dict, session_id: str, default=None):
+        """
+        Get raw JSON-RPC result of call.
+
+        :param method: method name
+        :type method: str
+        :param params: method params
+        :type params: dict
+        :param session_id: SBIS session the call is made with
+        :type session_id: str
+        :param default: value returned for call that is not stored, defaults to None
+        :return: decoded JSON result
+        """
+        key = self.make_key(method, params, session_id)
+
+        with self.__lock:
+            row = self.__connection.execute('SELECT result FROM responses WHERE key = ?', (key,)).fetchone()
+
+            if row is None:
+                self.__stats['misses'] += 1
+                return default
+
+            self.__connection.execute('UPDATE responses SET used_at = ? WHERE key = ?', (time.time(), key))
+            self.__stats['hits'] += 1
+
+        return JsonCodec.loads(row[0])
+
+    def set(self, method: str, params: dict, session_id: str, result):
+        """
+        Save raw JSON-RPC result of call.
+
+        :param method: method name
+        :type method: str
+        :param params: method params
+        :type params: dict
+        :param session_id: SBIS session the call is made with
+        :type session_id: str
+        :param result: decoded JSON result
+        """
+        key = self.make_key(method, params, session_id)
+        result = JsonCodec.dumps(result)
+
+        with self.__lock:
+            inserted = self.__connection.execute(
+                'INSERT OR IGNORE INTO responses (key, method, result, used_at) VALUES (?, ?, ?, ?)',
+                (key, method, result, time.time())
+            ).rowcount
+
+            if not inserted:
+                self.__connection.execute(
+                    'UPDATE responses SET result = ?, used_at = ? WHERE key = ?', (result, time.time(), key)
+                )
+
+            self.__count += inserted
+            self.__stats['writes'] += 1
+
+            if self.size > 0 and self.__count > self.size:
+                self.__evict()
+
+    def __evict(self):
+        # a tenth of store is evicted at once, so eviction does not run on every write
+        evict_count = self.__count - self.size + self.size // 10
+        evicted = self.__connection.execute(
+            'DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY used_at LIMIT ?)', (evict_count,)
+        ).rowcount
+
+        self.__count -= evicted
+        self.__stats['evictions'] += evicted
+
+    def clear(self):
+        """
+        Remove all stored results.
+        """
+        with self.__lock:
+            self.__connection.execute('DELETE FROM responses')
+            self.__count = 0
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+    def stats(self) -> dict:
+        """
+        Get store counters: hits, misses, writes, evictions and current size.
+
+        :return: store counters
+        :rtype: dict
+        """
+        with self.__lock:
+            return dict(self.__stats, size=self.__count, max_size=self.size, mode=self.mode)
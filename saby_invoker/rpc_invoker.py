@@ -1,32 +1,138 @@
+import asyncio
+import threading
+import time
 import urllib.parse as urlparse
+from collections import namedtuple
 
-import requests
-import simplejson
+import aiohttp
 
-from helpers import Configuration
+from helpers import Configuration, JsonCodec
+from saby_invoker.response_store import MODE_REPLAY, ResponseStore
 from saby_invoker.saby_formats_parser import parse_value
 
+# one method call of JSON-RPC batch, cacheable - result never changes and may be served from response store
+RpcCall = namedtuple('RpcCall', 'method, params, cacheable', defaults=(False,))
+
+# JSON-RPC 2.0 error codes of endpoint that does not accept batch arrays: invalid request, parse error
+BATCH_REJECTION_CODES = (-32600, -32700)
+
+# marks call missing in response store
+_MISSING = object()
+
 
 class RpcInvoker():
     """
-    Класс вызова методов СБИС
+    Класс вызова методов СБИС.
+    Запросы выполняются через общий пул keep-alive соединений aiohttp,
+    цикл событий которого работает в отдельном потоке.
+    Синхронный invoke и асинхронный invoke_async используют один и тот же пул.
+    Результаты неизменяемых вызовов могут храниться на диске в ResponseStore.
     """
+    __address = None
+    __connections_limit = 20
+    __batch_size = 50
+    # time of batch request rejection by endpoint, calls are sent one by one for batch_retry seconds then
+    __batch_rejected_at = None
+    __batch_retry = 600.0
+    __store = None
+
+    __loop = None
+    __session = None
+    __loop_lock = threading.Lock()
+
     @classmethod
-    def initialize(cls, address: str = None):
+    def initialize(cls, address: str = None, connections_limit: int = None, response_store: ResponseStore = None):
         """
         Инициализирует RpcInvoker
         :param address: адрес сайта, на который будет отправлен запрос
         :type address: str
-        :param session_id: идентификатор сессии, defaults to None
-        :param session_id: str, optional
+        :param connections_limit: максимальное кол-во одновременных соединений с сайтом, defaults to None
+        :type connections_limit: int, optional
+        :param response_store: хранилище ответов, defaults to None (создается по секции [SabyCache])
+        :type response_store: ResponseStore, optional
         """
+        config = getattr(Configuration, 'app_config', None)
+
+        if response_store is None:
+            response_store = ResponseStore.from_config()
+
+        cls.__store = response_store
+
         if not address:
             try:
-                address = Configuration.app_config['SABY']['site']
-            except KeyError:
-                raise KeyError("В файле конфигурации не указан сайт СБИС!")
+                address = config['SABY']['site']
+            except (KeyError, TypeError):
+                # site is not requested while replaying recorded responses
+                if response_store is None or response_store.mode != MODE_REPLAY:
+                    raise KeyError("В файле конфигурации не указан сайт СБИС!")
+
+                address = 'http://localhost/'
+
+        if connections_limit is None and config is not None:
+            connections_limit = config.getint('SABY', 'connections', fallback=cls.__connections_limit)
+
+        if config is not None:
+            cls.__batch_size = config.getint('SABY', 'batch_size', fallback=cls.__batch_size)
+            cls.__batch_retry = config.getfloat('SABY', 'batch_retry', fallback=cls.__batch_retry)
 
         cls.__address = urlparse.urljoin(address, "/service/sbis-rpc-service300.dll")
+        cls.__connections_limit = connections_limit or cls.__connections_limit
+        cls.__batch_rejected_at = None
+
+        # session of previous initialization is recreated with new settings
+        cls.close()
+
+    @classmethod
+    def close(cls):
+        """
+        Закрывает пул соединений и останавливает поток цикла событий
+        """
+        with cls.__loop_lock:
+            loop, session = cls.__loop, cls.__session
+            cls.__loop = cls.__session = None
+
+        if loop is None:
+            return
+
+        asyncio.run_coroutine_threadsafe(session.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    @classmethod
+    def __get_loop(cls) -> tuple:
+        """
+        Возвращает цикл событий и сессию пула соединений, при первом вызове запускает цикл в отдельном потоке.
+        Сессия передается в вызов, так как close может сбросить ее во время вызова.
+        """
+        with cls.__loop_lock:
+            if cls.__loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='saby-invoker', daemon=True).start()
+
+                cls.__session = asyncio.run_coroutine_threadsafe(cls.__create_session(), loop).result()
+                cls.__loop = loop
+
+            return cls.__loop, cls.__session
+
+    @classmethod
+    def __run(cls, invoke, *args):
+        """
+        Выполняет корутину invoke(session, *args) в цикле событий пула соединений и ожидает результат
+        """
+        loop, session = cls.__get_loop()
+        return asyncio.run_coroutine_threadsafe(invoke(session, *args), loop).result()
+
+    @classmethod
+    async def __run_async(cls, invoke, *args):
+        """
+        Выполняет корутину invoke(session, *args) в цикле событий пула соединений из любого цикла событий
+        """
+        # first call starts the loop thread, caller's event loop is not blocked meanwhile
+        loop, session = await asyncio.get_running_loop().run_in_executor(None, cls.__get_loop)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(invoke(session, *args), loop))
+
+    @classmethod
+    async def __create_session(cls):
+        return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=cls.__connections_limit))
 
     @classmethod
     def invoke(cls, method_name: str, session_id: str = None, **params):
@@ -40,34 +146,262 @@ class RpcInvoker():
         :type person_id: str
         :return: результат выполнения метода
         """
+        return cls.__run(cls.__invoke, method_name, session_id, params)
+
+    @classmethod
+    async def invoke_async(cls, method_name: str, session_id: str = None, **params):
+        """
+        Асинхронно вызывает метод бизнес логики с указанными параметрами.
+        Может ожидаться из любого цикла событий.
+        :param method_name: имя метода
+        :type method_name: str
+        :param session_id: идентификатор сессии пользователя
+        :type session_id: str
+        :return: результат выполнения метода
+        """
+        return await cls.__run_async(cls.__invoke, method_name, session_id, params)
+
+    @classmethod
+    def store_stats(cls) -> dict:
+        """
+        Возвращает счетчики хранилища ответов
+        :return: счетчики хранилища или None, если хранилище не используется
+        :rtype: dict
+        """
+        return cls.__store.stats() if cls.__store is not None else None
+
+    @classmethod
+    async def __get_stored(cls, calls: list, session_id: str) -> list:
+        """
+        Возвращает результаты вызовов из хранилища ответов, _MISSING для вызовов, которых нет в хранилище.
+        Чтение SQLite выполняется вне цикла событий.
+        """
+        store = cls.__store
+
+        if store is None or not any(store.reads(call.cacheable) for call in calls):
+            return [_MISSING] * len(calls)
+
+        def read():
+            return [
+                store.get(call.method, call.params, session_id, _MISSING) if store.reads(call.cacheable) else _MISSING
+                for call in calls
+            ]
+
+        results = await asyncio.get_running_loop().run_in_executor(None, read)
+
+        for call, result in zip(calls, results):
+            if result is _MISSING and store.mode == MODE_REPLAY:
+                raise ConnectionAbortedError('Нет записанного ответа на вызов {}'.format(call.method))
+
+        return [result if result is _MISSING else parse_value(result) for result in results]
+
+    @classmethod
+    async def __store_results(cls, calls: list, session_id: str, response_dicts: list):
+        """
+        Сохраняет результаты вызовов в хранилище ответов. Запись SQLite выполняется вне цикла событий.
+        """
+        store = cls.__store
+
+        if store is None:
+            return
+
+        stored = [
+            (call, response_dict) for call, response_dict in zip(calls, response_dicts) if store.writes(call.cacheable)
+        ]
+
+        def write():
+            for call, response_dict in stored:
+                store.set(call.method, call.params, session_id, response_dict['result'])
 
+        if stored:
+            await asyncio.get_running_loop().run_in_executor(None, write)
+
+    @staticmethod
+    def __get_session_id(session_id: str = None) -> str:
         if session_id is None:
             try:
                 session_id = Configuration.app_config['SABY']['session_id']
-            except KeyError:
+            except (AttributeError, KeyError):
                 raise KeyError("В файле конфигурации не указан идентификатор сессии!")
 
-        body = simplejson.dumps({
-            "jsonrpc": "2.0",
-            "protocol": 5,
-            "method": method_name,
-            "params": params,
-            "id": 1
-        })
+        return session_id
+
+    @staticmethod
+    def __get_headers(session_id: str) -> dict:
+        return {"Content-Type": "application/JSON; charset=utf-8", "X-SBISSessionID": session_id}
+
+    @classmethod
+    def invoke_batch(cls, calls: list, session_id: str = None, chunk_size: int = None, concurrency: int = None) -> list:
+        """
+        Вызывает несколько методов бизнес логики пакетными запросами JSON-RPC 2.0
+        :param calls: список вызовов RpcCall(method, params)
+        :type calls: list
+        :param session_id: идентификатор сессии пользователя
+        :type session_id: str
+        :param chunk_size: кол-во вызовов в одном пакете, defaults to batch_size секции [SABY]
+        :type chunk_size: int, optional
+        :param concurrency: кол-во одновременно отправляемых запросов, defaults to None (ограничено пулом соединений)
+        :type concurrency: int, optional
+        :return: результаты вызовов в порядке следования вызовов
+        :rtype: list
+        """
+        return cls.__run(cls.__invoke_batch, list(calls), session_id, chunk_size, concurrency)
+
+    @classmethod
+    async def invoke_batch_async(
+            cls, calls: list, session_id: str = None, chunk_size: int = None, concurrency: int = None) -> list:
+        """
+        Асинхронно вызывает несколько методов бизнес логики пакетными запросами JSON-RPC 2.0
+        (параметры см. invoke_batch)
+        :return: результаты вызовов в порядке следования вызовов
+        :rtype: list
+        """
+        return await cls.__run_async(cls.__invoke_batch, list(calls), session_id, chunk_size, concurrency)
 
-        headers = {"Content-Type": "application/JSON; charset=utf-8", "X-SBISSessionID": session_id}
+    @classmethod
+    async def __invoke_batch(cls, session, calls: list, session_id: str, chunk_size: int, concurrency: int) -> list:
+        session_id = cls.__get_session_id(session_id)
+        chunk_size = max(chunk_size or cls.__batch_size, 1)
+        semaphore = asyncio.Semaphore(concurrency) if concurrency and concurrency > 0 else None
+
+        async def limited(coroutine):
+            if semaphore is None:
+                return await coroutine
+
+            async with semaphore:
+                return await coroutine
+
+        async def invoke_chunk(chunk):
+            if cls.__batch_enabled() and len(chunk) > 1:
+                results = await limited(cls.__post_batch(session, chunk, session_id))
+
+                if results is not None:
+                    return results
+
+            # endpoint does not accept batches or batch request failed, store was already read
+            return await asyncio.gather(*(limited(cls.__post(session, call, session_id)) for call in chunk))
+
+        results = await cls.__get_stored(calls, session_id)
+        pending = [ind for ind, result in enumerate(results) if result is _MISSING]
+
+        chunks = [pending[ind:ind + chunk_size] for ind in range(0, len(pending), chunk_size)]
+        chunks_results = await asyncio.gather(*(invoke_chunk([calls[ind] for ind in chunk]) for chunk in chunks))
 
-        response = requests.post(url=cls.__address, data=body, headers=headers)
-        response_dict = simplejson.loads(response.text)
+        for chunk, chunk_results in zip(chunks, chunks_results):
+            for ind, result in zip(chunk, chunk_results):
+                results[ind] = result
 
-        if not response.ok or 'error' in response_dict:
+        return results
 
-            if 'error' in response_dict:
-                error = response_dict['error']
-                message = error['details'] if type(error) is dict else error
-            else:
-                message = response.reason
+    @classmethod
+    def __batch_enabled(cls) -> bool:
+        """
+        Пакетные запросы отправляются, если сервер их не отклонял или прошло batch_retry секунд после отказа
+        """
+        rejected_at = cls.__batch_rejected_at
+        return rejected_at is None or time.monotonic() - rejected_at >= cls.__batch_retry
+
+    @staticmethod
+    def __is_batch_rejection(error) -> bool:
+        return type(error) is dict and error.get('code') in BATCH_REJECTION_CODES
+
+    @classmethod
+    async def __post_batch(cls, session, calls: list, session_id: str):
+        """
+        Отправляет пакет вызовов одним запросом.
+        :return: результаты вызовов или None, если пакетный запрос не выполнен
+        """
+        headers = cls.__get_headers(session_id)
 
-            raise ConnectionAbortedError(message)
+        body = JsonCodec.dumps([
+            {
+                "jsonrpc": "2.0",
+                "protocol": 5,
+                "method": call.method,
+                "params": call.params,
+                "id": ind
+            }
+            for ind, call in enumerate(calls)
+        ])
+
+        async with session.post(cls.__address, data=body, headers=headers) as response:
+            try:
+                response_list = JsonCodec.loads(await response.read())
+            except ValueError:
+                response_list = None
+
+            # invalid request or parse error in answer to array - endpoint does not accept batches
+            if type(response_list) is dict and cls.__is_batch_rejection(response_list.get('error')):
+                cls.__batch_rejected_at = time.monotonic()
+                return None
+
+            # transient failure (e.g. 5xx, proxy error page), only this batch is sent call by call
+            if response.status >= 400 or type(response_list) is not list:
+                return None
+
+        cls.__batch_rejected_at = None
+
+        responses = {response_dict.get('id'): response_dict for response_dict in response_list}
+        response_dicts = []
+
+        for ind in range(len(calls)):
+            response_dict = responses.get(ind)
+
+            if response_dict is None:
+                raise ConnectionAbortedError('Нет ответа на вызов {} в пакетном запросе'.format(calls[ind].method))
+
+            response_dicts.append(response_dict)
+
+        results = [cls.__get_result(response_dict) for response_dict in response_dicts]
+        await cls.__store_results(calls, session_id, response_dicts)
+
+        return results
+
+    @staticmethod
+    def __get_result(response_dict: dict, reason: str = None):
+        """
+        Возвращает результат вызова из ответа JSON-RPC или вызывает исключение с ошибкой метода
+        """
+        if 'error' in response_dict:
+            error = response_dict['error']
+            raise ConnectionAbortedError(error['details'] if type(error) is dict else error)
+
+        if reason is not None:
+            raise ConnectionAbortedError(reason)
 
         return parse_value(response_dict['result'])
+
+    @classmethod
+    async def __invoke(cls, session, method_name: str, session_id: str, params: dict):
+        call = RpcCall(method_name, params)
+        session_id = cls.__get_session_id(session_id)
+        result = (await cls.__get_stored([call], session_id))[0]
+
+        if result is not _MISSING:
+            return result
+
+        return await cls.__post(session, call, session_id)
+
+    @classmethod
+    async def __post(cls, session, call: RpcCall, session_id: str):
+        """
+        Отправляет один вызов без чтения хранилища ответов
+        """
+        headers = cls.__get_headers(session_id)
+
+        body = JsonCodec.dumps({
+            "jsonrpc": "2.0",
+            "protocol": 5,
+            "method": call.method,
+            "params": call.params,
+            "id": 1
+        })
+
+        async with session.post(cls.__address, data=body, headers=headers) as response:
+            response_dict = JsonCodec.loads(await response.read())
+            reason = response.reason if response.status >= 400 else None
+
+        result = cls.__get_result(response_dict, reason)
+        await cls.__store_results([call], session_id, [response_dict])
+
+        return result
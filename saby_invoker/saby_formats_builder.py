@@ -8,6 +8,7 @@
 }
 """
 import base64
+import threading
 from collections import namedtuple
 from datetime import date, datetime
 from decimal import Decimal
@@ -43,43 +44,121 @@ def build_recordset(value):
     return recordset_dict
 
 
-def build_record(dictionary: dict,) -> dict:
-    if type(dictionary) is not dict:
-        raise TypeError("Значение аргумента не является словарем!")
+def __get_value_kind(value):
+    """
+    Get kind of value that defines its SABY type: python type for simple types,
+    'json' or 'record' for dict, 'recordset' or ('array', item type) for list.
+    """
+    value_type = type(value)
+
+    # check simple types
+    if value_type in SABY_TYPES:
+        return value_type
+
+    # check JSON or Record type
+    if value_type is dict:
+        return 'json' if str(value.get('_type', None)).lower() == 'json' else 'record'
+
+    # check Array or RecordSet type
+    if value_type is list:
+        list_type = type(value[0]) if value else none_type
+
+        if not all(isinstance(val, list_type) for val in value):
+            raise TypeError("Значения в списке имеют разлиный тип!")
 
-    record_dict = {'_type': 'record', 's': [], 'd': []}
+        if list_type is dict:
+            return 'recordset'
 
-    for key, value in dictionary.items():
-        saby_converter = None
+        if list_type not in SABY_TYPES:
+            raise TypeError("Неверный тип значения в массиве!")
 
-        if type(value) not in list(SABY_TYPES) + [list, dict]:
-            raise TypeError("Неверный тип значения в записи!")
+        return ('array', list_type)
 
-        # check simple types
-        if type(value) in SABY_TYPES:
-            saby_converter = SABY_TYPES[type(value)]
-        # check JSON or Record type
-        elif type(value) is dict:
-            is_json = str(value.get('_type', None)).lower() == 'json'
-            value = value.get('_value', None)
-            saby_converter = SABY_TYPES['json'] if is_json else SABY_TYPES['record']
+    raise TypeError("Неверный тип значения в записи!")
 
-        # check Array or RecordSet type
-        elif type(value) is list:
-            list_type = type(value[0])
 
-            if not all(isinstance(val, list_type) for val in value):
-                raise TypeError("Значения в списке имеют разлиный тип!")
+def __get_dict_value(converter):
+    return lambda val: converter(val.get('_value', None))
 
-            saby_converter = SABY_TYPES['recordset'] if list_type is dict else SABY_TYPES['array']
 
-            if list_type is not dict:
-                saby_converter.type['t'] = SABY_TYPES[list_type].type
+def __compile_record(shape: tuple) -> tuple:
+    """
+    Build Record format and values converters for record shape.
 
-        record_dict['s'].append({'n': key, 't': saby_converter.type})
-        record_dict['d'].append(saby_converter.converter(value))
+    :param shape: pairs (key, value kind)
+    :type shape: tuple
+    :return: Record format as pairs (key, SABY type) and pairs (value index, converter) of values
+        which are not passed as is. Array type is stored as tuple of its dict items.
+    :rtype: tuple
+    """
+    record_format = []
+    converters = []
 
-    return record_dict
+    for ind, (key, kind) in enumerate(shape):
+        if type(kind) is tuple:
+            # array type dict is created for every built record, shared SABY_TYPES are not changed
+            saby_type = tuple(dict(SABY_TYPES['array'].type, t=SABY_TYPES[kind[1]].type).items())
+            converter = SABY_TYPES['array'].converter
+        elif kind in ('json', 'record'):
+            saby_type = SABY_TYPES[kind].type
+            converter = __get_dict_value(SABY_TYPES[kind].converter)
+        else:
+            saby_type = SABY_TYPES[kind].type
+            converter = SABY_TYPES[kind].converter
+
+        record_format.append((key, saby_type))
+
+        if kind not in PLAIN_TYPES:
+            converters.append((ind, converter))
+
+    return tuple(record_format), tuple(converters)
+
+
+# record shape -> (Record format, values converters)
+__compiled_records = {}
+__compiled_records_lock = threading.Lock()
+__COMPILED_RECORDS_LIMIT = 1024
+
+
+def build_record(dictionary: dict,) -> dict:
+    """
+    Build SABY Record from dictionary.
+    Record format is derived once per record shape (keys and value types),
+    next records of the same shape only convert values. Every record gets its own format dicts
+    built from the cached format.
+
+    :param dictionary: record values
+    :type dictionary: dict
+    :return: SABY Record format
+    :rtype: dict
+    """
+    if type(dictionary) is not dict:
+        raise TypeError("Значение аргумента не является словарем!")
+
+    shape = tuple([
+        (key, type(value) if type(value) in PLAIN_TYPES else __get_value_kind(value))
+        for key, value in dictionary.items()
+    ])
+    compiled = __compiled_records.get(shape)
+
+    if compiled is None:
+        compiled = __compile_record(shape)
+
+        with __compiled_records_lock:
+            if len(__compiled_records) < __COMPILED_RECORDS_LIMIT:
+                __compiled_records[shape] = compiled
+
+    record_format, converters = compiled
+    values = list(dictionary.values())
+
+    for ind, convert in converters:
+        values[ind] = convert(values[ind])
+
+    record_format = [
+        {'n': key, 't': dict(saby_type) if type(saby_type) is tuple else saby_type} for key, saby_type in record_format
+    ]
+
+    return {'_type': 'record', 's': record_format, 'd': values}
 
 
 SABY_TYPES = {
@@ -99,3 +178,6 @@ SABY_TYPES = {
     'recordset': saby_type_meta("Выборка", lambda val: build_recordset(val)),
     'array': saby_type_meta({"n": "Массив"}, lambda val: val)
 }
+
+# types passed to SABY as is
+PLAIN_TYPES = frozenset((float, int, Decimal, str, none_type, bool))
@@ -1,65 +1,151 @@
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+
+
+@lru_cache(maxsize=256)
+def __get_key_map(keys: tuple) -> dict:
+    """
+    Get shared key -> index map for Record and RecordSet keys.
+    Responses of one method have the same format, so the map is built once per format.
+
+    :param keys: Record or RecordSet keys
+    :type keys: tuple
+    :return: key -> value index map
+    :rtype: dict
+    """
+    return {key: ind for ind, key in enumerate(keys)}
+
+
 def __parse_default(dictionary: dict) -> dict:
     return dictionary
 
 
-def __get_keys(dictionary: dict) -> list:
+def __get_keys(dictionary: dict) -> tuple:
     """
     Get keys for Record and RecordSet
 
     :param dictionary: SABY Record or RecordSet format
     :type dictionary: dict
-    :return: list of Record or RecordSet keys
-    :rtype: list
+    :return: tuple of Record or RecordSet keys
+    :rtype: tuple
     """
 
-    return [x['n'] for x in dictionary['s']]
+    return tuple(x['n'] for x in dictionary['s'])
 
 
-def __parse_recordset(recordset_dict: dict) -> list:
+class Record(Mapping):
     """
-    Parse SABY RecordSet to python list of dicts
+    Read-only view of SABY Record values.
+    Values stay in the response row list, keys are resolved by key map shared by all rows of RecordSet.
+    Nested Record and RecordSet values are parsed on first access and kept in the view,
+    the response row is not changed.
+    """
+    __slots__ = ('__key_map', '__values', '__parsed')
+
+    def __init__(self, key_map: dict, values: list):
+        """
+        :param key_map: key -> value index map
+        :type key_map: dict
+        :param values: row values
+        :type values: list
+        """
+        self.__key_map = key_map
+        self.__values = values
+        # parsed nested values by index
+        self.__parsed = None
+
+    def __getitem__(self, key):
+        ind = self.__key_map[key]
+        value = self.__values[ind]
+
+        if type(value) is dict and value.get("_type", None) in AVAILABLE_TYPES:
+            if self.__parsed is None:
+                self.__parsed = {}
+
+            if ind not in self.__parsed:
+                self.__parsed[ind] = AVAILABLE_TYPES[value['_type']](value)
+
+            value = self.__parsed[ind]
+
+        return value
+
+    def __iter__(self):
+        return iter(self.__key_map)
+
+    def __len__(self):
+        return len(self.__key_map)
+
+    def __repr__(self):
+        return 'Record({})'.format(dict(self))
+
+
+class RecordSet(Sequence):
+    """
+    Read-only list of SABY RecordSet rows.
+    Row Record views are created on access, all of them share one key map.
+    """
+    __slots__ = ('__key_map', '__rows')
+
+    def __init__(self, key_map: dict, rows: list):
+        """
+        :param key_map: key -> value index map
+        :type key_map: dict
+        :param rows: rows values
+        :type rows: list
+        """
+        self.__key_map = key_map
+        self.__rows = rows
+
+    def __getitem__(self, ind):
+        if type(ind) is slice:
+            return [Record(self.__key_map, row) for row in self.__rows[ind]]
+
+        return Record(self.__key_map, self.__rows[ind])
+
+    def __iter__(self):
+        key_map = self.__key_map
+        return (Record(key_map, row) for row in self.__rows)
+
+    def __len__(self):
+        return len(self.__rows)
+
+    def __repr__(self):
+        return 'RecordSet({})'.format(list(self))
+
+
+def __parse_recordset(recordset_dict: dict):
+    """
+    Parse SABY RecordSet to sequence of Record views
 
     :param recordset_dict: SABY RecordSet format
     :type recordset_dict: dict
-    :return: SABY RecordSet converted to list of dicts
-    :rtype: list
+    :return: SABY RecordSet converted to RecordSet (dict with rec, outcome and more if RecordSet has outcome)
     """
-    keys = __get_keys(recordset_dict)
-    recordset = [__parse_record({'d': row}, keys) for row in recordset_dict['d']]
+    recordset = RecordSet(__get_key_map(__get_keys(recordset_dict)), recordset_dict['d'])
 
     if "r" in recordset_dict:
         result = {}
         result['rec'] = recordset
         result['outcome'] = parse_value(recordset_dict['r'])
+        # navigation: whether there are more records after this page, other navigation types are not flags
+        more = recordset_dict.get('n')
+        if isinstance(more, bool):
+            result['more'] = more
         return result
 
     return recordset
 
 
-def __parse_record(record_dict: dict, keys: list = None) -> dict:
+def __parse_record(record_dict: dict) -> Record:
     """
-    Parse SABY Record to python dictionary
+    Parse SABY Record to Record view
 
     :param record_dict: SABY Record format
     :type record_dict: dict
-    :param keys: list of RecordSet keys (for SABY RecordSet subparsing), defaults to None
-    :param keys: list, optional
-    :return: SABY Record converted to dict
-    :rtype: dict
+    :return: SABY Record converted to Record
+    :rtype: Record
     """
-
-    keys = keys if keys else __get_keys(record_dict)
-    result = {}
-    for ind in range(len(keys)):
-        value = record_dict['d'][ind]
-
-        if type(value) is dict and value.get("_type", None) in AVAILABLE_TYPES:
-            result[keys[ind]] = AVAILABLE_TYPES[value['_type']](value)
-
-        else:
-            result[keys[ind]] = value
-
-    return result
+    return Record(__get_key_map(__get_keys(record_dict)), record_dict['d'])
 
 
 def parse_value(value):
@@ -80,4 +166,4 @@ def parse_value(value):
 AVAILABLE_TYPES = {
         'recordset': __parse_recordset,
         'record': __parse_record,
-}
\ No newline at end of file
+}
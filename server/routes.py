@@ -3,14 +3,29 @@
     Предоставляет API проекта.
 """
 import datetime
-import json
 
-from flask import request
+from flask import Response, request
 
-from api import get_contacts, get_user_info
+from api import (MiningInProgress, get_cached_users_info, get_contacts, get_job_status, get_metrics, get_user_info,
+                 get_users_info)
+from helpers import Database, JsonCodec, Startup
 from server import flask_server
 
 
+def __json_response(value, status: int = 200) -> Response:
+    """
+    Формирует ответ application/json, значение кодируется сразу в байты
+    """
+    return Response(JsonCodec.dumps(value), status=status, mimetype='application/json')
+
+
+def __request_json() -> dict:
+    """
+    Декодирует тело запроса без промежуточной строки
+    """
+    return JsonCodec.loads(request.get_data())
+
+
 @flask_server.route('/', methods=['GET', 'POST'])
 def about():
     """
@@ -28,23 +43,19 @@ def contacts():
     """
     # Получаем данные запроса
     try:
-        raw_data = request.data.decode()
-        data = json.loads(raw_data)
+        data = __request_json()
 
         # Заполняем параметры
         ssid = data.get('sid')
         query_str = data.get('query_str')
         record_limit = data.get('limit', 10)
         if not query_str:
-            return 'Отсутствует параметр: query_str', 500
+            return __json_response({'error': 'Отсутствует параметр: query_str'}, 400)
         # Вызываем метод получения контактов
         contacts = get_contacts(query_str, record_limit=record_limit, sid=ssid)
-
-        # Преобразуем в JSON
-        contacts = json.dumps(contacts)
     except Exception as exc:
-        return str(exc), 500
-    return str(contacts)
+        return __json_response({'error': str(exc)}, 500)
+    return __json_response(contacts)
 
 
 @flask_server.route("/get_user_info", methods=['POST'])
@@ -53,25 +64,118 @@ def get_user_information():
     Возвращает информацию по пользователю
 
     :return: Информация по пользователю
-    :rtype: str
+    :rtype: Response
     """
 
     # get data
     try:
-        raw_data = request.data.decode()
-        data = json.loads(raw_data)
+        data = __request_json()
 
         # fill params
         ssid = data.get('sid')
         user_id = data.get('user_id')
 
-        # invoke data mining
-        user_info = get_user_info(user_id, ssid)
+        # cached scores are answered without database connection, which may be busy with mining
+        user_info = get_cached_users_info([user_id]).get(user_id)
+
+        if user_info is None:
+            # wait for background initialization in lazy mode
+            Startup.require('database', 'neural_network')
 
-        # build JSON string
-        user_info = json.dumps(user_info)
+            # invoke data mining on connection of this request
+            with Database.connection():
+                user_info = get_user_info(user_id, ssid)
+
+    except MiningInProgress as exc:
+        # new user is mined in background, client polls /get_job_status
+        return __json_response(exc.jobs[0], 202)
 
     except BaseException as exc:
-        return str(exc), 500
+        return __json_response({'error': str(exc)}, 500)
+
+    return __json_response(user_info)
+
+
+@flask_server.route("/get_user_info_batch", methods=['POST'])
+def get_users_information():
+    """
+    Возвращает информацию по списку пользователей
+
+    :return: Информация по пользователям
+    :rtype: Response
+    """
+
+    # get data
+    try:
+        data = __request_json()
+
+        # fill params
+        ssid = data.get('sid')
+        user_ids = data.get('user_ids')
+        if not user_ids:
+            return __json_response({'error': 'Отсутствует параметр: user_ids'}, 400)
+
+        # cached scores are answered without database connection, which may be busy with mining
+        users_info = get_cached_users_info(user_ids)
+
+        if any(user_id not in users_info for user_id in user_ids):
+            # wait for background initialization in lazy mode
+            Startup.require('database', 'neural_network')
+
+            # invoke data mining on connection of this request
+            with Database.connection():
+                users_info = get_users_info(user_ids, ssid)
 
-    return str(user_info)
+    except MiningInProgress as exc:
+        # scores of mined users are answered with jobs of users mined in background
+        return __json_response({'users': __format_users_info(user_ids, exc.users_info), 'jobs': exc.jobs}, 202)
+
+    except BaseException as exc:
+        return __json_response({'error': str(exc)}, 500)
+
+    return __json_response(__format_users_info(user_ids, users_info))
+
+
+def __format_users_info(user_ids: list, users_info: dict) -> list:
+    """
+    Показатели пользователей в порядке запроса, пользователи без показателей пропускаются
+    """
+    return [dict(users_info[user_id], user_id=user_id) for user_id in user_ids if user_id in users_info]
+
+
+@flask_server.route("/get_job_status", methods=['POST'])
+def get_job_information():
+    """
+    Возвращает состояние фоновой задачи сбора данных
+
+    :return: состояние задачи
+    :rtype: Response
+    """
+
+    # get data
+    try:
+        data = __request_json()
+
+        job_id = data.get('job_id')
+        if not job_id:
+            return __json_response({'error': 'Отсутствует параметр: job_id'}, 400)
+
+        job = get_job_status(job_id)
+        if job is None:
+            return __json_response({'error': 'Задача не найдена: {}'.format(job_id)}, 404)
+
+    except BaseException as exc:
+        return __json_response({'error': str(exc)}, 500)
+
+    return __json_response(job)
+
+
+@flask_server.route("/metrics", methods=['GET'])
+def metrics():
+    """
+    Возвращает метрики сервера
+
+    :return: метрики сервера
+    :rtype: Response
+    """
+    return __json_response(get_metrics())
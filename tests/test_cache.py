@@ -0,0 +1,104 @@
+from helpers import cache as cache_module
+from helpers import TTLCache
+
+
+class Clock():
+    """
+    Replaces time module of helpers.cache
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def __make_cache(monkeypatch, ttl: float = 10, size: int = 3) -> tuple:
+    clock = Clock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    return TTLCache('TestCache', default_ttl=ttl, default_size=size), clock
+
+
+def test_get_returns_set_value(monkeypatch):
+    cache, _ = __make_cache(monkeypatch)
+
+    cache.set('key', {'value': 1})
+
+    assert cache.get('key') == {'value': 1}
+    assert cache.get('missing', 'default') == 'default'
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_entry_expires_after_ttl(monkeypatch):
+    cache, clock = __make_cache(monkeypatch, ttl=10)
+
+    cache.set('key', 'value')
+    clock.now += 9.9
+    assert cache.get('key') == 'value'
+
+    clock.now += 0.1
+    assert cache.get('key') is None
+    assert cache.stats()['expirations'] == 1 and cache.stats()['size'] == 0
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    cache, _ = __make_cache(monkeypatch, size=2)
+
+    cache.set('first', 1)
+    cache.set('second', 2)
+    cache.get('first')
+    cache.set('third', 3)
+
+    assert cache.get('first') == 1
+    assert cache.get('second') is None
+    assert cache.get('third') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_zero_ttl_disables_cache(monkeypatch):
+    cache, _ = __make_cache(monkeypatch, ttl=0)
+
+    cache.set('key', 'value')
+
+    assert cache.get('key') is None
+
+
+def test_invalidate_and_clear(monkeypatch):
+    cache, _ = __make_cache(monkeypatch)
+
+    cache.set('first', 1)
+    cache.set('second', 2)
+    cache.invalidate('first')
+    assert cache.get('first') is None and cache.get('second') == 2
+
+    cache.clear()
+    assert cache.stats()['size'] == 0
+
+
+def test_stale_value_is_not_cached_after_invalidate(monkeypatch):
+    cache, _ = __make_cache(monkeypatch)
+
+    generation = cache.generation()
+    cache.invalidate('key')
+    cache.set('key', 'stale', generation)
+    assert cache.get('key') is None
+
+    cache.set('key', 'fresh', cache.generation())
+    cache.set('other', 'value', generation)
+    assert cache.get('key') == 'fresh' and cache.get('other') == 'value'
+
+
+def test_stale_value_is_not_cached_after_clear(monkeypatch):
+    cache, _ = __make_cache(monkeypatch, size=1)
+
+    generation = cache.generation()
+    cache.clear()
+    cache.set('key', 'stale', generation)
+    assert cache.get('key') is None
+
+    generation = cache.generation()
+    for key in range(5):
+        cache.invalidate(key)
+    cache.set(0, 'stale', generation)
+    assert cache.get(0) is None
@@ -0,0 +1,128 @@
+import importlib
+from configparser import ConfigParser
+
+import pytest
+
+pytest.importorskip('aiohttp')
+pytest.importorskip('numpy')
+pytest.importorskip('dateutil')
+
+from api.directory import EmployeeDirectory, EmployeeIndex  # noqa: E402
+from helpers import Configuration  # noqa: E402
+
+api_module = importlib.import_module('api.api')
+
+EMPLOYEES = [
+    {'Лицо': 1, 'Фамилия': 'Иванов', 'Имя': 'Иван', 'Отчество': 'Петрович'},
+    {'Лицо': 2, 'Фамилия': 'Петров', 'Имя': 'Иван', 'Отчество': 'Сергеевич'},
+    {'Лицо': 3, 'Фамилия': 'Иванова', 'Имя': 'Мария', 'Отчество': 'Ивановна'},
+    {'Лицо': 4, 'Фамилия': 'Сидоров', 'Имя': 'Петр', 'Отчество': None},
+]
+
+
+def __make_index(session_id: str = 'service') -> EmployeeIndex:
+    name_words = [
+        ' '.join(employee[field] or '' for field in ('Фамилия', 'Имя', 'Отчество')).casefold().split()
+        for employee in EMPLOYEES
+    ]
+    return EmployeeIndex([employee['Лицо'] for employee in EMPLOYEES], name_words, session_id)
+
+
+@pytest.fixture
+def config(monkeypatch):
+    config = ConfigParser()
+    config.read_dict({
+        'SABY': {'session_id': 'service', 'site': 'http://localhost/'},
+        'ContactsCache': {'page_size': '50'}
+    })
+    monkeypatch.setattr(Configuration, 'app_config', config, raising=False)
+    return config
+
+
+@pytest.fixture
+def browse_staff(monkeypatch):
+    """
+    Replaces Staff.BrowserList call with filter of EMPLOYEES, returns list of query strings sent to SBIS
+    """
+    queries = []
+
+    def fake_browse_staff(query_str, contragent, page, page_size, sid=None):
+        queries.append(query_str)
+        words = query_str.casefold().split()
+        records = [
+            employee for employee in EMPLOYEES
+            if all(
+                any((employee[field] or '').casefold().startswith(word) for field in ('Фамилия', 'Имя', 'Отчество'))
+                for word in words
+            )
+        ]
+        return {'rec': records[:page_size], 'more': len(records) > page_size}
+
+    monkeypatch.setitem(vars(api_module), '__browse_staff', fake_browse_staff)
+    api_module.contacts_cache.clear()
+    yield queries
+    api_module.contacts_cache.clear()
+
+
+@pytest.mark.parametrize('query_str, expected', [
+    ('', [1, 2, 3, 4]),
+    ('иван', [1, 2, 3]),
+    ('Иванов', [1, 3]),
+    ('иванова', [3]),
+    ('иван петр', [1, 2]),
+    ('петр', [1, 2, 4]),
+    ('сид п', [4]),
+    ('кузнецов', []),
+])
+def test_index_finds_employees_by_name_prefixes(query_str, expected):
+    assert __make_index().search(query_str, 10) == expected
+
+
+def test_index_search_is_limited():
+    assert __make_index().search('иван', 2) == [1, 2]
+
+
+def test_directory_is_used_only_for_its_session(config):
+    EmployeeDirectory.update('session-scope', __make_index('service'))
+
+    assert EmployeeDirectory.search('иван', 'session-scope', 'service', 10) == [1, 2, 3]
+    assert EmployeeDirectory.search('иван', 'session-scope', 'other', 10) is None
+    assert EmployeeDirectory.search('иван', 'unknown', 'service', 10) is None
+
+
+def test_directory_without_matches_falls_back(config):
+    EmployeeDirectory.update('no-matches', __make_index('service'))
+
+    assert EmployeeDirectory.search('кузнецов', 'no-matches', 'service', 10) is None
+
+
+def test_contacts_are_narrowed_from_complete_prefix_page(config, browse_staff):
+    ids = [employee['id'] for employee in api_module.get_contacts('ив', 'prefix', 10, 'user')]
+    assert ids == [1, 2, 3]
+
+    ids = [employee['id'] for employee in api_module.get_contacts('иванов', 'prefix', 10, 'user')]
+    assert ids == [1, 3]
+
+    ids = [employee['id'] for employee in api_module.get_contacts('иванов', 'prefix', 10, 'user')]
+    assert ids == [1, 3]
+
+    assert browse_staff == ['ив']
+    assert api_module.get_contacts_stats()['prefix_hits'] >= 1
+
+
+def test_contacts_cache_is_scoped_by_session(config, browse_staff):
+    api_module.get_contacts('ив', 'sessions', 10, 'first')
+    api_module.get_contacts('ив', 'sessions', 10, 'second')
+
+    assert browse_staff == ['ив', 'ив']
+
+
+def test_contacts_use_directory_of_caller_session(config, browse_staff):
+    api_module.sync_employee_directory('directory')
+    browse_staff.clear()
+
+    ids = [employee['id'] for employee in api_module.get_contacts('иван', 'directory', 10)]
+    assert ids == [1, 2, 3] and browse_staff == []
+
+    ids = [employee['id'] for employee in api_module.get_contacts('иван', 'directory', 10, 'user')]
+    assert ids == [1, 2, 3] and browse_staff == ['иван']
@@ -0,0 +1,28 @@
+import importlib
+
+import pytest
+
+numpy = pytest.importorskip('numpy')
+
+from api import features  # noqa: E402
+
+
+def test_deviation_of_column():
+    assert features.deviation([]) == 0.0
+    assert features.deviation([5]) == 0.0
+    assert features.deviation([1, 3]) == pytest.approx(1.0)
+
+
+def test_punctuality_matches_window_ratio():
+    scores = importlib.import_module('api.scores')
+    calculate_punctuality = vars(scores)['__calculate_user_punctuality']
+    random = numpy.random.default_rng(13)
+
+    assert calculate_punctuality([]) == -1
+
+    for spread in (0, 60, 600, 1800, 3600):
+        for days in (1, 2, 5, 30):
+            coming_times = list(9 * 3600 + random.normal(0, spread, days))
+            ratio = features.in_window_ratio(coming_times, features.mean(coming_times), 30 * 60)
+
+            assert calculate_punctuality(coming_times) == int(round(ratio * 10))
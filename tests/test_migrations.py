@@ -0,0 +1,124 @@
+import importlib
+from configparser import ConfigParser
+from types import SimpleNamespace
+
+import pytest
+
+from helpers import Configuration, Database
+from helpers.migrations import MIGRATIONS
+
+database_module = importlib.import_module('helpers.database')
+
+
+class FakeCursor():
+    """
+    Cursor recording executed statements, psycopg2.extras.execute_values is replaced by FakeCursor.execute_values
+    """
+    description = None
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, query_str, fields=None):
+        self.statements.append((query_str, fields))
+
+    def execute_values(self, cursor, query_str, rows, page_size=100):
+        assert cursor is self
+        for ind in range(0, len(rows), page_size):
+            self.statements.append((query_str, rows[ind:ind + page_size]))
+
+
+@pytest.fixture
+def cursor(monkeypatch):
+    cursor = FakeCursor()
+    monkeypatch.setattr(database_module, 'psycopg2', SimpleNamespace(extras=SimpleNamespace(
+        execute_values=cursor.execute_values
+    )))
+    monkeypatch.setattr(Database, '_Database__cursor', cursor)
+    monkeypatch.setattr(Database, '_Database__pool', None)
+    Database.discard_rows()
+    yield cursor
+    Database.discard_rows()
+
+
+def __get_migration(description: str):
+    return next(migration for migration in MIGRATIONS if migration.description == description)
+
+
+def __unique_key(table: str, columns: tuple) -> str:
+    return 'ON "{}" ({})'.format(table, ', '.join('"{}"'.format(column) for column in columns))
+
+
+def test_versions_are_sequential():
+    assert [migration.version for migration in MIGRATIONS] == list(range(1, len(MIGRATIONS) + 1))
+
+
+def test_buffered_rows_with_key_are_upserted(cursor):
+    for row in ((1, '2020-01-02', 3), (1, '2020-01-03', 4)):
+        Database.buffer_rows('UserCalls', ('UserID', 'Date', 'Count'), [row], key_columns=('UserID', 'Date'))
+    Database.flush_rows()
+
+    assert cursor.statements == [(
+        'INSERT INTO "UserCalls" ("UserID", "Date", "Count") VALUES %s'
+        ' ON CONFLICT ("UserID", "Date") DO UPDATE SET "Count" = EXCLUDED."Count"',
+        [(1, '2020-01-02', 3), (1, '2020-01-03', 4)]
+    )]
+
+
+def test_buffered_rows_are_paged_and_flushed_once(cursor):
+    Database.buffer_rows('MinedUsers', ('UserID',), [(ind,) for ind in range(5)], key_columns=('UserID',))
+    Database.buffer_rows('UserLocation', ('UserID', 'Status'), [(1, 0)])
+    Database.flush_rows(page_size=2)
+    Database.flush_rows()
+
+    assert [query_str for query_str, _ in cursor.statements] == [
+        'INSERT INTO "MinedUsers" ("UserID") VALUES %s ON CONFLICT ("UserID") DO NOTHING'
+    ] * 3 + ['INSERT INTO "UserLocation" ("UserID", "Status") VALUES %s']
+
+
+def test_unique_keys_are_not_null_before_creation():
+    queries = __get_migration('Unique keys and indexes of analytics tables').queries
+    keys = {
+        'UserActivity': ('UserID', 'Date', 'Category', 'Useful'),
+        'UserLocation': ('UserID', 'DateTime', 'Status'),
+        'UserOverwork': ('UserID', 'Date'),
+        'UserCalls': ('UserID', 'Date')
+    }
+
+    for table, columns in keys.items():
+        key_ind = next(ind for ind, query in enumerate(queries) if __unique_key(table, columns) in query)
+        not_null = ' '.join(query for query in queries[:key_ind] if 'ALTER TABLE "{}"'.format(table) in query)
+
+        for column in columns[1:]:
+            assert 'ALTER COLUMN "{}" SET NOT NULL'.format(column) in not_null, (table, column)
+
+
+def test_mined_activity_has_no_null_keys(cursor, monkeypatch):
+    pytest.importorskip('aiohttp')
+    pytest.importorskip('numpy')
+    pytest.importorskip('dateutil')
+
+    data_miner = importlib.import_module('api.data_miner')
+
+    activities = {'rec': [
+        {'Name': 'Итого', 'Useful': 0, 'Duration': 'P0DT0H0M0S', 'Parent@': False},
+        {'Name': 'Документы', 'Useful': 1, 'Duration': 'P0DT1H0M0S', 'Parent@': True},
+        {'Name': 'Новости', 'Useful': None, 'Duration': 'P0DT0H10M0S', 'Parent@': True},
+        {'Name': None, 'Useful': 1, 'Duration': 'P0DT0H5M0S', 'Parent@': True},
+    ]}
+    calls = {'call_count_out': 2, 'call_time_out': 'P0DT0H3M0S'}
+
+    def invoke_batch(rpc_calls, sid, concurrency=None):
+        return [activities if call.method == data_miner.DAY_ACTIVITY_METHOD else calls for call in rpc_calls]
+
+    config = ConfigParser()
+    config.read_dict({'Mining': {'workers': '1'}})
+    monkeypatch.setattr(Configuration, 'app_config', config, raising=False)
+    monkeypatch.setattr(data_miner, 'SabyInvoker', SimpleNamespace(invoke_batch=invoke_batch))
+
+    vars(data_miner)['__get_user_activity'](1, 'sid', ['2020-01-02'])
+
+    activity_rows = next(rows for query_str, rows in cursor.statements if '"UserActivity"' in query_str)
+    assert sorted((row[2], row[3]) for row in activity_rows) == [
+        ('', 1), ('Документы', 1), ('Звонки СБИС', 0), ('Новости', 0)
+    ]
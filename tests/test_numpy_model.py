@@ -0,0 +1,22 @@
+import os
+
+import pytest
+
+numpy = pytest.importorskip('numpy')
+pytest.importorskip('keras')
+pytest.importorskip('h5py')
+
+from neural_network.neural_network import NeuralNetwork  # noqa: E402
+from neural_network.numpy_model import NumpyModel  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_numpy_model_matches_keras_on_production_weights():
+    weights_file = os.path.join(ROOT, NeuralNetwork.WEIGHTS_FILE)
+    input_data = numpy.loadtxt(os.path.join(ROOT, 'dataset.csv'), delimiter=',')[:200, :6]
+
+    keras_model = NeuralNetwork.build_keras_model(weights_file)
+    numpy_model = NumpyModel.load(weights_file, [activation for _, activation in NeuralNetwork.LAYERS])
+
+    assert numpy.allclose(keras_model.predict(input_data), numpy_model.predict(input_data), atol=1e-5)
@@ -0,0 +1,28 @@
+from configparser import ConfigParser
+
+import pytest
+
+from api import premining
+from helpers import Configuration, Database
+
+
+@pytest.fixture
+def config(monkeypatch):
+    config = ConfigParser()
+    config.read_dict({'Premining': {'schedule': '03:00'}, 'Database': {}})
+    monkeypatch.setattr(Configuration, 'app_config', config, raising=False)
+    monkeypatch.setattr(Database, '_Database__pool', None)
+    return config
+
+
+def test_premining_requires_connections_pool(config, monkeypatch):
+    monkeypatch.setattr(premining, 'list_employees', lambda sid, contragent: [{'Лицо': 1}])
+
+    with pytest.raises(RuntimeError):
+        premining.premine_organization()
+
+
+def test_schedule_is_not_started_in_single_connection_mode(config, monkeypatch):
+    monkeypatch.setattr(premining.threading, 'Thread', None)
+
+    premining.PreminingScheduler.start()
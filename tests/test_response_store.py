@@ -0,0 +1,46 @@
+from configparser import ConfigParser
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from benchmarks.fake_saby_server import FakeSabyServer  # noqa: E402
+from helpers import Configuration  # noqa: E402
+from saby_invoker import ResponseStore, RpcCall, SabyInvoker  # noqa: E402
+
+CALLS = [RpcCall('Echo', {'value': ind}, cacheable=True) for ind in range(3)]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    config = ConfigParser()
+    config.read_dict({'SABY': {'session_id': 'service'}})
+    monkeypatch.setattr(Configuration, 'app_config', config, raising=False)
+
+    server = FakeSabyServer({'Echo': lambda params: params['value']}).start()
+    yield server
+
+    SabyInvoker.close()
+    server.stop()
+
+
+def test_stored_results_are_scoped_by_session(server, tmp_path):
+    store = ResponseStore(str(tmp_path / 'responses.sqlite3'))
+    SabyInvoker.initialize(server.address, response_store=store)
+
+    assert SabyInvoker.invoke_batch(CALLS, session_id='first') == [0, 1, 2]
+    assert SabyInvoker.invoke_batch(CALLS, session_id='first') == [0, 1, 2]
+    assert server.requests_count == 1
+
+    assert SabyInvoker.invoke_batch(CALLS, session_id='second') == [0, 1, 2]
+    assert server.requests_count == 2
+    assert store.stats()['hits'] == 3
+
+    store.close()
+
+
+def test_store_key_does_not_depend_on_params_order():
+    make_key = ResponseStore.make_key
+
+    assert make_key('Echo', {'a': 1, 'b': 2}, 'sid') == make_key('Echo', {'b': 2, 'a': 1}, 'sid')
+    assert make_key('Echo', {'a': 1}, 'first') != make_key('Echo', {'a': 1}, 'second')
@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip('flask')
+
+from server import flask_server  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return flask_server.test_client()
+
+
+@pytest.mark.parametrize('path', ['/contacts', '/get_user_info_batch', '/get_job_status'])
+def test_missing_parameter_is_answered_with_json_error(client, path):
+    response = client.post(path, data=b'{}')
+
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Отсутствует параметр')
+
+
+def test_unknown_job_is_answered_with_json_error(client):
+    response = client.post('/get_job_status', data=b'{"job_id": "missing"}')
+
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Задача не найдена: missing'}
+
+
+def test_failure_is_answered_with_json_error(client):
+    response = client.post('/get_user_info', data=b'not json')
+
+    assert response.status_code == 500
+    assert response.mimetype == 'application/json' and response.get_json()['error']
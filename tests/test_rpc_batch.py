@@ -0,0 +1,96 @@
+from configparser import ConfigParser
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from benchmarks.fake_saby_server import FakeSabyServer  # noqa: E402
+from helpers import Configuration  # noqa: E402
+from saby_invoker import RpcCall, SabyInvoker  # noqa: E402
+
+CALLS = [RpcCall('Echo', {'value': ind}, cacheable=True) for ind in range(3)]
+
+
+class BatchServer(FakeSabyServer):
+    """
+    Fake server answering batch arrays with the given error
+    """
+
+    def __init__(self, batch_error: dict = None):
+        super().__init__({'Echo': lambda params: params['value']})
+        self.batch_error = batch_error
+        self.batches_count = 0
+
+    def handle_body(self, body):
+        if isinstance(body, list):
+            self.batches_count += 1
+
+            if self.batch_error is not None:
+                return {'jsonrpc': '2.0', 'id': None, 'error': self.batch_error}
+
+        return super().handle_body(body)
+
+
+@pytest.fixture
+def config(monkeypatch):
+    config = ConfigParser()
+    config.read_dict({'SABY': {'session_id': 'service'}})
+    monkeypatch.setattr(Configuration, 'app_config', config, raising=False)
+    return config
+
+
+def __start(server: FakeSabyServer) -> FakeSabyServer:
+    SabyInvoker.initialize(server.address)
+    return server
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(server: FakeSabyServer) -> FakeSabyServer:
+        started.append(server.start())
+        return server
+
+    yield start
+
+    SabyInvoker.close()
+    for server in started:
+        server.stop()
+
+
+def test_batch_returns_results_in_order(config, servers):
+    server = __start(servers(BatchServer()))
+
+    assert SabyInvoker.invoke_batch(CALLS) == [0, 1, 2]
+    assert server.requests_count == 1 and server.batches_count == 1
+
+
+def test_rejected_batch_falls_back_to_single_calls(config, servers):
+    server = __start(servers(BatchServer({'code': -32600, 'message': 'Invalid Request'})))
+
+    assert SabyInvoker.invoke_batch(CALLS) == [0, 1, 2]
+    assert server.requests_count == 4
+
+    # batching stays off for batch_retry seconds
+    assert SabyInvoker.invoke_batch(CALLS) == [0, 1, 2]
+    assert server.requests_count == 7 and server.batches_count == 1
+
+
+def test_rejected_batch_is_retried_after_cooldown(config, servers):
+    config['SABY']['batch_retry'] = '0'
+    server = __start(servers(BatchServer({'code': -32600, 'message': 'Invalid Request'})))
+
+    SabyInvoker.invoke_batch(CALLS)
+    server.batch_error = None
+
+    assert SabyInvoker.invoke_batch(CALLS) == [0, 1, 2]
+    assert server.batches_count == 2 and server.requests_count == 5
+
+
+def test_transient_batch_error_keeps_batching(config, servers):
+    server = __start(servers(BatchServer({'code': -32000, 'message': 'Service unavailable'})))
+
+    assert SabyInvoker.invoke_batch(CALLS) == [0, 1, 2]
+    assert SabyInvoker.invoke_batch(CALLS) == [0, 1, 2]
+    assert server.batches_count == 2 and server.requests_count == 8
@@ -0,0 +1,61 @@
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from benchmarks.builder_throughput import SAMPLE_RECORDS, legacy_build_record  # noqa: E402
+from saby_invoker import SabyFormatsBuilder  # noqa: E402
+from saby_invoker.saby_formats_parser import parse_value  # noqa: E402
+
+
+# legacy builder shares one array type dict, so arrays of different item types are built in separate records
+@pytest.mark.parametrize('record', [make(ind) for make in SAMPLE_RECORDS.values() for ind in (0, 7)] + [
+    {
+        'date': date(2020, 1, 2),
+        'datetime': datetime(2020, 1, 2, 3, 4, 5),
+        'decimal': Decimal('1.5'),
+        'uuid': UUID('12345678123456781234567812345678'),
+        'bytes': b'data',
+        'float': 1.5,
+        'none': None,
+        'array': [1, 2, 3],
+        'json': {'_type': 'JSON', '_value': {'a': 1}},
+        'records': [{'a': 1}, {'a': 2}]
+    },
+    {'strings': ['a', 'b']}
+])
+def test_compiled_builder_matches_legacy_builder(record):
+    assert SabyFormatsBuilder.build_record(record) == legacy_build_record(record)
+    # second call uses compiled format
+    assert SabyFormatsBuilder.build_record(record) == legacy_build_record(record)
+
+
+def test_built_records_do_not_share_format():
+    first = SabyFormatsBuilder.build_record({'a': 1, 'b': 'x'})
+    first['s'].append({'n': 'c', 't': 'Строка'})
+
+    second = SabyFormatsBuilder.build_record({'a': 2, 'b': 'y'})
+
+    assert second['s'] == [{'n': 'a', 't': 'Число целое'}, {'n': 'b', 't': 'Строка'}]
+
+
+def test_built_records_do_not_share_array_type():
+    first = SabyFormatsBuilder.build_record({'values': [1, 2]})
+    first['s'][0]['t']['t'] = 'Строка'
+
+    second = SabyFormatsBuilder.build_record({'values': [3, 4]})
+
+    assert second['s'] == [{'n': 'values', 't': {'n': 'Массив', 't': 'Число целое'}}]
+    assert SabyFormatsBuilder.build_record({'values': ['a']})['s'][0]['t']['t'] == 'Строка'
+    assert second['s'][0]['t']['t'] == 'Число целое'
+
+
+def test_built_recordset_is_parsed_back():
+    rows = [{'Id': ind, 'Name': 'name {}'.format(ind)} for ind in range(3)]
+
+    recordset = parse_value(SabyFormatsBuilder.build_recordset(rows))
+
+    assert [dict(row) for row in recordset] == rows
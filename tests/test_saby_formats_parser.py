@@ -0,0 +1,58 @@
+import copy
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from saby_invoker.saby_formats_parser import Record, RecordSet, parse_value  # noqa: E402
+
+NESTED_RECORD = {'_type': 'record', 's': [{'n': 'Name'}, {'n': 'Age'}], 'd': ['Иван', 30]}
+
+
+def __recordset(rows: list, **extra) -> dict:
+    return dict({'_type': 'recordset', 's': [{'n': 'Id'}, {'n': 'Owner'}], 'd': rows}, **extra)
+
+
+def test_record_view_reads_values_by_key():
+    record = parse_value({'_type': 'record', 's': [{'n': 'a'}, {'n': 'b'}], 'd': [1, None]})
+
+    assert isinstance(record, Record)
+    assert record['a'] == 1 and record['b'] is None
+    assert list(record) == ['a', 'b'] and len(record) == 2
+    assert dict(record) == {'a': 1, 'b': None}
+
+    with pytest.raises(KeyError):
+        record['c']
+
+
+def test_recordset_rows_share_format():
+    recordset = parse_value(__recordset([[1, None], [2, None], [3, None]]))
+
+    assert isinstance(recordset, RecordSet)
+    assert len(recordset) == 3
+    assert [row['Id'] for row in recordset] == [1, 2, 3]
+    assert [row['Id'] for row in recordset[1:]] == [2, 3]
+    assert recordset[-1]['Id'] == 3
+
+
+def test_nested_values_are_parsed_without_changing_response():
+    raw = __recordset([[1, copy.deepcopy(NESTED_RECORD)]])
+    raw_copy = copy.deepcopy(raw)
+    row = parse_value(raw)[0]
+
+    owner = row['Owner']
+
+    assert isinstance(owner, Record) and owner['Name'] == 'Иван'
+    # parsed once per view
+    assert row['Owner'] is owner
+    assert raw == raw_copy
+
+
+def test_navigation_flag_is_kept_only_when_bool():
+    outcome = {'_type': 'record', 's': [], 'd': []}
+
+    assert parse_value(__recordset([], r=outcome, n=True))['more'] is True
+    assert parse_value(__recordset([], r=outcome, n=False))['more'] is False
+    assert 'more' not in parse_value(__recordset([], r=outcome, n={'position': 10}))
+    assert 'more' not in parse_value(__recordset([], r=outcome))
+    assert isinstance(parse_value(__recordset([])), RecordSet)
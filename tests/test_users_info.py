@@ -0,0 +1,66 @@
+import importlib
+from configparser import ConfigParser
+from datetime import date, timedelta
+
+import pytest
+
+from api.jobs import JOB_MINE, JOB_REFRESH, MiningInProgress, MiningJobs
+from api.scores import SCORES_COLUMNS
+from helpers import Configuration
+
+api_module = importlib.import_module('api.api')
+
+TODAY = date.today()
+
+
+def __scores(last_mined_date, scored: bool = True) -> dict:
+    row = {column: 1 for column in SCORES_COLUMNS.values()}
+    return dict(row, LastMinedDate=last_mined_date, UpdatedAt=TODAY if scored else None)
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    config = ConfigParser()
+    config.read_dict({'Mining': {'refresh_age': '1'}})
+    monkeypatch.setattr(Configuration, 'app_config', config, raising=False)
+
+    rows = {
+        1: __scores(TODAY),
+        2: __scores(TODAY - timedelta(days=3)),
+        3: __scores(None),
+        4: __scores(TODAY - timedelta(days=3), scored=False),
+    }
+    enqueued = []
+
+    def enqueue(user_id, sid=None, kind=JOB_MINE):
+        enqueued.append((user_id, kind))
+        return {'job_id': str(user_id), 'user_id': user_id, 'kind': kind}
+
+    def refresh_user_info(user_id, sid):
+        raise AssertionError('user {} refreshed in request thread'.format(user_id))
+
+    monkeypatch.setitem(vars(api_module), '__query_users_scores', lambda user_ids: {
+        user_id: dict(rows[user_id]) for user_id in user_ids if user_id in rows
+    })
+    monkeypatch.setattr(api_module, 'refresh_user_info', refresh_user_info)
+    monkeypatch.setattr(MiningJobs, 'workers_count', classmethod(lambda cls: 2))
+    monkeypatch.setattr(MiningJobs, 'enqueue', enqueue)
+    return enqueued
+
+
+def test_outdated_users_are_refreshed_in_background(jobs):
+    get_users_info = vars(api_module)['__get_users_info']
+
+    with pytest.raises(MiningInProgress) as exc_info:
+        get_users_info([1, 2, 3, 4, 5], 'sid')
+
+    assert jobs == [(2, JOB_REFRESH), (3, JOB_REFRESH), (4, JOB_REFRESH), (5, JOB_MINE)]
+    assert [job['user_id'] for job in exc_info.value.jobs] == [3, 4, 5]
+    assert sorted(exc_info.value.users_info) == [1, 2]
+
+
+def test_current_scores_are_answered_while_refreshing(jobs):
+    get_users_info = vars(api_module)['__get_users_info']
+
+    assert sorted(get_users_info([1, 2], 'sid')) == [1, 2]
+    assert jobs == [(2, JOB_REFRESH)]